@@ -1,3 +1,6 @@
+import time
+_import_started = time.perf_counter()  # จุดเริ่มของ startup report (ดู startup.py)
+
 from flask import (
     Flask,
     render_template,
@@ -5,17 +8,86 @@ from flask import (
     redirect,
     url_for,
     session,
-    flash
+    flash,
+    jsonify,
+    has_app_context,
+    Response,
+    stream_with_context,
+    stream_template,
+    get_flashed_messages,
+    make_response,
+    send_from_directory,
+    abort
 )
 import sqlite3
+import click
 from datetime import datetime
 import os
 import hashlib
+import hmac
+import shutil
+import threading
+import uuid
+from functools import lru_cache, wraps
 from flask_wtf.csrf import CSRFProtect, generate_csrf
-from werkzeug.utils import secure_filename
+
+from db import ConnectionPool
+from migrations import (
+    run_migrations,
+    register_hot_query,
+    check_hot_queries,
+    repair_order_aggregates,
+    rebuild_user_daily_sales,
+    rebuild_user_points,
+    rebuild_order_search
+)
+from events import EventBus, sse_message
+from orders_write import DuplicateOrder, parse_cart, place_order, record_completed_sale
+from points import (
+    award_order_points,
+    redeem_reward,
+    REWARD_NOT_FOUND,
+    OUT_OF_STOCK,
+    INSUFFICIENT_POINTS
+)
+from order_writer import OrderWriter, OrderQueueFull
+from catalog import ProductCatalog
+from idempotency import IdempotencyStore
+from jobs import JobQueue
+from avatars import (
+    make_variants,
+    avatar_path,
+    variant_files,
+    is_content_hashed,
+    InvalidImage,
+    DEFAULT_SIZE as DEFAULT_AVATAR_SIZE
+)
+from fragment_cache import FragmentCache
+from static_assets import StaticAssets
+from compression import Compressor
+from startup import StartupReport, bytecode_cache, precompile_templates
+from metrics import RequestMetrics
+from slow_queries import SlowQueryLog
+from profiler import RequestProfiler
+from orders_read import (
+    ORDER_STATUSES,
+    fetch_order,
+    fetch_orders_page,
+    fetch_orders_by_status,
+    fetch_user_orders,
+    search_orders,
+    search_query,
+    count_orders_by_status,
+    total_revenue,
+    user_sales_summary
+)
 
 app = Flask(__name__)
 
+startup_report = StartupReport(_import_started)
+startup_report.record("imports", time.perf_counter() - _import_started)
+_setup_started = time.perf_counter()
+
 # ─── การตั้งค่าที่สำคัญ ────────────────────────────────────────────────
 app.secret_key = os.environ.get("SECRET_KEY") or "super-secret-key-change-this-2025-geotran-manss-xxxxxxxxxxxxxxxxxxxxxxxxxxxx"
 
@@ -32,85 +104,149 @@ def inject_csrf():
 
 # Database path
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DB = os.path.join(BASE_DIR, "database.db")
+DB = os.environ.get("DATABASE_PATH") or os.path.join(BASE_DIR, "database.db")
+
+# Jinja: เก็บ bytecode ของ template ที่ compile แล้วลงดิสก์ worker ใหม่ไม่ต้อง compile ซ้ำ
+# (JINJA_BYTECODE_CACHE=0 เพื่อปิด)
+_jinja_cache_dir = os.environ.get("JINJA_BYTECODE_CACHE") or os.path.join(BASE_DIR, "build", "jinja")
+if _jinja_cache_dir != "0":
+    app.jinja_env.bytecode_cache = bytecode_cache(_jinja_cache_dir)
+startup_report.watch_templates(app.jinja_env)
+
+# Pool ของ connection ต่อ worker (WAL + PRAGMA ที่จูนแล้ว ดู db.py)
+db_pool = ConnectionPool(
+    DB,
+    size=int(os.environ.get("DB_POOL_SIZE", 8)),
+    timeout=float(os.environ.get("DB_POOL_TIMEOUT", 10)),
+)
+db_pool.init_app(app)
+
+# latency ต่อ endpoint + จำนวน query/แถว/เวลา SQL ต่อ request ดูได้ที่ /metrics (METRICS=0 เพื่อปิด)
+request_metrics = RequestMetrics(server_timing=os.environ.get("SERVER_TIMING", "0") == "1")
+if os.environ.get("METRICS", "1") != "0":
+    request_metrics.init_app(app, db_pool)
+
+# statement ที่ช้ากว่า SLOW_QUERY_MS ถูกเขียนลง JSONL (หมุนไฟล์) พร้อม EXPLAIN QUERY PLAN
+# ดูสรุปที่ /admin/slow-queries (SLOW_QUERY_LOG=0 เพื่อปิด)
+slow_query_log = SlowQueryLog(
+    os.environ.get("SLOW_QUERY_LOG") or os.path.join(BASE_DIR, "logs", "slow_queries.jsonl"),
+    threshold_ms=float(os.environ.get("SLOW_QUERY_MS", 100)),
+    max_bytes=int(os.environ.get("SLOW_QUERY_LOG_BYTES", 5 * 1024 * 1024)),
+)
+if os.environ.get("SLOW_QUERY_LOG") != "0":
+    slow_query_log.init_pool(db_pool)
+
+# โปรไฟล์ request รายตัว (เปิดด้วย PROFILING=1): แอดมินใส่ ?_profile=1 หรือ ?_profile=pstats
+# หรือสุ่ม PROFILE_SAMPLE_RATE % ของ request ดาวน์โหลดได้ที่ /admin/profiles
+request_profiler = RequestProfiler(
+    os.environ.get("PROFILE_DIR") or os.path.join(BASE_DIR, "logs", "profiles"),
+    sample_rate=float(os.environ.get("PROFILE_SAMPLE_RATE", 0)),
+    mode=os.environ.get("PROFILE_MODE", "collapsed"),
+    keep=int(os.environ.get("PROFILE_KEEP", 100)),
+)
+if os.environ.get("PROFILING", "0") == "1":
+    request_profiler.init_app(app, skip_endpoints={"static", "admin_profiles", "admin_profile_download"})
+
+# event ออเดอร์ใหม่/เปลี่ยนสถานะ สำหรับหน้าแอดมิน (SSE)
+order_bus = EventBus()
+
+# รายการสินค้าหน้าร้าน (แคชใน memory ตรวจความสดจาก version ใน SQLite)
+catalog = ProductCatalog()
+
+# HTML ที่ render แล้วของส่วนที่ไม่ขึ้นกับผู้ใช้ (เช่นตารางสินค้าหน้าแรก)
+fragment_cache = FragmentCache(
+    max_entries=int(os.environ.get("FRAGMENT_CACHE_ENTRIES", 64)),
+    max_bytes=int(os.environ.get("FRAGMENT_CACHE_BYTES", 2 * 1024 * 1024)),
+)
+fragment_cache.enabled = os.environ.get("FRAGMENT_CACHE", "1") != "0"
+
+# ไฟล์ใน static/ เสิร์ฟด้วยชื่อที่มี hash ของเนื้อหา (Cache-Control: immutable) และมี .gz/.br ทำไว้ล่วงหน้า
+static_assets = StaticAssets(
+    app.static_folder,
+    os.environ.get("STATIC_BUILD_DIR") or os.path.join(BASE_DIR, "build", "static"),
+)
+static_assets.enabled = os.environ.get("STATIC_FINGERPRINT", "1") != "0"
+static_assets.init_app(app)
+if static_assets.enabled:
+    static_assets.build()
+
+# บีบอัด response ที่เป็นข้อความ (gzip/brotli) ตัวเล็กกว่า COMPRESS_MIN_SIZE ส่งตามเดิม
+compressor = Compressor(
+    min_size=int(os.environ.get("COMPRESS_MIN_SIZE", 1024)),
+    level=int(os.environ.get("COMPRESS_LEVEL", 6)),
+    brotli_quality=int(os.environ.get("COMPRESS_BROTLI_QUALITY", 4)),
+)
+compressor.enabled = os.environ.get("COMPRESS", "1") != "0"
+compressor.init_app(app)
+
+# หน้าใหญ่ (รายการออเดอร์) render แบบ stream ให้ browser ได้ส่วนหัวก่อน render เสร็จ
+app.config.setdefault('STREAM_TEMPLATES', os.environ.get("STREAM_TEMPLATES", "1") != "0")
+app.config.setdefault('STREAM_CHUNK_SIZE', 8 * 1024)
+
+def _coalesce(chunks, size):
+    # Jinja ส่งออกมาเป็นชิ้นเล็กมาก รวมเป็นก้อนละ ~size ก่อนเขียนลง socket / บีบอัด
+    buf, n = [], 0
+    for chunk in chunks:
+        buf.append(chunk)
+        n += len(chunk)
+        if n >= size:
+            yield "".join(buf)
+            buf, n = [], 0
+    if buf:
+        yield "".join(buf)
+
+def render_page(template_name, **context):
+    """render_template แบบ stream (ปิดด้วย STREAM_TEMPLATES=0)"""
+    if not app.config['STREAM_TEMPLATES']:
+        return render_template(template_name, **context)
+    # session ถูกบันทึกก่อน body เริ่ม render: สร้าง CSRF token และดึง flash ออกจาก session ไว้ก่อน
+    generate_csrf()
+    get_flashed_messages(with_categories=True)
+    chunks = stream_template(template_name, **context)
+    return Response(_coalesce(chunks, app.config['STREAM_CHUNK_SIZE']), mimetype="text/html")
+
+# token กันกดสั่งซ้ำ: ตาราง order_tokens กันข้าม worker (ตรวจใน transaction ของออเดอร์)
+# ส่วนนี้เป็นทางลัดใน memory ให้กดซ้ำที่มาถึง worker เดิมได้ order_id ทันทีโดยไม่ต้องรอ write lock
+order_tokens = IdempotencyStore(
+    ttl=int(os.environ.get("ORDER_TOKEN_TTL", 600)),
+    max_entries=int(os.environ.get("ORDER_TOKEN_ENTRIES", 10000)),
+)
+
+# โหมดเขียนออเดอร์ด้วยเธรดเดียวแบบ group commit (เปิดด้วย ORDER_WRITER=1 ช่วงออเดอร์เข้าหนัก)
+order_writer = OrderWriter(
+    db_pool,
+    max_batch=int(os.environ.get("ORDER_WRITER_BATCH", 32)),
+    max_wait_ms=float(os.environ.get("ORDER_WRITER_WAIT_MS", 2)),
+    max_queue=int(os.environ.get("ORDER_WRITER_QUEUE", 512)),
+)
+order_writer.enabled = os.environ.get("ORDER_WRITER", "0") == "1"
+
+# งานเบื้องหลัง (ตาราง jobs + worker thread) สำหรับงานที่ไม่ต้องให้ผู้ใช้รอ
+job_queue = JobQueue(db_pool, workers=int(os.environ.get("JOB_WORKERS", 2)))
+
+@app.before_request
+def start_job_workers():
+    # เริ่ม worker ใน process ที่รับ request จริง (หลัง fork) ไม่ใช่ตอน import
+    job_queue.start()
+
+@app.before_request
+def report_startup():
+    if startup_report.first_request():
+        app.logger.info("startup report: %s", startup_report.snapshot())
 
 def get_db():
-    conn = sqlite3.connect(DB)
-    conn.row_factory = sqlite3.Row
-    return conn
+    # ใน request ใช้ connection เดียวกันตลอด แล้วคืนเข้า pool ตอน teardown
+    if has_app_context():
+        return db_pool.request_connection()
+    # นอก request (เช่น init_db ตอนเริ่มโปรแกรม) เปิด connection แยก
+    return db_pool.connect()
 
 def init_db():
-    with get_db() as conn:
+    with startup_report.phase("init_db"), get_db() as conn:
+        # สร้าง/อัปเกรดตารางและ index ตาม migrations.py
+        run_migrations(conn)
         c = conn.cursor()
 
-        # สินค้า
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS products (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            price INTEGER NOT NULL,
-            category TEXT DEFAULT 'อื่นๆ'
-        )
-        """)
-        try:
-            c.execute("ALTER TABLE products ADD COLUMN category TEXT DEFAULT 'อื่นๆ'")
-        except sqlite3.OperationalError:
-            pass
-
-        # ผู้ใช้
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            created_at TEXT NOT NULL,
-            is_admin INTEGER DEFAULT 0,
-            phone TEXT
-        )
-        """)
-
-        # user_points
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS user_points (
-            user_id INTEGER PRIMARY KEY,
-            available_points INTEGER DEFAULT 0,
-            earned_points INTEGER DEFAULT 0,
-            redeemed_points INTEGER DEFAULT 0,
-            pending_points INTEGER DEFAULT 0,
-            last_updated TEXT,
-            FOREIGN KEY (user_id) REFERENCES users(id)
-        )
-        """)
-
-        # redeemed_rewards
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS redeemed_rewards (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            reward_name TEXT,
-            points_used INTEGER,
-            redeemed_at TEXT,
-            FOREIGN KEY (user_id) REFERENCES users(id)
-        )
-        """)
-
-        # rewards
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS rewards (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            points_required INTEGER NOT NULL,
-            stock INTEGER DEFAULT 999,
-            description TEXT,
-            is_active INTEGER DEFAULT 1,
-            image_url TEXT  -- เพิ่มบรรทัดนี้
-        )
-        """)
-        try:
-            c.execute("ALTER TABLE rewards ADD COLUMN image_url TEXT")
-        except sqlite3.OperationalError:
-            pass  # มีแล้ว ข้าม
         c.execute("SELECT COUNT(*) FROM rewards")
         if c.fetchone()[0] == 0:
             sample_rewards = [
@@ -122,40 +258,12 @@ def init_db():
                 VALUES (?, ?, ?, ?, ?, ?)
             """, sample_rewards)
             conn.commit()
-        # ออเดอร์
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS orders (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            customer_name TEXT NOT NULL,
-            phone TEXT NOT NULL,
-            created_at TEXT NOT NULL,
-            user_id INTEGER,
-            status TEXT DEFAULT 'pending',
-            total INTEGER DEFAULT 0,
-            updated_at TEXT,
-            FOREIGN KEY (user_id) REFERENCES users(id)
-        )
-        """)
-
-        # order_items
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS order_items (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            order_id INTEGER NOT NULL,
-            product_name TEXT NOT NULL,
-            price INTEGER NOT NULL,
-            quantity INTEGER NOT NULL,
-            FOREIGN KEY (order_id) REFERENCES orders(id)
-        )
-        """)
-
-        conn.commit()
 
         # สร้าง admin ถ้ายังไม่มี
         c.execute("SELECT 1 FROM users WHERE username = 'admin'")
         if not c.fetchone():
             admin_hash = hash_password("admin123")  # เปลี่ยนรหัสผ่านจริง ๆ
-            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            now = int(time.time())
             c.execute(
                 "INSERT INTO users (username, email, password_hash, created_at, is_admin, phone) "
                 "VALUES (?, ?, ?, ?, ?, ?)",
@@ -222,7 +330,7 @@ def register():
                 flash("ข้อมูลนี้ถูกใช้งานแล้ว", "danger")
                 return redirect(url_for("register"))
 
-            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            now = int(time.time())
             pw_hash = hash_password(password)
 
             c.execute(
@@ -280,14 +388,41 @@ def logout():
 
 
 
-# กำหนดโฟลเดอร์สำหรับเก็บรูปโปรไฟล์
-UPLOAD_FOLDER = os.path.join('static', 'uploads', 'profiles')
+# กำหนดโฟลเดอร์สำหรับเก็บรูปโปรไฟล์ (รูปที่ย่อแล้ว) และไฟล์อัปโหลดที่รอประมวลผล (ไม่อยู่ใต้ static)
+UPLOAD_FOLDER = os.path.join(app.static_folder, 'uploads', 'profiles')
+UPLOAD_SPOOL = os.environ.get("UPLOAD_SPOOL") or os.path.join(BASE_DIR, 'uploads', 'incoming')
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
 # สร้างโฟลเดอร์ถ้ายังไม่มี
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+os.makedirs(UPLOAD_SPOOL, exist_ok=True)
+
+app.jinja_env.filters['avatar'] = avatar_path
+
+@app.after_request
+def immutable_upload_cache(response):
+    # รูปโปรไฟล์ที่ชื่อเป็น hash ของเนื้อหาไม่มีวันเปลี่ยน ให้ browser แคชได้ยาว
+    if request.path.startswith("/static/uploads/profiles/") and is_content_hashed(request.path):
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
+
+def spool_profile_picture(conn, user_id, save, ext):
+    """เก็บไฟล์ต้นฉบับไว้ใน spool แล้วเข้าคิวงานย่อรูป (ผู้เรียก commit แล้ว job_queue.notify() เอง)"""
+    spool_path = os.path.join(UPLOAD_SPOOL, f"{user_id}-{uuid.uuid4().hex}.{ext}")
+    save(spool_path)
+    job_queue.enqueue(conn, "profile_picture", {"user_id": user_id, "spool": spool_path, "ext": ext})
+
+def remove_unused_picture(conn, path):
+    # ลบไฟล์รูปเก่า (ทุกขนาด) ถ้าไม่มีผู้ใช้คนไหนใช้อยู่แล้ว
+    if conn.execute("SELECT 1 FROM users WHERE profile_picture = ?", (path,)).fetchone():
+        return
+    for file_path in variant_files(path, app.static_folder):
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -307,14 +442,14 @@ def profile():
 
             # จัดการอัปโหลดรูปโปรไฟล์
             profile_pic = request.files.get("profile_picture")
-            profile_pic_path = None
+            profile_pic_queued = False
 
             if profile_pic and profile_pic.filename != '':
                 if allowed_file(profile_pic.filename):
-                    filename = secure_filename(f"{session['user_id']}_{profile_pic.filename}")
-                    file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                    profile_pic.save(file_path)
-                    profile_pic_path = f"uploads/profiles/{filename}"
+                    # ย่อรูป/ลบ EXIF ทำในงานเบื้องหลัง หน้านี้แค่เก็บไฟล์ต้นฉบับลง spool
+                    ext = profile_pic.filename.rsplit('.', 1)[1].lower()
+                    spool_profile_picture(conn, session["user_id"], profile_pic.save, ext)
+                    profile_pic_queued = True
                 else:
                     flash("ไฟล์รูปไม่รองรับ (รองรับ .jpg, .jpeg, .png เท่านั้น)", "danger")
                     return redirect(url_for("profile"))
@@ -339,10 +474,6 @@ def profile():
                 updates.append("phone = ?")
                 params.append(new_phone)
 
-            if profile_pic_path:
-                updates.append("profile_picture = ?")
-                params.append(profile_pic_path)
-
             if new_password:
                 updates.append("password_hash = ?")
                 params.append(hash_password(new_password))
@@ -364,6 +495,11 @@ def profile():
                 except sqlite3.IntegrityError:
                     flash("ชื่อผู้ใช้, อีเมล หรือเบอร์โทรนี้ถูกใช้งานแล้ว", "danger")
 
+            if profile_pic_queued:
+                conn.commit()
+                job_queue.notify()
+                flash("ได้รับรูปโปรไฟล์แล้ว รูปใหม่จะแสดงในไม่กี่วินาที", "success")
+
         # ดึงข้อมูลล่าสุด
         user = conn.execute(
             "SELECT username, email, phone, created_at, profile_picture FROM users WHERE id = ?",
@@ -377,14 +513,26 @@ def profile():
 @app.route("/")
 def index():
     with get_db() as conn:
-        products = conn.execute("SELECT * FROM products ORDER BY category, name").fetchall()
+        products = catalog.get(conn)
+
+    # ตารางสินค้าขึ้นกับ catalog อย่างเดียว จึงแคช HTML ไว้ตาม version
+    # (ชื่อ/เบอร์จาก session, success, ปี และ CSRF token อยู่นอกส่วนที่แคช)
+    product_grid = fragment_cache.get_or_render(
+        ("index_product_grid", products.version),
+        lambda: render_template(
+            "index_product_grid.html",
+            products=products.products,
+            products_by_category=products.by_category
+        )
+    )
 
     success = request.args.get("success")
 
     return render_template(
         "index.html",
-        products=products,
+        product_grid=product_grid,
         success=success,
+        order_token=uuid.uuid4().hex,
         current_year=datetime.now().year
     )
 
@@ -393,105 +541,245 @@ def index():
 def order():
     name = request.form.get("name", "").strip()
     phone = request.form.get("phone", "").strip()
-    product_ids = request.form.getlist("product_id")
+    cart = parse_cart(request.form)
 
-    if not name or not phone or not product_ids:
+    if not name or not phone or not cart:
         return "ข้อมูลไม่ครบถ้วน", 400
 
     user_id = session.get("user_id")  # บันทึกว่าใครเป็นคนสั่ง (ถ้าล็อกอิน)
 
-    with get_db() as conn:
-        c = conn.cursor()
-        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    # order_token มาจากฟอร์มหน้าแรก (หนึ่งค่าต่อการเปิดหน้า) POST ซ้ำได้ order_id เดิมโดยไม่เขียนใหม่
+    order_token = request.form.get("order_token", "")[:64]
 
-        c.execute(
-            "INSERT INTO orders (customer_name, phone, created_at, user_id) VALUES (?, ?, ?, ?)",
-            (name, phone, now, user_id)
-        )
-        order_id = c.lastrowid
+    with get_db() as conn:
+        # ราคาสินค้ามาจาก catalog ใน memory แล้วเขียนทั้งออเดอร์ใน transaction เดียว
+        products = catalog.get(conn).prices
 
-        for pid in product_ids:
-            qty_str = request.form.get(f"qty_{pid}", "0")
+        def write_order():
+            # คืน (order_id, replayed) หรือ None ถ้าไม่มีสินค้าที่ใช้ได้
+            token_args = {"token": order_token or None, "token_ttl": order_tokens.ttl}
             try:
-                qty = int(qty_str)
-            except ValueError:
-                qty = 0
-
-            if qty > 0:
-                product = conn.execute(
-                    "SELECT name, price FROM products WHERE id = ?",
-                    (pid,)
-                ).fetchone()
-
-                if product:
-                    c.execute(
-                        "INSERT INTO order_items (order_id, product_name, price, quantity) VALUES (?, ?, ?, ?)",
-                        (order_id, product["name"], product["price"], qty)
-                    )
+                if order_writer.enabled:
+                    order_id = order_writer.place_order(name, phone, user_id, cart, products, **token_args)
+                else:
+                    order_id = place_order(conn, name, phone, user_id, cart, products=products, **token_args)
+            except DuplicateOrder as e:
+                # token นี้ถูกใช้ไปแล้ว (อาจจาก worker อื่น) ได้ออเดอร์เดิมกลับไป
+                return e.order_id, True
+            return (order_id, False) if order_id is not None else None
 
-        conn.commit()
+        try:
+            if order_token:
+                placed, replayed = order_tokens.run((order_token, phone), write_order)
+            else:
+                placed, replayed = write_order(), False
+        except OrderQueueFull:
+            return "ขณะนี้มีออเดอร์เข้ามาจำนวนมาก กรุณาลองใหม่อีกครั้ง", 503, {"Retry-After": "2"}
+        if placed is None:
+            return "ไม่พบสินค้าที่เลือก", 400
+        order_id, replayed = placed[0], replayed or placed[1]
+
+        if not replayed:
+            publish_order_change(conn, order_id)
 
-    return redirect("/?success=1")
+    response = redirect("/?success=1")
+    response.headers["X-Order-Id"] = str(order_id)
+    return response
 
 
 # ─── Admin ─────────────────────────────────────────────────────
 
 # ─── Admin ─────────────────────────────────────────────────────
 
+# สถานะที่มีแท็บในหน้าแอดมิน และปุ่มถัดไปของแต่ละสถานะ
+ORDER_TABS = ORDER_STATUSES
+TAB_ACTIONS = {
+    'pending':   {'next_status': 'confirmed', 'action_text': 'ยืนยันรับออเดอร์',     'action_class': 'btn-confirm'},
+    'confirmed': {'next_status': 'preparing', 'action_text': 'จัดของเสร็จแล้ว',      'action_class': 'btn-prepare'},
+    'preparing': {'next_status': 'completed', 'action_text': 'ปิดจ๊อบ / ส่งเรียบร้อย', 'action_class': 'btn-complete'},
+    'completed': {},
+}
+
+app.config.setdefault('ADMIN_PAGE_SIZE', 20)
+
+def publish_order_change(conn, order_id, prev_status=None):
+    # ส่งเฉพาะออเดอร์ที่เปลี่ยน + จำนวนแต่ละสถานะ ให้หน้าแอดมินที่เปิดอยู่ (SSE)
+    order_bus.publish("order", {
+        'order': fetch_order(conn, order_id),
+        'prev_status': prev_status,
+        'counts': count_orders_by_status(conn),
+    })
+
 @app.route("/admin")
 def admin():
     if not session.get("is_admin"):
         return redirect(url_for("index"))
 
-    with get_db() as conn:
-        rows = conn.execute("""
-            SELECT o.id, o.customer_name, o.phone, o.created_at, o.status, o.total,
-                oi.product_name AS product, oi.price, oi.quantity AS qty,
-                u.profile_picture
-            FROM orders o
-            LEFT JOIN order_items oi ON o.id = oi.order_id
-            LEFT JOIN users u ON o.user_id = u.id
-            ORDER BY o.created_at DESC
-        """).fetchall()
+    active_tab = request.args.get("tab", "pending")
+    if active_tab not in ORDER_TABS:
+        active_tab = "pending"
 
-    grouped = {}
-    for r in rows:
-        oid = r['id']
-        if oid not in grouped:
-            grouped[oid] = {
-                'id': oid, 'customer_name': r['customer_name'], 'phone': r['phone'],
-                'created_at': r['created_at'], 'status': r['status'] or 'pending',
-                'items': [], 'total': 0
-            }
-        if r['product']:
-            sub = r['price'] * r['qty']
-            grouped[oid]['items'].append({'product': r['product'], 'price': r['price'], 'qty': r['qty'], 'subtotal': sub})
-            grouped[oid]['total'] += sub
-            grouped[oid]['profile_picture'] = r['profile_picture']
-
-    # แยกตามสถานะ
-    pending_orders   = {k:v for k,v in grouped.items() if v['status'] == 'pending'}
-    confirmed_orders = {k:v for k,v in grouped.items() if v['status'] == 'confirmed'}
-    preparing_orders = {k:v for k,v in grouped.items() if v['status'] == 'preparing'}
-    completed_orders = {k:v for k,v in grouped.items() if v['status'] == 'completed'}
-
-    counts = {
-        'pending_count': len(pending_orders),
-        'confirmed_count': len(confirmed_orders),
-        'preparing_count': len(preparing_orders),
-        'completed_count': len(completed_orders),
-        'total_revenue': sum(o['total'] for o in grouped.values())
-    }
+    # โหลดเฉพาะหน้าแรกของแท็บที่เปิดอยู่ แท็บอื่นโหลดตอนกดเปิด (/admin/orders/page)
+    with get_db() as conn:
+        counts = count_orders_by_status(conn)
+        counts['total_revenue'] = total_revenue(conn)
+        orders, next_cursor = fetch_orders_page(conn, active_tab, limit=app.config['ADMIN_PAGE_SIZE'])
 
-    return render_template(
+    return render_page(
         "admin.html",
-        pending_orders=pending_orders,
-        confirmed_orders=confirmed_orders,
-        preparing_orders=preparing_orders,
-        completed_orders=completed_orders,
+        tabs=ORDER_TABS,
+        active_tab=active_tab,
+        orders=orders,
+        next_cursor=next_cursor,
+        status=active_tab,
+        **TAB_ACTIONS[active_tab],
         **counts
     )
-    
+
+@app.route("/admin/orders/page")
+def admin_orders_page():
+    if not session.get("is_admin"):
+        return "Unauthorized", 403
+
+    status = request.args.get("status", "pending")
+    if status not in ORDER_TABS:
+        return "Invalid status", 400
+
+    with get_db() as conn:
+        orders, next_cursor = fetch_orders_page(
+            conn, status, request.args.get("cursor"), limit=app.config['ADMIN_PAGE_SIZE']
+        )
+
+    return render_template(
+        "admin_orders_page.html",
+        orders=orders,
+        next_cursor=next_cursor,
+        status=status,
+        first_page=not request.args.get("cursor"),
+        **TAB_ACTIONS[status]
+    )
+
+app.config.setdefault('ADMIN_SEARCH_PAGE_SIZE', 20)
+app.config.setdefault('ADMIN_SEARCH_MAX_PAGE_SIZE', 100)
+
+def _local_day_start(value):
+    # วันที่ YYYY-MM-DD ตามเวลาท้องถิ่น -> epoch ของเที่ยงคืนวันนั้น
+    return int(datetime.strptime(value, "%Y-%m-%d").timestamp())
+
+@app.route("/admin/orders/search")
+def admin_orders_search():
+    """ค้นออเดอร์จากชื่อลูกค้า เบอร์โทร หรือชื่อสินค้า (ขึ้นต้นด้วยคำค้น ทุกคำต้องเจอ)
+
+    ?q=คำค้น &status=pending|... &from=YYYY-MM-DD &to=YYYY-MM-DD (รวมวันนั้น) &cursor= &limit=
+    """
+    if not session.get("is_admin"):
+        return jsonify({"error": "Unauthorized"}), 403
+
+    match = search_query(request.args.get("q"))
+    if match is None:
+        return jsonify({"error": "ต้องระบุคำค้น (q)"}), 400
+    status = request.args.get("status") or None
+    if status is not None and status not in ORDER_STATUSES:
+        return jsonify({"error": "Invalid status"}), 400
+    try:
+        since = _local_day_start(request.args["from"]) if request.args.get("from") else None
+        until = _local_day_start(request.args["to"]) + 86400 if request.args.get("to") else None
+    except ValueError:
+        return jsonify({"error": "วันที่ต้องเป็นรูปแบบ YYYY-MM-DD"}), 400
+    limit = request.args.get("limit", app.config['ADMIN_SEARCH_PAGE_SIZE'], type=int)
+    limit = max(1, min(limit, app.config['ADMIN_SEARCH_MAX_PAGE_SIZE']))
+
+    started = time.perf_counter()
+    with get_db() as conn:
+        orders, next_cursor = search_orders(
+            conn, match, status=status, since=since, until=until,
+            cursor=request.args.get("cursor"), limit=limit
+        )
+
+    return jsonify({
+        'orders': [{
+            'id': order.id,
+            'customer_name': order.customer_name,
+            'phone': order.phone,
+            'status': order.status,
+            'total': order.total,
+            'item_count': order.item_count,
+            'created_at': order.created_at,
+            'created_at_text': dateformat(order.created_at),
+            'items': [{'product': item.product, 'price': item.price, 'qty': item.qty} for item in order.items],
+            'url': url_for('admin_view_order', order_id=order.id),
+        } for order in orders],
+        'next_cursor': next_cursor,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+    })
+
+app.config.setdefault('ADMIN_STREAM_HEARTBEAT', 15)    # วินาที
+app.config.setdefault('ADMIN_STREAM_MAX_AGE', 300)      # ปิด stream ให้ browser ต่อใหม่เอง
+
+def render_order_card(order):
+    if order.status == 'completed':
+        return render_template("admin_completed_card.html", order=order)
+    return render_template("admin_order_card.html", order=order, **TAB_ACTIONS.get(order.status, {}))
+
+def _current_orders_version():
+    # ยืม connection แค่ช่วงอ่าน stream เปิดค้างได้หลายนาทีจึงไม่ถือ connection ของ pool ไว้
+    conn = db_pool.acquire()
+    try:
+        return read_orders_version(conn)
+    finally:
+        db_pool.release(conn)
+
+@app.route("/admin/orders/stream")
+def admin_orders_stream():
+    if not session.get("is_admin"):
+        return "Unauthorized", 403
+
+    last_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    after = order_bus.parse_id(last_id)
+
+    @stream_with_context
+    def generate():
+        yield "retry: 2000\n\n"
+        seq = after
+        if seq is None:
+            # resume ไม่ได้ (restart หรือหลุดนานเกินบัฟเฟอร์) ให้ client โหลดใหม่ทั้งแท็บ
+            seq = order_bus.last_seq
+            yield sse_message("reset", {}, order_bus.event_id(seq))
+
+        # order_bus เห็นแค่ออเดอร์ของ worker นี้ ทุก heartbeat จึงเทียบ change version ในฐานข้อมูลด้วย
+        # ถ้าขยับ (worker อื่นเขียน หรือ event ของ worker นี้เอง) ส่ง refresh ให้ client โหลดแท็บที่เปิดอยู่ใหม่
+        heartbeat = app.config['ADMIN_STREAM_HEARTBEAT']
+        version = _current_orders_version()
+        next_check = time.monotonic() + heartbeat
+        deadline = time.monotonic() + app.config['ADMIN_STREAM_MAX_AGE']
+        while time.monotonic() < deadline:
+            events = order_bus.wait(seq, heartbeat)
+            if time.monotonic() >= next_check:
+                next_check = time.monotonic() + heartbeat
+                current = _current_orders_version()
+                if current != version:
+                    version = current
+                    yield sse_message("refresh", {})
+                    continue
+            if not events:
+                yield ": keep-alive\n\n"
+                continue
+            for seq, event, data in events:
+                order = data['order']
+                payload = {
+                    'order_id': order.id if order else None,
+                    'status': order.status if order else None,
+                    'prev_status': data['prev_status'],
+                    'counts': data['counts'],
+                    'html': render_order_card(order) if order else '',
+                }
+                yield sse_message(event, payload, order_bus.event_id(seq))
+
+    return Response(generate(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
 from flask import flash, redirect, url_for, request, session
 from datetime import datetime
 
@@ -521,41 +809,27 @@ def update_order_status(order_id):
             flash(f"ไม่สามารถเปลี่ยนสถานะจาก '{current_status}' เป็น '{next_status}'", "warning")
             return redirect(url_for("admin"))
 
-        if next_status == 'completed':
-            total = conn.execute(
-                "SELECT SUM(price * quantity) FROM order_items WHERE order_id = ?",
-                (order_id,)
-            ).fetchone()[0] or 0
-
-            points_earned = total // 10
-
-            # Debug print
-            print(f"[DEBUG] Order #{order_id} completed | Total: {total} บาท | Earn {points_earned} points")
-
-            user_row = conn.execute(
-                "SELECT user_id FROM orders WHERE id = ?",
-                (order_id,)
-            ).fetchone()
-
-            if user_row and user_row['user_id']:
-                print(f"[DEBUG] Updating points for user_id: {user_row['user_id']}")
-                conn.execute("""
-                    UPDATE user_points 
-                    SET 
-                        available_points = available_points + ?,
-                        earned_points = earned_points + ?,
-                        last_updated = ?
-                    WHERE user_id = ?
-                """, (points_earned, points_earned, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), user_row['user_id']))
-            else:
-                print("[DEBUG] No user_id found → points NOT added")
-
+        now = int(time.time())
         try:
-            conn.execute(
-                "UPDATE orders SET status = ?, updated_at = ? WHERE id = ?",
-                (next_status, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), order_id)
-            )
+            # จอง write lock ก่อน แล้วเปลี่ยนสถานะแบบมีเงื่อนไข (แอดมินกดซ้ำ/กดพร้อมกันจะสำเร็จแค่ครั้งเดียว)
+            conn.execute("BEGIN IMMEDIATE")
+            changed = conn.execute(
+                "UPDATE orders SET status = ?, updated_at = ? WHERE id = ? AND COALESCE(status, 'pending') = ?",
+                (next_status, now, order_id, current_status)
+            ).rowcount
+            if not changed:
+                conn.rollback()
+                flash(f"ออเดอร์ #{order_id} ถูกเปลี่ยนสถานะไปแล้ว", "warning")
+                return redirect(url_for("admin"))
+
+            if next_status == 'completed':
+                # แต้ม + ยอดขายรายวันทำในงานเบื้องหลัง (commit พร้อมการเปลี่ยนสถานะ งานจึงไม่หาย)
+                job_queue.enqueue(conn, "order_completed", {"order_id": order_id})
+
             conn.commit()
+            if next_status == 'completed':
+                job_queue.notify()
+            publish_order_change(conn, order_id, current_status)
 
             status_display = {
                 'confirmed': 'ยืนยันแล้ว',
@@ -570,6 +844,48 @@ def update_order_status(order_id):
 
     return redirect(url_for("admin"))
 
+# ─── งานเบื้องหลัง ─────────────────────────────────────────────────
+@job_queue.handler("order_completed")
+def order_completed_job(conn, payload):
+    # ledger กันแต้มซ้ำต่อออเดอร์ ยอดขายรายวันจึงบวกเฉพาะครั้งที่ให้แต้มจริง (งานรันซ้ำได้)
+    order_id = payload["order_id"]
+    conn.execute("BEGIN IMMEDIATE")
+    row = conn.execute(
+        "SELECT user_id, total FROM orders WHERE id = ? AND status = 'completed'", (order_id,)
+    ).fetchone()
+    if row and row[0]:
+        if award_order_points(conn, row[0], order_id, (row[1] or 0) // 10):
+            record_completed_sale(conn, order_id)
+    conn.commit()
+
+@job_queue.handler("profile_picture")
+def profile_picture_job(conn, payload):
+    spool_path = payload["spool"]
+    if not os.path.exists(spool_path):
+        return  # งานนี้ทำเสร็จไปแล้ว (ถูกรันซ้ำหลัง lease หมด)
+    with open(spool_path, "rb") as f:
+        data = f.read()
+    try:
+        variants = make_variants(data, UPLOAD_FOLDER, "uploads/profiles", payload.get("ext", "jpg"))
+    except InvalidImage as e:
+        app.logger.warning("profile picture for user %s is not a readable image: %s", payload["user_id"], e)
+        os.remove(spool_path)
+        return
+
+    new_path = variants[DEFAULT_AVATAR_SIZE]
+    with conn:
+        old = conn.execute("SELECT profile_picture FROM users WHERE id = ?", (payload["user_id"],)).fetchone()
+        # trigger เพิ่ม change version ของ orders (migration 16) การ์ดออเดอร์ในหน้าแอดมินจึงโหลดรูปใหม่
+        # ก่อนที่ไฟล์เดิมจะถูกลบด้านล่าง
+        conn.execute("UPDATE users SET profile_picture = ? WHERE id = ?", (new_path, payload["user_id"]))
+    os.remove(spool_path)
+    if old and old[0] and old[0] != new_path:
+        remove_unused_picture(conn, old[0])
+
+@job_queue.handler("contact_message")
+def contact_message_job(conn, payload):
+    app.logger.info("contact message from %s <%s>: %s", payload.get("name"), payload.get("email"), payload.get("message"))
+
 @app.route("/admin/products")
 def admin_products():
     with get_db() as conn:
@@ -599,6 +915,7 @@ def add_product():
     with get_db() as conn:
         conn.execute("INSERT INTO products (name, price) VALUES (?, ?)", (name, price))
         conn.commit()
+    catalog.invalidate()
 
     return redirect("/admin/products?success=เพิ่มสินค้าแล้ว")
 
@@ -653,6 +970,7 @@ def edit_product(pid):
                 (name, price_int, category, pid)
             )
             conn.commit()
+            catalog.invalidate()
             flash("แก้ไขสินค้าเรียบร้อยแล้ว", "success")
         except Exception as e:
             flash(f"เกิดข้อผิดพลาดในการบันทึก: {str(e)}", "danger")
@@ -675,17 +993,21 @@ def delete_product(pid):
 
         conn.execute("DELETE FROM products WHERE id = ?", (pid,))
         conn.commit()
+    catalog.invalidate()
 
     return redirect("/admin/products?success=ลบสินค้าแล้ว")
 
+# เวลาในฐานข้อมูลเป็น epoch วินาที แปลงเป็นข้อความครั้งเดียวต่อค่า (หน้าแอดมินเรนเดอร์ซ้ำบ่อย)
+@lru_cache(maxsize=4096)
+def _format_epoch(value, format):
+    return datetime.fromtimestamp(value).strftime(format)
+
 def dateformat(value, format='%d %b %Y %H:%M น.'):
     if value is None:
         return ""
-    try:
-        dt = datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
-        return dt.strftime(format)
-    except:
-        return value  # ถ้าแปลงไม่ได้ ให้คืนค่าเดิม
+    if isinstance(value, (int, float)):
+        return _format_epoch(int(value), format)
+    return value  # ข้อความที่จัดรูปแบบมาแล้ว (เช่น current_time) คืนค่าเดิม
 
 app.jinja_env.filters['dateformat'] = dateformat
 
@@ -701,48 +1023,9 @@ def my_orders():
 
     with get_db() as conn:
         # ดึงข้อมูลออเดอร์ของผู้ใช้คนนี้เท่านั้น
-        rows = conn.execute("""
-            SELECT 
-                orders.id,
-                orders.customer_name,
-                orders.phone,
-                orders.created_at,
-                orders.status,
-                order_items.product_name,
-                order_items.price,
-                order_items.quantity
-            FROM orders
-            LEFT JOIN order_items ON orders.id = order_items.order_id
-            WHERE orders.user_id = ?
-            ORDER BY orders.created_at DESC
-        """, (user_id,)).fetchall()
-
-    # จัดกลุ่มข้อมูลตาม order_id
-    grouped = {}
-    for r in rows:
-        oid = r["id"]
-        if oid not in grouped:
-            grouped[oid] = {
-                "id": oid,
-                "customer_name": r["customer_name"],
-                "phone": r["phone"],
-                "created_at": r["created_at"],
-                "status": r["status"] or "pending",
-                "items": [],
-                "total": 0
-            }
-
-        if r["product_name"]:  # มีรายการสินค้า
-            subtotal = r["price"] * r["quantity"]
-            grouped[oid]["items"].append({
-                "product": r["product_name"],
-                "price": r["price"],
-                "qty": r["quantity"],
-                "subtotal": subtotal
-            })
-            grouped[oid]["total"] += subtotal
+        grouped = fetch_user_orders(conn, user_id)
 
-    return render_template(
+    return render_page(
         "my_orders.html",
         orders=grouped,
         user_name=session.get("username", "ผู้ใช้")
@@ -765,8 +1048,9 @@ def contact():
         email = request.form.get("email")
         message = request.form.get("message")
 
-        print("Contact message:")
-        print(name, email, message)
+        with get_db() as conn:
+            job_queue.enqueue(conn, "contact_message", {"name": name, "email": email, "message": message})
+        job_queue.notify()
 
         return render_template("contact.html", success=True)
 
@@ -781,65 +1065,17 @@ def dashboard():
     user_id = session["user_id"]
 
     with get_db() as conn:
-        # 1. ยอดสัปดาห์นี้ (7 วันล่าสุด)
-        weekly_total = conn.execute("""
-            SELECT COALESCE(SUM(oi.price * oi.quantity), 0)
-            FROM orders o
-            LEFT JOIN order_items oi ON o.id = oi.order_id
-            WHERE o.user_id = ?
-            AND o.created_at >= date('now', '-7 days')
-            AND o.status = 'completed'
-        """, (user_id,)).fetchone()[0]
-
-        # 2. ยอดเดือนนี้
-        monthly_total = conn.execute("""
-            SELECT COALESCE(SUM(oi.price * oi.quantity), 0)
-            FROM orders o
-            LEFT JOIN order_items oi ON o.id = oi.order_id
-            WHERE o.user_id = ?
-            AND strftime('%Y-%m', o.created_at) = strftime('%Y-%m', 'now')
-            AND o.status = 'completed'
-        """, (user_id,)).fetchone()[0]
-
-        # 3. ยอดปีนี้ (เพิ่มบรรทัดนี้!)
-        yearly_total = conn.execute("""
-            SELECT COALESCE(SUM(oi.price * oi.quantity), 0)
-            FROM orders o
-            LEFT JOIN order_items oi ON o.id = oi.order_id
-            WHERE o.user_id = ?
-            AND strftime('%Y', o.created_at) = strftime('%Y', 'now')
-            AND o.status = 'completed'
-        """, (user_id,)).fetchone()[0]
-
-        # 4. ยอดทั้งหมด
-        all_time_total = conn.execute("""
-            SELECT COALESCE(SUM(oi.price * oi.quantity), 0)
-            FROM orders o
-            LEFT JOIN order_items oi ON o.id = oi.order_id
-            WHERE o.user_id = ? AND o.status = 'completed'
-        """, (user_id,)).fetchone()[0]
-
-        # 5. ข้อมูลกราฟรายเดือน (6 เดือนล่าสุด)
-        monthly_rows = conn.execute("""
-            SELECT strftime('%Y-%m', o.created_at) AS month,
-                   COALESCE(SUM(oi.price * oi.quantity), 0) AS total
-            FROM orders o
-            LEFT JOIN order_items oi ON o.id = oi.order_id
-            WHERE o.user_id = ?
-            AND o.created_at >= date('now', '-6 months')
-            AND o.status = 'completed'
-            GROUP BY month
-            ORDER BY month ASC
-        """, (user_id,)).fetchall()
+        # 1-5. ยอดสัปดาห์/เดือน/ปี/ทั้งหมด + กราฟ 6 เดือน จาก rollup รายวัน (query เดียว)
+        sales = user_sales_summary(conn, user_id)
 
         monthly_labels = []
         monthly_data = []
-        for row in monthly_rows:
-            y, m = row['month'].split('-')
+        for month, total in sales['monthly_chart']:
+            y, m = month.split('-')
             month_name = ['ม.ค.', 'ก.พ.', 'มี.ค.', 'เม.ย.', 'พ.ค.', 'มิ.ย.', 
                           'ก.ค.', 'ส.ค.', 'ก.ย.', 'ต.ค.', 'พ.ย.', 'ธ.ค.'][int(m)-1]
             monthly_labels.append(f"{month_name} {y}")
-            monthly_data.append(int(row['total']))
+            monthly_data.append(int(total))
 
         # 6. แต้ม (ใช้ fallback ถ้าตารางไม่มี)
         try:
@@ -856,10 +1092,10 @@ def dashboard():
 
     return render_template(
         "dashboard.html",
-        weekly_total=weekly_total,
-        monthly_total=monthly_total,
-        yearly_total=yearly_total,          # ← เพิ่มบรรทัดนี้!
-        all_time_total=all_time_total,
+        weekly_total=sales['weekly_total'],
+        monthly_total=sales['monthly_total'],
+        yearly_total=sales['yearly_total'],
+        all_time_total=sales['all_time_total'],
         monthly_labels=monthly_labels,
         monthly_data=monthly_data,
         available_points=available_points,
@@ -869,6 +1105,14 @@ def dashboard():
         current_time=datetime.now().strftime("%d %b %Y %H:%M น.")
     )
 
+REDEEM_HISTORY_SQL = register_hot_query("redeem_history", """
+    SELECT reward_name, points_used, redeemed_at 
+    FROM redeemed_rewards 
+    WHERE user_id = ? 
+    ORDER BY redeemed_at DESC 
+    LIMIT 10
+""", (1,))
+
 @app.route("/rewards")
 def rewards():
     if "user_id" not in session:
@@ -891,13 +1135,7 @@ def rewards():
             ORDER BY points_required ASC
         """).fetchall()
 
-        history = conn.execute("""
-            SELECT reward_name, points_used, redeemed_at 
-            FROM redeemed_rewards 
-            WHERE user_id = ? 
-            ORDER BY redeemed_at DESC 
-            LIMIT 10
-        """, (user_id,)).fetchall()
+        history = conn.execute(REDEEM_HISTORY_SQL, (user_id,)).fetchall()
 
     return render_template(
         "rewards.html",
@@ -907,6 +1145,7 @@ def rewards():
         pending_points=pending_points,
         rewards=rewards,               # ← ใหม่
         redeemed_history=history,
+        redeem_key=uuid.uuid4().hex,
         current_time=datetime.now().strftime("%d %b %Y %H:%M น.")
     )
 
@@ -924,52 +1163,23 @@ def redeem():
         flash("ไม่พบรางวัลที่เลือก", "danger")
         return redirect(url_for("rewards"))
 
+    # redeem_key มาจากฟอร์ม (หนึ่งค่าต่อการเปิดหน้า) กดซ้ำ/ส่งฟอร์มซ้ำจะถูกนับครั้งเดียว
+    redeem_key = request.form.get("redeem_key") or uuid.uuid4().hex
+    idempotency_key = f"redeem:{user_id}:{redeem_key}:{reward_id}"
+
     with get_db() as conn:
-        # ดึงข้อมูลรางวัลจากฐานข้อมูล
-        reward = conn.execute("""
-            SELECT name, points_required, stock 
-            FROM rewards 
-            WHERE id = ? AND is_active = 1
-        """, (reward_id,)).fetchone()
-
-        if not reward:
-            flash("รางวัลนี้ไม่ถูกต้องหรือถูกปิดใช้งาน", "danger")
-            return redirect(url_for("rewards"))
-
-        reward_name = reward['name']
-        points_needed = reward['points_required']
-        stock = reward['stock']
-
-        if stock <= 0:
-            flash(f"รางวัล '{reward_name}' หมดสต็อกแล้ว", "warning")
-            return redirect(url_for("rewards"))
-
-        # ตรวจแต้ม
-        points_row = conn.execute("SELECT available_points FROM user_points WHERE user_id = ?", (user_id,)).fetchone()
-        if not points_row or points_row['available_points'] < points_needed:
-            flash(f"แต้มไม่พอ ต้องใช้ {points_needed} แต้ม (คุณมี {points_row['available_points'] or 0})", "danger")
-            return redirect(url_for("rewards"))
-
-        # หักแต้ม
-        conn.execute("""
-            UPDATE user_points 
-            SET 
-                available_points = available_points - ?,
-                redeemed_points = redeemed_points + ?,
-                last_updated = datetime('now')
-            WHERE user_id = ?
-        """, (points_needed, points_needed, user_id))
-
-        # หักสต็อก (optional แต่ควรมี)
-        conn.execute("UPDATE rewards SET stock = stock - 1 WHERE id = ?", (reward_id,))
-
-        # บันทึกประวัติ
-        conn.execute("""
-            INSERT INTO redeemed_rewards (user_id, reward_name, points_used, redeemed_at)
-            VALUES (?, ?, ?, datetime('now'))
-        """, (user_id, reward_name, points_needed))
+        result, reward = redeem_reward(conn, user_id, reward_id, idempotency_key)
 
-        conn.commit()
+    if result == REWARD_NOT_FOUND:
+        flash("รางวัลนี้ไม่ถูกต้องหรือถูกปิดใช้งาน", "danger")
+        return redirect(url_for("rewards"))
+    reward_name = reward['name']
+    if result == OUT_OF_STOCK:
+        flash(f"รางวัล '{reward_name}' หมดสต็อกแล้ว", "warning")
+        return redirect(url_for("rewards"))
+    if result == INSUFFICIENT_POINTS:
+        flash(f"แต้มไม่พอ ต้องใช้ {reward['points_required']} แต้ม", "danger")
+        return redirect(url_for("rewards"))
 
     flash(f"แลกรางวัล '{reward_name}' สำเร็จ! ขอบคุณมากครับ", "success")
     return redirect(url_for("rewards"))
@@ -978,59 +1188,72 @@ def redeem():
 def format_number(value):
     return "{:,}".format(int(value))
 
-from flask import jsonify
+# ─── Conditional GET (ETag) สำหรับ endpoint ที่หน้าแอดมิน poll ─────────
+# ETag มาจากเวอร์ชันของออเดอร์ (trigger ใน migrations.py เพิ่มให้ทุกครั้งที่มีการเปลี่ยน)
+# ถ้าไม่มีอะไรเปลี่ยนตอบ 304 ทันที ไม่ต้อง JOIN และไม่ต้อง render template
+etag_stats = {}
+etag_stats_lock = threading.Lock()
+
+def read_orders_version(conn):
+    row = conn.execute("SELECT version FROM change_versions WHERE name = 'orders'").fetchone()
+    return row[0] if row else 0
+
+def orders_etag(endpoint):
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not session.get("is_admin"):
+                return fn(*args, **kwargs)
+
+            with get_db() as conn:
+                version = read_orders_version(conn)
+            # เนื้อหามี CSRF token ของแต่ละ session จึงผูก ETag กับ session ด้วย
+            # (generate_csrf() สร้าง token ลง session ก่อน ETag จะได้ไม่เปลี่ยนหลัง render ครั้งแรก)
+            generate_csrf()
+            seed = f"{endpoint}:{version}:{session.get('csrf_token', '')}"
+            etag = hashlib.sha1(seed.encode('utf-8')).hexdigest()[:24]
+
+            # เทียบแบบ weak: response ที่ถูกบีบอัดส่ง ETag เป็น W/"..."
+            not_modified = request.if_none_match.contains_weak(etag)
+            with etag_stats_lock:
+                stats = etag_stats.setdefault(endpoint, {'requests': 0, 'not_modified': 0})
+                stats['requests'] += 1
+                if not_modified:
+                    stats['not_modified'] += 1
+
+            if not_modified:
+                response = Response(status=304)
+            else:
+                response = make_response(fn(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
+
+@app.route("/admin/etag-stats")
+def admin_etag_stats():
+    if not session.get("is_admin"):
+        return jsonify({"error": "Unauthorized"}), 403
+
+    with etag_stats_lock:
+        data = {
+            endpoint: dict(stats, hit_rate=round(stats['not_modified'] / stats['requests'], 4) if stats['requests'] else 0.0)
+            for endpoint, stats in etag_stats.items()
+        }
+    return jsonify(data)
 
 @app.route("/admin/orders/latest", methods=["GET"])
+@orders_etag("admin_latest_orders")
 def admin_latest_orders():
     if not session.get("is_admin"):
         return jsonify({"error": "Unauthorized"}), 403
 
     with get_db() as conn:
-        rows = conn.execute("""
-            SELECT o.id, o.customer_name, o.phone, o.created_at, o.status, o.total,
-                   oi.product_name AS product, oi.price, oi.quantity AS qty,
-                   u.profile_picture
-            FROM orders o
-            LEFT JOIN order_items oi ON o.id = oi.order_id
-            LEFT JOIN users u ON o.user_id = u.id
-            ORDER BY o.created_at DESC
-        """).fetchall()
-
-        grouped = {}
-        for r in rows:
-            oid = r['id']
-            if oid not in grouped:
-                grouped[oid] = {
-                    'id': oid,
-                    'customer_name': r['customer_name'],
-                    'phone': r['phone'],
-                    'created_at': r['created_at'],
-                    'status': r['status'] or 'pending',
-                    'total': r['total'] or 0,
-                    'profile_picture': r['profile_picture'],
-                    'items': []
-                }
-            if r['product']:
-                sub = r['price'] * r['qty']
-                grouped[oid]['items'].append({
-                    'product': r['product'],
-                    'price': r['price'],
-                    'qty': r['qty'],
-                    'subtotal': sub
-                })
-                grouped[oid]['total'] += sub
-
-        pending_orders   = {k: v for k, v in grouped.items() if v['status'] == 'pending'}
-        confirmed_orders = {k: v for k, v in grouped.items() if v['status'] == 'confirmed'}
-        preparing_orders = {k: v for k, v in grouped.items() if v['status'] == 'preparing'}
-        completed_orders = {k: v for k, v in grouped.items() if v['status'] == 'completed'}
-
-        counts = {
-            'pending_count': len(pending_orders),
-            'confirmed_count': len(confirmed_orders),
-            'preparing_count': len(preparing_orders),
-            'completed_count': len(completed_orders)
-        }
+        # ใช้แค่จำนวน ไม่ต้องโหลดรายการสินค้าเลย
+        counts = count_orders_by_status(conn)
 
         return jsonify({
             'counts': counts,
@@ -1038,46 +1261,14 @@ def admin_latest_orders():
         })
         
 @app.route("/admin/orders/pending-update")
+@orders_etag("admin_pending_update")
 def admin_pending_update():
     if not session.get("is_admin"):
         return "Unauthorized", 403
 
     with get_db() as conn:
         # ดึงข้อมูล orders แบบเดิม (เฉพาะ pending)
-        rows = conn.execute("""
-            SELECT o.id, o.customer_name, o.phone, o.created_at, o.status, o.total,
-                   oi.product_name AS product, oi.price, oi.quantity AS qty,
-                   u.profile_picture
-            FROM orders o
-            LEFT JOIN order_items oi ON o.id = oi.order_id
-            LEFT JOIN users u ON o.user_id = u.id
-            WHERE o.status = 'pending'
-            ORDER BY o.created_at DESC
-        """).fetchall()
-
-        grouped = {}
-        for r in rows:
-            oid = r['id']
-            if oid not in grouped:
-                grouped[oid] = {
-                    'id': oid,
-                    'customer_name': r['customer_name'],
-                    'phone': r['phone'],
-                    'created_at': r['created_at'],
-                    'status': r['status'] or 'pending',
-                    'total': r['total'] or 0,
-                    'profile_picture': r['profile_picture'],
-                    'items': []
-                }
-            if r['product']:
-                sub = r['price'] * r['qty']
-                grouped[oid]['items'].append({
-                    'product': r['product'],
-                    'price': r['price'],
-                    'qty': r['qty'],
-                    'subtotal': sub
-                })
-                grouped[oid]['total'] += sub
+        grouped = fetch_orders_by_status(conn, 'pending')
 
         pending_count = len(grouped)
 
@@ -1094,51 +1285,100 @@ def admin_pending_update():
 
 
 @app.route("/admin/orders/pending-partial")
+@orders_etag("admin_pending_partial")
 def admin_pending_partial():
     if not session.get("is_admin"):
         return "Unauthorized", 403
 
     with get_db() as conn:
-        rows = conn.execute("""
-            SELECT o.id, o.customer_name, o.phone, o.created_at, o.status, o.total,
-                   oi.product_name AS product, oi.price, oi.quantity AS qty,
-                   u.profile_picture
-            FROM orders o
-            LEFT JOIN order_items oi ON o.id = oi.order_id
-            LEFT JOIN users u ON o.user_id = u.id
-            WHERE o.status = 'pending'
-            ORDER BY o.created_at DESC
-        """).fetchall()
-
-        grouped = {}
-        for r in rows:
-            oid = r['id']
-            if oid not in grouped:
-                grouped[oid] = {
-                    'id': oid,
-                    'customer_name': r['customer_name'],
-                    'phone': r['phone'],
-                    'created_at': r['created_at'],
-                    'status': r['status'],
-                    'total': r['total'] or 0,
-                    'profile_picture': r['profile_picture'],
-                    'items': []
-                }
-            if r['product']:
-                sub = r['price'] * r['qty']
-                grouped[oid]['items'].append({
-                    'product': r['product'],
-                    'price': r['price'],
-                    'qty': r['qty'],
-                    'subtotal': sub
-                })
-                grouped[oid]['total'] += sub
+        grouped = fetch_orders_by_status(conn, 'pending')
 
         return render_template(
             "admin_pending_partial.html",
             pending_orders=grouped
         )
         
+@app.route("/admin/jobs")
+def admin_jobs():
+    if not session.get("is_admin"):
+        return jsonify({"error": "Unauthorized"}), 403
+
+    with get_db() as conn:
+        return jsonify(job_queue.stats(conn))
+
+@app.route("/admin/cache-stats")
+def admin_cache_stats():
+    if not session.get("is_admin"):
+        return jsonify({"error": "Unauthorized"}), 403
+
+    return jsonify({
+        "fragments": fragment_cache.snapshot(),
+        "catalog": dict(catalog.stats),
+        "order_tokens": order_tokens.snapshot(),
+        "compression": compressor.snapshot(),
+    })
+
+@app.route("/admin/db-stats")
+def admin_db_stats():
+    if not session.get("is_admin"):
+        return jsonify({"error": "Unauthorized"}), 403
+
+    return jsonify({**db_pool.stats(), "order_writer": order_writer.stats()})
+
+@app.route("/metrics")
+def metrics():
+    # แอดมินที่ล็อกอิน หรือ scraper ที่ส่ง Authorization: Bearer <METRICS_TOKEN>
+    token = os.environ.get("METRICS_TOKEN")
+    bearer = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+    if not session.get("is_admin") and not (token and hmac.compare_digest(bearer, token)):
+        return "Unauthorized", 403
+
+    if request.args.get("format") == "json":
+        return jsonify(request_metrics.snapshot())
+    return Response(request_metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/admin/slow-queries")
+def admin_slow_queries():
+    if not session.get("is_admin"):
+        return redirect(url_for("index"))
+
+    limit = min(request.args.get("n", 20, type=int), 200)
+    groups = slow_query_log.top(limit)
+    if request.args.get("format") == "json":
+        return jsonify({"threshold_ms": slow_query_log.threshold_ms, "groups": groups})
+    return render_template(
+        "admin_slow_queries.html",
+        groups=groups,
+        limit=limit,
+        threshold_ms=slow_query_log.threshold_ms
+    )
+
+@app.route("/admin/profiles")
+def admin_profiles():
+    if not session.get("is_admin"):
+        return jsonify({"error": "Unauthorized"}), 403
+
+    profiles = request_profiler.listing(min(request.args.get("n", 50, type=int), 500))
+    for profile in profiles:
+        profile["url"] = url_for("admin_profile_download", name=profile["file"])
+    return jsonify({"enabled": request_profiler.enabled, "sample_rate": request_profiler.sample_rate,
+                    "mode": request_profiler.mode, "profiles": profiles})
+
+@app.route("/admin/profiles/<name>")
+def admin_profile_download(name):
+    if not session.get("is_admin"):
+        return "Unauthorized", 403
+    if not name.endswith((".collapsed", ".pstats")):
+        abort(404)
+    return send_from_directory(request_profiler.directory, name, as_attachment=True)
+
+@app.route("/admin/startup")
+def admin_startup():
+    if not session.get("is_admin"):
+        return jsonify({"error": "Unauthorized"}), 403
+
+    return jsonify(startup_report.snapshot())
+
 @app.route("/admin/order/<int:order_id>")
 def admin_view_order(order_id):
     if not session.get("is_admin"):
@@ -1168,6 +1408,144 @@ def admin_view_order(order_id):
             order=order,
             items=items
         )
+# ─── คำสั่ง CLI (flask --app app <command>) ─────────────────────
+
+@app.cli.command("init-db")
+def init_db_command():
+    """สร้าง/อัปเกรดฐานข้อมูลตาม migrations.py"""
+    init_db()
+    print("init-db: OK")
+
+
+@app.cli.command("check-query-plans")
+def check_query_plans_command():
+    """ตรวจว่า query ที่ลงทะเบียนไว้ไม่มีตัวไหนตกไป full table scan"""
+    init_db()
+    conn = get_db()
+    failures = check_hot_queries(conn)
+    for name, details in failures.items():
+        for detail in details:
+            print(f"FULL SCAN  {name}: {detail}")
+    if failures:
+        raise SystemExit(1)
+    print("check-query-plans: OK")
+
+@app.cli.command("repair-order-totals")
+@click.option("--dry-run", is_flag=True, help="รายงานส่วนต่างอย่างเดียว ไม่แก้ข้อมูล")
+def repair_order_totals_command(dry_run):
+    """คำนวณ orders.total / item_count / order_status_counts ใหม่จาก order_items"""
+    init_db()
+    with get_db() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        report = repair_order_aggregates(conn.cursor(), fix=not dry_run)
+        if dry_run:
+            conn.rollback()
+
+    for oid, total, real_total, items, real_items in report["orders"]:
+        print(f"order #{oid}: total {total} -> {real_total}, item_count {items} -> {real_items}")
+    for status, n, real_n, revenue, real_revenue in report["status_counts"]:
+        print(f"status {status}: count {n} -> {real_n}, revenue {revenue} -> {real_revenue}")
+
+    drift = len(report["orders"]) + len(report["status_counts"])
+    action = "found" if dry_run else "repaired"
+    print(f"repair-order-totals: {drift} drifted row(s) {action}")
+
+@app.cli.command("backfill-daily-sales")
+@click.option("--check", is_flag=True, help="ตรวจเทียบกับตาราง orders อย่างเดียว ไม่แก้ข้อมูล")
+def backfill_daily_sales_command(check):
+    """สร้าง user_daily_sales ใหม่จากออเดอร์ที่ปิดจ๊อบแล้ว (หรือแค่ตรวจความถูกต้องด้วย --check)"""
+    init_db()
+    with get_db() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        drift = rebuild_user_daily_sales(conn.cursor(), fix=not check)
+        if check:
+            conn.rollback()
+
+    for user_id, day, total, real_total, n, real_n in drift:
+        print(f"user {user_id} {day}: total {total} -> {real_total}, orders {n} -> {real_n}")
+    action = "found" if check else "rebuilt"
+    print(f"backfill-daily-sales: {len(drift)} drifted day(s) {action}")
+    if check and drift:
+        raise SystemExit(1)
+
+@app.cli.command("repair-points")
+@click.option("--dry-run", is_flag=True, help="รายงานส่วนต่างอย่างเดียว ไม่แก้ข้อมูล")
+def repair_points_command(dry_run):
+    """คำนวณยอดแต้มใน user_points ใหม่จาก points_ledger"""
+    init_db()
+    with get_db() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        drift = rebuild_user_points(conn.cursor(), fix=not dry_run)
+        if dry_run:
+            conn.rollback()
+
+    for user_id, stored, real in drift:
+        print(f"user {user_id}: available/earned/redeemed {stored} -> {real}")
+    action = "found" if dry_run else "repaired"
+    print(f"repair-points: {len(drift)} drifted user(s) {action}")
+
+@app.cli.command("rebuild-search-index")
+def rebuild_search_index_command():
+    """สร้าง index ค้นหาออเดอร์ (orders_fts) ใหม่ทั้งหมดจาก orders / order_items"""
+    init_db()
+    started = time.perf_counter()
+    with get_db() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        indexed = rebuild_order_search(conn.cursor())
+    print(f"rebuild-search-index: {indexed} order(s) indexed in {time.perf_counter() - started:.1f}s")
+
+@app.cli.command("run-jobs")
+@click.option("--limit", type=int, default=None, help="รันไม่เกินกี่งาน")
+def run_jobs_command(limit):
+    """รันงานเบื้องหลังที่ถึงเวลาแล้วจนหมดคิว (ใช้เมื่อปิด worker thread ด้วย JOB_WORKERS=0)"""
+    init_db()
+    conn = db_pool.connect()
+    try:
+        done = job_queue.run_pending(conn, limit)
+    finally:
+        conn.close()
+    print(f"run-jobs: {done} job(s) run")
+
+@app.cli.command("rebuild-avatars")
+def rebuild_avatars_command():
+    """เข้าคิวย่อรูปโปรไฟล์เดิมที่ยังเป็นไฟล์ต้นฉบับ (อัปโหลดก่อนมี pipeline)"""
+    init_db()
+    queued = 0
+    with get_db() as conn:
+        for user_id, path in conn.execute(
+            "SELECT id, profile_picture FROM users WHERE profile_picture IS NOT NULL"
+        ).fetchall():
+            source = os.path.join(app.static_folder, path)
+            if is_content_hashed(path) or not os.path.exists(source):
+                continue
+            ext = path.rsplit('.', 1)[-1].lower()
+            spool_profile_picture(conn, user_id, lambda dest: shutil.copyfile(source, dest), ext)
+            queued += 1
+    print(f"rebuild-avatars: {queued} picture(s) queued")
+
+@app.cli.command("build-static")
+def build_static_command():
+    """คำนวณ hash ของไฟล์ใน static/ และสร้างไฟล์ .gz/.br (รันตอน deploy ก่อนเริ่ม worker)"""
+    entries = static_assets.build()
+    for name, entry in sorted(entries.items()):
+        encodings = ", ".join(entry["encodings"]) or "-"
+        print(f"{name} -> {entry['hashed']}  [{encodings}]")
+    print(f"build-static: {len(entries)} file(s)")
+
+@app.cli.command("precompile-templates")
+def precompile_templates_command():
+    """compile ทุก template ลง bytecode cache (รันตอน deploy ก่อนเริ่ม worker)"""
+    started = time.perf_counter()
+    count = precompile_templates(app.jinja_env)
+    print(f"precompile-templates: {count} template(s) in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+# ─── เตรียมตอนเริ่ม process ─────────────────────────────────────
+startup_report.record("app_setup", time.perf_counter() - _setup_started)
+
+# compile template ทั้งหมดตอน import (กับ gunicorn --preload ทำครั้งเดียวใน process แม่)
+if os.environ.get("TEMPLATE_PRECOMPILE", "0") == "1":
+    precompile_templates(app.jinja_env)
+
 # ─── Start ─────────────────────────────────────────────────────
 
 if __name__ == "__main__":
@@ -0,0 +1,100 @@
+import hashlib
+import io
+import os
+import re
+
+try:  # Pillow เป็น optional: ถ้าไม่มีจะเก็บไฟล์เดิมตามชื่อ hash โดยไม่ย่อ/ลบ EXIF
+    from PIL import Image, ImageOps, features
+except ImportError:  # pragma: no cover
+    Image = None
+
+# ─── รูปโปรไฟล์: ย่อเป็นขนาดคงที่ ลบ EXIF และตั้งชื่อไฟล์ตาม hash ของเนื้อหา ───
+# ไฟล์ชื่อ <hash>-<size>.<ext> ไม่มีวันเปลี่ยนเนื้อหา จึงส่ง Cache-Control แบบ immutable ได้
+AVATAR_SIZES = (64, 256)
+DEFAULT_SIZE = 256
+
+_VARIANT_RE = re.compile(r"^(?P<stem>(?:.*/)?[0-9a-f]{20})-(?P<size>\d+)\.(?P<ext>webp|jpg)$")
+_HASHED_NAME_RE = re.compile(r"(^|/)[0-9a-f]{20}-(\d+|orig)\.\w+$")
+
+
+class InvalidImage(ValueError):
+    """ไฟล์ที่อัปโหลดไม่ใช่รูปที่เปิดได้"""
+
+
+def _format():
+    if Image is not None and features.check("webp"):
+        return "WEBP", "webp"
+    return "JPEG", "jpg"
+
+
+def make_variants(data, out_dir, url_prefix, source_ext="jpg"):
+    """สร้างรูปทุกขนาดใน AVATAR_SIZES จาก bytes ของไฟล์ที่อัปโหลด คืน {size: path สำหรับ url_for('static')}
+
+    ชื่อไฟล์มาจาก hash ของไฟล์ต้นฉบับ ไฟล์ที่มีอยู่แล้ว (รูปเดียวกัน) ไม่ต้องสร้างซ้ำ
+    """
+    stem = hashlib.sha256(data).hexdigest()[:20]
+    os.makedirs(out_dir, exist_ok=True)
+
+    if Image is None:
+        # ไม่มี Pillow: เก็บไฟล์เดิมไฟล์เดียวใช้แทนทุกขนาด (ชื่อ -orig ไม่ถูกแปลงโดย avatar_path)
+        name = f"{stem}-orig.{source_ext}"
+        _write_once(os.path.join(out_dir, name), data)
+        return {size: f"{url_prefix}/{name}" for size in AVATAR_SIZES}
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except Exception as e:
+        raise InvalidImage(str(e)) from e
+
+    # หมุนตาม EXIF ก่อน แล้วสร้างรูปใหม่จากพิกเซลล้วน (EXIF/GPS ไม่ติดไปด้วย)
+    image = ImageOps.exif_transpose(image).convert("RGB")
+    fmt, ext = _format()
+    variants = {}
+    for size in AVATAR_SIZES:
+        name = f"{stem}-{size}.{ext}"
+        path = os.path.join(out_dir, name)
+        if not os.path.exists(path):
+            thumb = ImageOps.fit(image, (size, size), Image.LANCZOS)
+            buf = io.BytesIO()
+            if fmt == "WEBP":
+                thumb.save(buf, fmt, quality=82, method=4)
+            else:
+                thumb.save(buf, fmt, quality=85, optimize=True)
+            _write_once(path, buf.getvalue())
+        variants[size] = f"{url_prefix}/{name}"
+    return variants
+
+
+def _write_once(path, data):
+    # เขียนไฟล์ชั่วคราวแล้ว rename ผู้อ่านไม่มีทางเห็นไฟล์ที่เขียนไม่ครบ
+    if os.path.exists(path):
+        return
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def avatar_path(path, size=DEFAULT_SIZE):
+    """path ของรูปขนาด size จากค่าใน users.profile_picture (ค่าเก่าที่ยังไม่ได้ย่อคืนตามเดิม)"""
+    if not path:
+        return path
+    m = _VARIANT_RE.match(path)
+    if m is None:
+        return path
+    return f"{m.group('stem')}-{size}.{m.group('ext')}"
+
+
+def variant_files(path, static_dir):
+    """ไฟล์บนดิสก์ทั้งหมดของรูปโปรไฟล์ (ทุกขนาด หรือไฟล์เดียวถ้าเป็นค่าเก่า)"""
+    m = _VARIANT_RE.match(path)
+    if m is None:
+        return [os.path.join(static_dir, path)]
+    return [os.path.join(static_dir, f"{m.group('stem')}-{size}.{m.group('ext')}")
+            for size in AVATAR_SIZES]
+
+
+def is_content_hashed(path):
+    """ไฟล์ที่ชื่อมาจาก hash ของเนื้อหา (ส่ง Cache-Control: immutable ได้)"""
+    return _HASHED_NAME_RE.search(path) is not None
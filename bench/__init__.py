@@ -0,0 +1 @@
+# สคริปต์วัดประสิทธิภาพ รันด้วย python -m bench.<ชื่อสคริปต์>
@@ -0,0 +1,46 @@
+import os
+import sys
+import tempfile
+
+# ให้ import โมดูลของแอป (db, migrations, ...) ได้เมื่อรันจากโฟลเดอร์ไหนก็ได้
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def temp_db_path(name="bench.db"):
+    return os.path.join(tempfile.mkdtemp(prefix="order-bench-"), name)
+
+
+def fresh_db(path=None, products=60):
+    """สร้างฐานข้อมูลเปล่าตาม migrations พร้อมสินค้า products รายการ คืน (path, conn)"""
+    from db import ConnectionPool
+    from migrations import run_migrations
+
+    path = path or temp_db_path()
+    conn = ConnectionPool(path).connect()
+    run_migrations(conn)
+    conn.executemany(
+        "INSERT INTO products (name, price, category) VALUES (?, ?, ?)",
+        [(f"สินค้า {i}", 10 + i, "อื่นๆ") for i in range(products)]
+    )
+    conn.commit()
+    return path, conn
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[k]
+
+
+def load_app(db_path=None, **config):
+    """import แอปโดยชี้ไปที่ฐานข้อมูลของ benchmark (ต้องเรียกก่อน import app ที่อื่น)"""
+    os.environ["DATABASE_PATH"] = db_path or temp_db_path()
+    import app as app_module
+
+    app_module.app.config.update(TESTING=True, WTF_CSRF_ENABLED=False, **config)
+    app_module.init_db()
+    return app_module
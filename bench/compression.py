@@ -0,0 +1,99 @@
+"""ขนาดที่ส่งจริง (bytes on wire) และ TTFB ของหน้าใหญ่ ก่อน/หลังบีบอัดและ render แบบ stream
+
+สร้างออเดอร์ pending จำนวนมาก (หน้า /admin/orders/pending-update ฝัง HTML ทั้งหมดใน JSON)
+และผู้ใช้ที่มีออเดอร์หลายร้อยรายการ (/my-orders) แล้ววัดแต่ละ endpoint 3 แบบ:
+ไม่บีบอัด / บีบอัด / บีบอัด + stream  TTFB = เวลาจนได้ chunk แรกของ body
+
+    python -m bench.compression [--orders 800] [--page-size 200] [--repeat 20] [--encoding gzip]
+"""
+import argparse
+import json
+import time
+
+from bench._common import load_app, percentile
+
+MODES = (
+    ("plain", False, False),
+    ("compressed", True, False),
+    ("compressed_streamed", True, True),
+)
+
+
+def seed(app_module, orders):
+    from orders_write import place_order
+
+    with app_module.app.app_context():
+        conn = app_module.get_db()
+        products = {r[0]: (r[1], r[2]) for r in conn.execute("SELECT id, name, price FROM products")}
+        ids = list(products)
+        user_id = conn.execute(
+            "INSERT INTO users (username, email, password_hash, created_at) VALUES ('bench', 'bench@example.com', '', ?)",
+            (int(time.time()),)
+        ).lastrowid
+        conn.commit()
+        for i in range(orders):
+            cart = {ids[(i + k) % len(ids)]: 1 + k for k in range(3)}
+            place_order(conn, f"ลูกค้าทดสอบ {i}", f"08{i:08d}", user_id, cart, products=products)
+    return user_id
+
+
+def measure(client, path, encoding, repeat):
+    headers = {"Accept-Encoding": encoding} if encoding else {}
+    ttfb, total, size = [], [], 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(path, headers=headers, buffered=False)
+        assert response.status_code == 200, (path, response.status_code)
+        chunks = response.response if response.is_streamed else [response.get_data()]
+        body = 0
+        first = None
+        for chunk in chunks:
+            if first is None and chunk:
+                first = time.perf_counter()
+            body += len(chunk)
+        ended = time.perf_counter()
+        response.close()
+        ttfb.append(((first or ended) - started) * 1000)
+        total.append((ended - started) * 1000)
+        size = body
+    return {
+        "bytes": size,
+        "content_encoding": response.headers.get("Content-Encoding"),
+        "ttfb_p50_ms": round(percentile(ttfb, 50), 2),
+        "total_p50_ms": round(percentile(total, 50), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=800, help="จำนวนออเดอร์ pending")
+    parser.add_argument("--page-size", type=int, default=200, help="ADMIN_PAGE_SIZE ของหน้า /admin")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--encoding", default="gzip, br", help="Accept-Encoding ที่ client ส่ง")
+    args = parser.parse_args()
+
+    app_module = load_app(ADMIN_PAGE_SIZE=args.page_size)
+    user_id = seed(app_module, args.orders)
+
+    client = app_module.app.test_client()
+    with client.session_transaction() as sess:
+        sess["is_admin"] = True
+        sess["user_id"] = user_id
+        sess["username"] = "bench"
+
+    results = {}
+    for path in ("/admin", "/admin/orders/pending-update", "/my-orders"):
+        rows = results[path] = {}
+        for label, compress, stream in MODES:
+            app_module.compressor.enabled = compress
+            app_module.app.config["STREAM_TEMPLATES"] = stream
+            measure(client, path, args.encoding, 2)  # warm-up (compile template)
+            rows[label] = measure(client, path, args.encoding, args.repeat)
+        rows["wire_ratio"] = round(rows["compressed"]["bytes"] / rows["plain"]["bytes"], 4)
+
+    print(json.dumps({"benchmark": "compression", "orders": args.orders, "page_size": args.page_size,
+                      "accept_encoding": args.encoding, "results": results}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
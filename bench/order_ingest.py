@@ -0,0 +1,112 @@
+"""ออเดอร์เข้าพร้อมกันจากหลาย thread: commit ต่อ request เทียบกับ OrderWriter (group commit)
+
+แต่ละ thread จำลอง request หนึ่งตัวที่ส่งออเดอร์ติดกัน วัดจำนวนออเดอร์ต่อวินาทีและ latency p50/p99
+ต่อออเดอร์ (รวมเวลารอ lock / รอคิว) ลอง --synchronous FULL เพื่อดูผลของ fsync ต่อ commit
+
+    python -m bench.order_ingest [--threads 64] [--orders 3000] [--synchronous NORMAL]
+"""
+import argparse
+import json
+import threading
+import time
+
+from bench._common import fresh_db, percentile
+from db import ConnectionPool, DEFAULT_PRAGMAS
+from order_writer import OrderWriter
+from orders_write import place_order
+
+CART = {1: 2, 2: 1, 3: 4}
+
+
+def per_request(pool, products):
+    def submit(i):
+        # เหมือน request ปกติ: ยืม connection จาก pool แล้ว commit เอง
+        conn = pool.acquire()
+        try:
+            return place_order(conn, f"ลูกค้า {i}", "0812345678", None, CART, products=products)
+        finally:
+            pool.release(conn)
+    return submit
+
+
+def group_commit(pool, products, args):
+    writer = OrderWriter(pool, max_batch=args.batch, max_wait_ms=args.wait_ms, max_queue=args.queue)
+
+    def submit(i):
+        return writer.place_order(f"ลูกค้า {i}", "0812345678", None, CART, products)
+    return submit, writer
+
+
+def run(label, args):
+    pragmas = dict(DEFAULT_PRAGMAS, synchronous=args.synchronous)
+    path, conn = fresh_db()
+    products = {r[0]: (r[1], r[2]) for r in conn.execute("SELECT id, name, price FROM products")}
+    conn.close()
+    pool = ConnectionPool(path, size=args.pool_size, timeout=30, pragmas=pragmas)
+
+    writer = None
+    if label == "group_commit":
+        submit, writer = group_commit(pool, products, args)
+    else:
+        submit = per_request(pool, products)
+
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(args.threads)
+
+    def worker(n):
+        mine = []
+        barrier.wait()
+        for i in range(n, args.orders, args.threads):
+            started = time.perf_counter()
+            try:
+                submit(i)
+            except Exception as e:
+                with lock:
+                    errors.append(repr(e))
+                continue
+            mine.append((time.perf_counter() - started) * 1000)
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(args.threads)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    row = {
+        "mode": label,
+        "orders_per_sec": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "errors": len(errors),
+    }
+    if writer is not None:
+        stats = writer.stats()
+        row["avg_batch"] = stats["avg_batch"]
+        row["largest_batch"] = stats["largest_batch"]
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=64, help="จำนวน request ที่ยิงพร้อมกัน")
+    parser.add_argument("--orders", type=int, default=3000)
+    parser.add_argument("--pool-size", type=int, default=8)
+    parser.add_argument("--synchronous", default="NORMAL", choices=["OFF", "NORMAL", "FULL"])
+    parser.add_argument("--batch", type=int, default=32, help="max_batch ของ OrderWriter")
+    parser.add_argument("--wait-ms", type=float, default=2.0, help="max_wait_ms ของ OrderWriter")
+    parser.add_argument("--queue", type=int, default=512, help="max_queue ของ OrderWriter")
+    args = parser.parse_args()
+
+    results = [run(label, args) for label in ("per_request", "group_commit")]
+    print(json.dumps({"benchmark": "order_ingest", "threads": args.threads, "orders": args.orders,
+                      "synchronous": args.synchronous, "results": results}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
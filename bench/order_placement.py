@@ -0,0 +1,67 @@
+"""วัดจำนวนออเดอร์ต่อวินาทีของการสั่งซื้อ (ตะกร้า 1 / 10 / 50 รายการ)
+
+เทียบ place_order() (IN query เดียว + executemany + BEGIN IMMEDIATE)
+กับวิธีเดิมที่ SELECT / INSERT ทีละรายการ
+
+    python -m bench.order_placement [--orders 500]
+"""
+import argparse
+import json
+import time
+
+from bench._common import fresh_db
+from orders_write import place_order
+
+
+def legacy_place_order(conn, name, phone, user_id, cart):
+    # เลียนแบบ order() ก่อนปรับ: query ราคาทีละสินค้า และ INSERT ทีละบรรทัด
+    c = conn.cursor()
+    now = int(time.time())
+    c.execute(
+        "INSERT INTO orders (customer_name, phone, created_at, user_id) VALUES (?, ?, ?, ?)",
+        (name, phone, now, user_id)
+    )
+    order_id = c.lastrowid
+    for pid, qty in cart.items():
+        product = conn.execute("SELECT name, price FROM products WHERE id = ?", (pid,)).fetchone()
+        if product:
+            c.execute(
+                "INSERT INTO order_items (order_id, product_name, price, quantity) VALUES (?, ?, ?, ?)",
+                (order_id, product[0], product[1], qty)
+            )
+    conn.commit()
+    return order_id
+
+
+def run(fn, conn, cart, n):
+    for i in range(min(n, 50)):  # warm-up: page cache / statement cache
+        fn(conn, "warm-up", "0812345678", None, cart)
+    started = time.perf_counter()
+    for i in range(n):
+        fn(conn, f"ลูกค้า {i}", "0812345678", None, cart)
+    elapsed = time.perf_counter() - started
+    return round(n / elapsed, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=500, help="จำนวนออเดอร์ต่อรอบ")
+    args = parser.parse_args()
+
+    results = []
+    for lines in (1, 10, 50):
+        cart = {pid: 2 for pid in range(1, lines + 1)}
+        row = {"cart_lines": lines}
+        for label, fn in (("legacy", legacy_place_order), ("batched", place_order)):
+            _, conn = fresh_db()
+            row[f"{label}_orders_per_sec"] = run(fn, conn, cart, args.orders)
+            conn.close()
+        row["speedup"] = round(row["batched_orders_per_sec"] / row["legacy_orders_per_sec"], 2)
+        results.append(row)
+
+    print(json.dumps({"benchmark": "order_placement", "orders_per_run": args.orders, "results": results},
+                     ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""วัดเวลาค้นหาออเดอร์ (/admin/orders/search) บนฐานข้อมูลจาก bench.seed ทั้งแบบไม่กรองและกรองสถานะ/วันที่
+
+คำค้นกว้าง ("08" ตรงกับเกือบทุกออเดอร์) รวมกับตัวกรองที่มีออเดอร์ตรงไม่กี่แถว (pending, ช่วงวันเก่า ๆ)
+เป็นกรณีที่ต้องระวัง: ถ้าไล่ผลจาก FTS แล้วค่อยกรองทิ้ง จะต้องอ่านออเดอร์ที่ใหม่กว่าช่วงนั้นทั้งหมดก่อน
+
+ก่อนจับเวลาตรวจความถูกต้องบนฐานข้อมูลชั่วคราวที่เลขออเดอร์ไม่เรียงตามเวลา (ลงย้อนหลัง / นาฬิกาถอย)
+ผลที่มีตัวกรองต้องตรงกับการกรองทีละแถวแบบไม่จำกัดช่วงเลขออเดอร์ ไม่ตรงจะจบด้วย exit code 1
+
+    python -m bench.seed --db /tmp/shop-100k.db --scale 100k
+    python -m bench.order_search --db /tmp/shop-100k.db [--repeat 50]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import orders_read
+from bench._common import fresh_db, percentile
+from bench.seed import SCALES, seed
+from db import ConnectionPool
+from migrations import run_migrations
+from orders_read import search_orders, search_query
+from orders_write import insert_order
+
+DAY = 86400
+
+# (ชื่อ, คำค้น, สถานะ, ตั้งแต่กี่วันก่อน, ถึงกี่วันก่อน) วันนับย้อนจากออเดอร์ล่าสุดในฐานข้อมูล
+CASES = [
+    ("phone_prefix", "08", None, None, None),
+    ("name", "สมชาย", None, None, None),
+    ("name_and_product", "ปราณี พวงมาลัย", None, None, None),
+    ("broad_pending", "08", "pending", None, None),
+    ("broad_completed", "08", "completed", None, None),
+    ("broad_last_week", "08", None, 7, None),
+    ("broad_one_day_90d_ago", "08", None, 90, 89),
+    ("broad_one_day_300d_ago", "08", None, 300, 299),
+    ("name_month_200d_ago", "สมชาย", None, 200, 170),
+    ("name_pending_old_range", "สมชาย", "pending", 300, 200),
+]
+
+
+def prepare_db(args):
+    path = args.db or os.path.join(tempfile.gettempdir(), f"bench-seed-{args.scale}-{args.seed}.db")
+    if not os.path.exists(path):
+        conn = ConnectionPool(path).connect()
+        run_migrations(conn)
+        seed(conn, SCALES[args.scale], seed_value=args.seed)
+        conn.close()
+    return path
+
+
+def _expected_ids(conn, match, status, since, until):
+    # ไม่จำกัดช่วงเลขออเดอร์ ทุกแถวที่ match ถูกกรองด้วยสถานะ / เวลาตรง ๆ
+    rows = conn.execute(orders_read.SEARCH_ORDERS_SQL, (
+        match, 0, 2**62, status, status,
+        since if since is not None else 0, until if until is not None else 2**62, 2**62,
+    ))
+    return [r[0] for r in rows]
+
+
+def _searched_ids(conn, match, status, since, until):
+    ids, cursor = [], None
+    while True:
+        page, cursor = search_orders(conn, match, status, since, until, cursor=cursor, limit=7)
+        ids.extend(order.id for order in page)
+        if cursor is None:
+            return ids
+
+
+def check_out_of_order(cases=300, seed_value=1):
+    """ค้นบนออเดอร์ที่เวลาไม่เรียงตามเลขออเดอร์ คืนรายการกรณีที่ผลไม่ตรง"""
+    rng = random.Random(seed_value)
+    _, conn = fresh_db(products=0)
+    t = 1_700_000_000
+    # ออเดอร์ #2 ถูกลงย้อนหลังหนึ่งวันหลัง #1
+    for created in (t, t - 86400, t + 10):
+        insert_order(conn, "ลูกค้า", "0812345678", None, [("ข้าวผัด", 50, 1)], now=created)
+    for _ in range(2000):
+        created = t - rng.randrange(30 * 86400)
+        insert_order(conn, rng.choice(["สมชาย", "สมหญิง", "มาลี"]), f"08{rng.randrange(10**8):08d}", None,
+                     [(rng.choice(["ข้าวผัด", "กะเพรา", "ชาเย็น"]), 40, 1)], now=created)
+    conn.execute("UPDATE orders SET status = ? WHERE id % 7 = 0", ("completed",))
+    conn.commit()
+
+    checks = [("0812", None, t - 86400, t + 100)]
+    for _ in range(cases):
+        since = t - rng.randrange(31 * 86400) if rng.random() < 0.7 else None
+        until = (since or t - 31 * 86400) + rng.randrange(1, 10 * 86400) if rng.random() < 0.5 else None
+        checks.append((rng.choice(["08", "สม", "มาลี", "ชาเย็น", "0812"]),
+                       rng.choice([None, None, "pending", "completed"]), since, until))
+
+    failures = []
+    default_limit = orders_read.SEARCH_BOUNDS_SCAN_LIMIT
+    try:
+        # ทั้งตัวกรองที่แคบพอให้จำกัดช่วง และตัวกรองกว้างที่ค้นแบบไม่จำกัดช่วง
+        for scan_limit in (default_limit, 50):
+            orders_read.SEARCH_BOUNDS_SCAN_LIMIT = scan_limit
+            for text, status, since, until in checks:
+                match = search_query(text)
+                expected = _expected_ids(conn, match, status, since, until)
+                got = _searched_ids(conn, match, status, since, until)
+                if got != expected:
+                    failures.append({"query": text, "status": status, "since": since, "until": until,
+                                     "scan_limit": scan_limit, "missing": sorted(set(expected) - set(got))[:10]})
+    finally:
+        orders_read.SEARCH_BOUNDS_SCAN_LIMIT = default_limit
+        conn.close()
+    return len(checks) * 2, failures
+
+
+def measure(conn, match, status, since, until, repeat):
+    page, _ = search_orders(conn, match, status, since, until)  # warm-up: page cache
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        search_orders(conn, match, status, since, until)
+        timings.append((time.perf_counter() - started) * 1000)
+    return {"rows": len(page), "p50_ms": round(percentile(timings, 50), 2),
+            "p95_ms": round(percentile(timings, 95), 2), "max_ms": round(max(timings), 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", help="ฐานข้อมูลจาก bench.seed (ถ้าไม่ระบุจะ seed ตาม --scale ไว้ใน temp)")
+    parser.add_argument("--scale", choices=sorted(SCALES, key=SCALES.get), default="100k")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    checked, failures = check_out_of_order()
+    if failures:
+        print(json.dumps({"benchmark": "order_search", "out_of_order_failures": failures},
+                         ensure_ascii=False, indent=2))
+        sys.exit(1)
+
+    path = prepare_db(args)
+    conn = ConnectionPool(path).connect()
+    latest = conn.execute("SELECT MAX(created_at) FROM orders").fetchone()[0]
+    orders = conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+
+    results = []
+    for name, text, status, since_days, until_days in CASES:
+        since = latest - since_days * DAY if since_days is not None else None
+        until = latest - until_days * DAY if until_days is not None else None
+        results.append({"case": name, "query": text, "status": status,
+                        **measure(conn, search_query(text), status, since, until, args.repeat)})
+    conn.close()
+
+    print(json.dumps({"benchmark": "order_search", "db": path, "orders": orders, "repeat": args.repeat,
+                      "out_of_order_checks": checked, "results": results}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
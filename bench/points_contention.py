@@ -0,0 +1,130 @@
+"""ยิงการแลกรางวัลพร้อมกันหลายพันครั้งจากหลาย thread แล้วตรวจว่าแต้มและสต็อกไม่ติดลบ
+
+ผู้ใช้แต่ละคนมีแต้มพอแลกได้จำนวนหนึ่ง รางวัลมีสต็อกจำกัด ทุก thread ใช้ connection ของตัวเอง
+(เหมือน worker คนละ request) เทียบ redeem_reward() กับวิธีเดิมที่อ่านยอดก่อนแล้วค่อย UPDATE
+
+    python -m bench.points_contention [--threads 32] [--attempts 4000]
+"""
+import argparse
+import json
+import sqlite3
+import threading
+import time
+
+from bench._common import fresh_db
+from db import ConnectionPool
+from points import award_order_points, redeem_reward, REDEEMED
+
+REWARD_POINTS = 10
+
+
+def legacy_redeem(conn, user_id, reward_id, idempotency_key):
+    # เลียนแบบ redeem() ก่อนปรับ: SELECT ตรวจยอด แล้ว UPDATE แยกกันแบบ deferred transaction
+    reward = conn.execute("SELECT name, points_required, stock FROM rewards WHERE id = ?", (reward_id,)).fetchone()
+    if reward[2] <= 0:
+        return "out_of_stock", reward
+    row = conn.execute("SELECT available_points FROM user_points WHERE user_id = ?", (user_id,)).fetchone()
+    if row[0] < reward[1]:
+        return "insufficient_points", reward
+    conn.execute(
+        "UPDATE user_points SET available_points = available_points - ?, redeemed_points = redeemed_points + ? "
+        "WHERE user_id = ?", (reward[1], reward[1], user_id)
+    )
+    conn.execute("UPDATE rewards SET stock = stock - 1 WHERE id = ?", (reward_id,))
+    conn.execute(
+        "INSERT INTO redeemed_rewards (user_id, reward_name, points_used, redeemed_at) VALUES (?, ?, ?, ?)",
+        (user_id, reward[0], reward[1], int(time.time()))
+    )
+    conn.commit()
+    return REDEEMED, reward
+
+
+def setup(users, points_each, stock):
+    path, conn = fresh_db(products=0)
+    now = int(time.time())
+    conn.execute(
+        "INSERT INTO rewards (name, points_required, stock) VALUES ('bench reward', ?, ?)", (REWARD_POINTS, stock)
+    )
+    reward_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+    for i in range(users):
+        user_id = conn.execute(
+            "INSERT INTO users (username, email, password_hash, created_at) VALUES (?, ?, '', ?)",
+            (f"bench{i}", f"bench{i}@example.com", now)
+        ).lastrowid
+        award_order_points(conn, user_id, f"bench-{user_id}", points_each, now)
+    conn.commit()
+    user_ids = [r[0] for r in conn.execute("SELECT id FROM users ORDER BY id")]
+    conn.close()
+    return path, reward_id, user_ids
+
+
+def run(fn, args):
+    path, reward_id, user_ids = setup(args.users, args.points, args.stock)
+    pool = ConnectionPool(path)
+    results = {}
+    lock = threading.Lock()
+    barrier = threading.Barrier(args.threads)
+
+    def worker(n):
+        conn = pool.connect()
+        barrier.wait()
+        for i in range(n, args.attempts, args.threads):
+            user_id = user_ids[i % len(user_ids)]
+            try:
+                result, _ = fn(conn, user_id, reward_id, f"bench:{i}")
+            except sqlite3.OperationalError as e:  # database is locked ฯลฯ
+                result = f"error: {e}"
+                if conn.in_transaction:
+                    conn.rollback()
+            with lock:
+                results[result] = results.get(result, 0) + 1
+        conn.close()
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(args.threads)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    conn = pool.connect()
+    min_points = conn.execute("SELECT MIN(available_points) FROM user_points").fetchone()[0]
+    stock_left = conn.execute("SELECT stock FROM rewards WHERE id = ?", (reward_id,)).fetchone()[0]
+    redeemed_rows = conn.execute("SELECT COUNT(*) FROM redeemed_rewards").fetchone()[0]
+    conn.close()
+
+    max_redeemable = min(args.stock, len(user_ids) * (args.points // REWARD_POINTS))
+    return {
+        "results": results,
+        "redeemed_rows": redeemed_rows,
+        "max_redeemable": max_redeemable,
+        "min_available_points": min_points,
+        "stock_left": stock_left,
+        "overdraft": min_points < 0 or stock_left < 0 or redeemed_rows > max_redeemable,
+        "redemptions_per_sec": round(args.attempts / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--attempts", type=int, default=4000, help="จำนวนคำขอแลกรางวัลทั้งหมด")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--points", type=int, default=100, help="แต้มเริ่มต้นต่อผู้ใช้")
+    parser.add_argument("--stock", type=int, default=150)
+    parser.add_argument("--skip-legacy", action="store_true", help="ไม่รันวิธีเดิม (ที่อาจติดลบ)")
+    args = parser.parse_args()
+
+    report = {"benchmark": "points_contention", "threads": args.threads, "attempts": args.attempts,
+              "atomic": run(redeem_reward, args)}
+    if not args.skip_legacy:
+        report["legacy"] = run(legacy_redeem, args)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    if report["atomic"]["overdraft"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
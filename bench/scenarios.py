@@ -0,0 +1,339 @@
+"""โหลดเทสต์ตามสถานการณ์จริงบนฐานข้อมูลจาก bench.seed ผลเป็น JSON ที่เอาไปเทียบกับรอบก่อนได้
+
+สถานการณ์ (เลือกด้วย --scenario ซ้ำได้ ค่าเริ่มต้นคือทั้งหมด):
+  storefront  ลูกค้าเปิดหน้าแรก 85% และสั่งของ (POST /order) 15%
+  admin_poll  แอดมินหลายจอ poll /admin/orders/pending-update (ส่ง If-None-Match) ขณะที่มีออเดอร์เข้า
+  dashboard   สมาชิกเปิด /dashboard
+  redeem      สมาชิกแย่งกันแลกรางวัลที่สต็อกจำกัด (POST /redeem) แล้วตรวจว่าแต้ม/สต็อกไม่ติดลบ
+
+ทุกรอบรันบนสำเนาของฐานข้อมูล seed (ไฟล์ seed ไม่ถูกแก้) --transport wsgi รันผ่าน HTTP จริง
+ด้วย werkzeug server แบบ threaded แทน Flask test client
+
+    python -m bench.seed --db /tmp/shop-100k.db --scale 100k
+    python -m bench.scenarios --db /tmp/shop-100k.db --threads 8 --duration 10 --out before.json
+    python -m bench.scenarios --db /tmp/shop-100k.db --threads 8 --duration 10 --compare before.json
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+
+from bench._common import ROOT, load_app, percentile
+from bench.seed import SCALES, seed
+from db import ConnectionPool
+from migrations import run_migrations
+
+SCENARIOS = ("storefront", "admin_poll", "dashboard", "redeem")
+
+
+# ─── วิธีส่ง request: Flask test client หรือ HTTP จริง ─────────────────
+class TestClientTransport:
+    def __init__(self, app, cookie):
+        self.client = app.test_client()
+        self.client.set_cookie(app.config["SESSION_COOKIE_NAME"], cookie)
+
+    def request(self, method, path, form=None, headers=None):
+        response = self.client.open(path, method=method, data=form, headers=headers or {})
+        body = response.get_data()
+        return response.status_code, response.headers, len(body)
+
+
+class HttpTransport:
+    def __init__(self, app, cookie, port):
+        self.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        self.cookie = f"{app.config['SESSION_COOKIE_NAME']}={cookie}"
+
+    def request(self, method, path, form=None, headers=None):
+        headers = dict(headers or {}, Cookie=self.cookie)
+        body = None
+        if form is not None:
+            body = urlencode(form, doseq=True)
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        self.conn.request(method, path, body=body, headers=headers)
+        response = self.conn.getresponse()
+        data = response.read()
+        return response.status, response.headers, len(data)
+
+
+def start_server(app):
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)  # ไม่ต้อง log ทุก request
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def session_cookie(app, **values):
+    # cookie ของ session ที่ลงชื่อด้วย secret ของแอป (เหมือนผู้ใช้ที่ล็อกอินแล้ว)
+    return app.session_interface.get_signing_serializer(app).dumps(values)
+
+
+# ─── สถานการณ์: คืน step(transport, rng) -> ชื่อ request ที่ยิงและ status ───
+def _cart_form(rng, products):
+    form = {"name": "ลูกค้าโหลดเทสต์", "phone": f"08{rng.randrange(10**7, 10**8)}", "product_id": []}
+    for pid in rng.sample(products, k=rng.randint(1, 3)):
+        form["product_id"].append(str(pid))
+        form[f"qty_{pid}"] = str(rng.randint(1, 3))
+    return form
+
+
+def storefront(ctx, index):
+    def step(t, rng):
+        if rng.random() < 0.15:
+            status, _, _ = t.request("POST", "/order", form=_cart_form(rng, ctx["products"]))
+            return "POST /order", status
+        status, _, _ = t.request("GET", "/")
+        return "GET /", status
+    return ctx["user_cookie"](index), step
+
+
+def admin_poll(ctx, index):
+    if index == 0:
+        # thread แรกเป็นลูกค้าที่สั่งของเรื่อยๆ ให้ ETag ของแอดมินเปลี่ยน
+        def order_step(t, rng):
+            time.sleep(ctx["write_interval"])
+            status, _, _ = t.request("POST", "/order", form=_cart_form(rng, ctx["products"]))
+            return "POST /order", status
+        return ctx["user_cookie"](index), order_step
+
+    etag = [None]
+
+    def step(t, rng):
+        headers = {"If-None-Match": etag[0]} if etag[0] else {}
+        status, response_headers, _ = t.request("GET", "/admin/orders/pending-update", headers=headers)
+        etag[0] = response_headers.get("ETag") or etag[0]
+        return "GET /admin/orders/pending-update", status
+    return ctx["admin_cookie"], step
+
+
+def dashboard(ctx, index):
+    def step(t, rng):
+        status, _, _ = t.request("GET", "/dashboard")
+        return "GET /dashboard", status
+    return ctx["user_cookie"](index), step
+
+
+def redeem(ctx, index):
+    def step(t, rng):
+        form = {"reward_id": str(ctx["reward_id"]), "redeem_key": os.urandom(8).hex()}
+        status, _, _ = t.request("POST", "/redeem", form=form)
+        return "POST /redeem", status
+    return ctx["user_cookie"](index), step
+
+
+# ─── ตัวรัน ────────────────────────────────────────────────────────
+def run_scenario(name, ctx, args, app, port):
+    factory = globals()[name]
+    stats = {}
+    lock = threading.Lock()
+    stop = threading.Event()
+    barrier = threading.Barrier(args.threads + 1)
+
+    def worker(index):
+        cookie, step = factory(ctx, index)
+        t = HttpTransport(app, cookie, port) if port else TestClientTransport(app, cookie)
+        rng = random.Random(args.seed * 1000 + index)
+        mine = {}
+        barrier.wait()
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                label, status = step(t, rng)
+            except Exception as e:  # นับเป็น error แล้วทำต่อ
+                label, status = "error", type(e).__name__
+            elapsed = (time.perf_counter() - started) * 1000
+            s = mine.setdefault(label, {"latencies": [], "statuses": {}})
+            s["latencies"].append(elapsed)
+            s["statuses"][str(status)] = s["statuses"].get(str(status), 0) + 1
+        with lock:
+            for label, s in mine.items():
+                total = stats.setdefault(label, {"latencies": [], "statuses": {}})
+                total["latencies"].extend(s["latencies"])
+                for status, n in s["statuses"].items():
+                    total["statuses"][status] = total["statuses"].get(status, 0) + n
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    started = time.perf_counter()
+    time.sleep(args.duration)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    requests = {}
+    for label, s in sorted(stats.items()):
+        lat = s["latencies"]
+        requests[label] = {
+            "count": len(lat),
+            "rps": round(len(lat) / elapsed, 1),
+            "p50_ms": round(percentile(lat, 50), 2),
+            "p95_ms": round(percentile(lat, 95), 2),
+            "p99_ms": round(percentile(lat, 99), 2),
+            "statuses": s["statuses"],
+        }
+    total = sum(r["count"] for r in requests.values())
+    return {"rps": round(total / elapsed, 1), "requests": requests}
+
+
+def redeem_integrity(db_path, reward_id):
+    conn = sqlite3.connect(db_path)
+    try:
+        return {
+            "negative_points": conn.execute("SELECT COUNT(*) FROM user_points WHERE available_points < 0").fetchone()[0],
+            "negative_stock": conn.execute("SELECT COUNT(*) FROM rewards WHERE stock < 0").fetchone()[0],
+            "reward_stock_left": conn.execute("SELECT stock FROM rewards WHERE id = ?", (reward_id,)).fetchone()[0],
+        }
+    finally:
+        conn.close()
+
+
+def prepare_db(args):
+    """สร้าง/ใช้ฐานข้อมูล seed แล้วคัดลอกไปไฟล์ชั่วคราวสำหรับรอบนี้"""
+    seed_path = args.db or os.path.join(tempfile.gettempdir(), f"bench-seed-{args.scale}-{args.seed}.db")
+    if not os.path.exists(seed_path):
+        conn = ConnectionPool(seed_path).connect()
+        run_migrations(conn)
+        seed(conn, SCALES[args.scale], seed_value=args.seed)
+        conn.close()
+    conn = sqlite3.connect(seed_path)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    orders = conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+    conn.close()
+
+    run_path = os.path.join(tempfile.mkdtemp(prefix="bench-run-"), "shop.db")
+    shutil.copyfile(seed_path, run_path)
+    return seed_path, run_path, orders
+
+
+def build_context(app_module, db_path, args):
+    conn = sqlite3.connect(db_path)
+    products = [r[0] for r in conn.execute("SELECT id FROM products")]
+    # สมาชิกที่มีออเดอร์ (ให้หน้า dashboard มีข้อมูลจริง) และมีแต้มพอแลก
+    members = [r[0] for r in conn.execute(
+        "SELECT user_id FROM user_points WHERE available_points > 0 ORDER BY available_points DESC LIMIT 500"
+    )] or [r[0] for r in conn.execute("SELECT id FROM users WHERE is_admin = 0 LIMIT 500")]
+    admin_id = conn.execute("SELECT id FROM users WHERE is_admin = 1 LIMIT 1").fetchone()[0]
+    # รางวัลสต็อกจำกัดสำหรับ redeem
+    reward_id = conn.execute(
+        "INSERT INTO rewards (name, points_required, stock, description, is_active) "
+        "VALUES ('รางวัลโหลดเทสต์', 50, ?, '', 1)", (args.redeem_stock,)
+    ).lastrowid
+    conn.commit()
+    conn.close()
+
+    app = app_module.app
+    user_cookies = [session_cookie(app, user_id=uid, username=f"user{uid}") for uid in members]
+    return {
+        "products": products,
+        "reward_id": reward_id,
+        "write_interval": args.write_interval_ms / 1000,
+        "admin_cookie": session_cookie(app, user_id=admin_id, username="admin", is_admin=True),
+        "user_cookie": lambda index: user_cookies[index % len(user_cookies)],
+    }
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["scenarios"]
+
+    def change(new, old):
+        return round((new - old) / old * 100, 1) if old else None
+
+    out = {}
+    for name, result in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        out[name] = {"rps_change_pct": change(result["rps"], old["rps"]), "requests": {}}
+        for label, r in result["requests"].items():
+            o = old["requests"].get(label)
+            if o:
+                out[name]["requests"][label] = {
+                    "rps_change_pct": change(r["rps"], o["rps"]),
+                    "p95_change_pct": change(r["p95_ms"], o["p95_ms"]),
+                    "p99_change_pct": change(r["p99_ms"], o["p99_ms"]),
+                }
+    return out
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", help="ฐานข้อมูลจาก bench.seed (ถ้าไม่ระบุจะ seed ตาม --scale ไว้ใน temp)")
+    parser.add_argument("--scale", choices=sorted(SCALES, key=SCALES.get), default="10k")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="ค่าเริ่มต้น: ทุกสถานการณ์")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10, help="วินาทีต่อสถานการณ์")
+    parser.add_argument("--transport", choices=["client", "wsgi"], default="client")
+    parser.add_argument("--write-interval-ms", type=float, default=50, help="ช่วงห่างของออเดอร์ใน admin_poll")
+    parser.add_argument("--redeem-stock", type=int, default=200)
+    parser.add_argument("--out", help="บันทึกผลเป็นไฟล์ JSON")
+    parser.add_argument("--compare", help="ไฟล์ผลรอบก่อน (จาก --out) สำหรับคำนวณส่วนต่าง")
+    args = parser.parse_args()
+
+    seed_path, run_path, orders = prepare_db(args)
+    os.environ.setdefault("JOB_WORKERS", "1")
+    app_module = load_app(run_path)
+    ctx = build_context(app_module, run_path, args)
+
+    server = start_server(app_module.app) if args.transport == "wsgi" else None
+    port = server.server_port if server else None
+    results = {}
+    try:
+        for name in args.scenario or SCENARIOS:
+            results[name] = run_scenario(name, ctx, args, app_module.app, port)
+            if name == "redeem":
+                results[name]["integrity"] = redeem_integrity(run_path, ctx["reward_id"])
+    finally:
+        if server:
+            server.shutdown()
+
+    report = {
+        "benchmark": "scenarios",
+        "meta": {
+            "seed_db": seed_path,
+            "orders": orders,
+            "seed": args.seed,
+            "threads": args.threads,
+            "duration_s": args.duration,
+            "transport": args.transport,
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "started_at": int(time.time()),
+        },
+        "scenarios": results,
+    }
+    if args.compare:
+        report["compare"] = compare(results, args.compare)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    shutil.rmtree(os.path.dirname(run_path), ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""สร้างข้อมูลจำลองขนาดตามต้องการ (users, products, orders, order_items, แต้ม, การแลกรางวัล)
+
+ข้อมูลสุ่มจาก seed คงที่ รันซ้ำได้ผลเดิมทุกครั้ง การกระจายพยายามเหมือนร้านจริง:
+ออเดอร์ย้อนหลัง --days วัน (ช่วงหลังมีมากกว่า), หนาแน่นช่วงเช้า/เย็น, ~70% เป็นสมาชิก,
+ออเดอร์เก่าปิดจ๊อบหมดแล้ว ส่วนไม่กี่ชั่วโมงล่าสุดยังค้าง pending/confirmed/preparing
+แต้มเขียนผ่าน points_ledger แล้วคำนวณ user_points / user_daily_sales จาก ledger และออเดอร์
+
+    python -m bench.seed --db /tmp/shop.db --scale 100k [--seed 42]
+    python -m bench.seed --db /tmp/shop.db --orders 250000 --users 8000
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import time
+
+from bench._common import ROOT  # noqa: F401  (เพิ่มโฟลเดอร์แอปเข้า sys.path)
+from db import ConnectionPool
+from migrations import run_migrations, rebuild_user_daily_sales, rebuild_user_points
+
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+CATEGORIES = ["พวงมาลัย", "ของไหว้", "น้ำ", "อื่นๆ"]
+FIRST_NAMES = ["สมชาย", "สมหญิง", "วิชัย", "มาลี", "ประเสริฐ", "สุดา", "อนันต์", "กมลา", "ธนา", "ปราณี",
+               "ชัยวัฒน์", "นภา", "สุริยา", "พรทิพย์", "เกรียงไกร", "รัตนา", "บุญมี", "จันทร์เพ็ญ"]
+LAST_NAMES = ["ใจดี", "รักไทย", "ศรีสุข", "มั่นคง", "บุญมา", "แสงทอง", "วงศ์ใหญ่", "ทองดี", "พูนผล"]
+# น้ำหนักของแต่ละชั่วโมง (เช้าก่อนไปวัด/ที่ทำงาน และช่วงเย็น)
+HOUR_WEIGHTS = [1, 1, 1, 1, 2, 6, 10, 12, 9, 6, 5, 5, 6, 5, 4, 4, 6, 9, 10, 8, 5, 3, 2, 1]
+BATCH = 5000
+
+
+def _phone(rng):
+    return f"0{rng.choice('689')}{rng.randrange(10_000_000, 99_999_999)}"
+
+
+def _status(age_seconds, rng):
+    # ออเดอร์ที่เก่ากว่า 12 ชั่วโมงปิดจ๊อบแล้ว ที่ใหม่กว่านั้นยังอยู่ระหว่างทำ
+    if age_seconds > 12 * 3600:
+        return "completed"
+    if age_seconds > 3 * 3600:
+        return rng.choices(["completed", "preparing", "confirmed"], [70, 20, 10])[0]
+    return rng.choices(["pending", "confirmed", "preparing", "completed"], [50, 20, 15, 15])[0]
+
+
+def seed(conn, orders, users=None, products=120, days=365, seed_value=42, now=None):
+    """เติมข้อมูลลงฐานที่ migrate แล้ว คืนจำนวนแถวที่สร้างของแต่ละตาราง"""
+    rng = random.Random(seed_value)
+    now = now or int(time.time())
+    users = users if users is not None else max(50, orders // 25)
+    conn.execute("PRAGMA synchronous = OFF")
+
+    # ─── สินค้า / ผู้ใช้ / รางวัล ─────────────────────────────────────
+    conn.executemany(
+        "INSERT INTO products (name, price, category) VALUES (?, ?, ?)",
+        [(f"{CATEGORIES[i % len(CATEGORIES)]} แบบที่ {i + 1}", rng.choice([20, 35, 49, 89, 120, 199, 350, 500]),
+          CATEGORIES[i % len(CATEGORIES)]) for i in range(products)]
+    )
+    catalog = [(r[0], r[1], r[2]) for r in conn.execute("SELECT id, name, price FROM products")]
+    # สินค้าขายดีไม่กี่ตัวขายได้มากกว่าตัวอื่นมาก
+    product_cum = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(catalog))))
+
+    first_user = (conn.execute("SELECT COALESCE(MAX(id), 0) FROM users").fetchone()[0] or 0) + 1
+    conn.executemany(
+        "INSERT INTO users (id, username, email, password_hash, created_at, phone) VALUES (?, ?, ?, '', ?, ?)",
+        [(first_user + i, f"seed_user_{seed_value}_{i}", f"seed{seed_value}_{i}@example.com",
+          now - rng.randrange(days * 86400), _phone(rng)) for i in range(users)]
+    )
+    user_ids = list(range(first_user, first_user + users))
+    user_names = {uid: f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}" for uid in user_ids}
+    user_phones = dict(conn.execute("SELECT id, phone FROM users WHERE id >= ?", (first_user,)).fetchall())
+    # ลูกค้าประจำส่วนน้อยสั่งบ่อยกว่าคนอื่น
+    user_cum = list(itertools.accumulate(rng.paretovariate(1.5) for _ in user_ids))
+
+    if conn.execute("SELECT COUNT(*) FROM rewards").fetchone()[0] == 0:
+        conn.executemany(
+            "INSERT INTO rewards (name, points_required, stock, description, is_active) VALUES (?, ?, ?, '', 1)",
+            [("น้ำดื่ม แพ็ค 24 ขวด", 150, 999), ("พวงมาลัยดอกมะลิพรีเมียม", 400, 500)]
+        )
+    rewards = conn.execute("SELECT id, name, points_required FROM rewards WHERE is_active = 1").fetchall()
+    conn.commit()
+
+    # ─── ออเดอร์ ─────────────────────────────────────────────────────
+    # วันที่: ร้านโตขึ้นเรื่อยๆ (ช่วงหลังมีออเดอร์มากกว่า) และชั่วโมงตาม HOUR_WEIGHTS
+    day_weights = [1 + 2 * (d / days) for d in range(days)]
+    today = now - now % 86400
+    next_order = (conn.execute("SELECT COALESCE(MAX(id), 0) FROM orders").fetchone()[0] or 0) + 1
+    counts = {"orders": 0, "order_items": 0, "points_ledger": 0, "redeemed_rewards": 0}
+    earned = {}
+
+    # สุ่มเวลาสั่งของทุกออเดอร์ก่อนแล้วเรียง เลขออเดอร์จึงเพิ่มตามเวลาเหมือนที่แอปสร้างจริง
+    created_at = []
+    for day_back, hour in zip(rng.choices(range(days), day_weights[::-1], k=orders),
+                              rng.choices(range(24), HOUR_WEIGHTS, k=orders)):
+        created = today - day_back * 86400 + hour * 3600 + rng.randrange(3600)
+        if created > now:
+            created = now - rng.randrange(6 * 3600)
+        created_at.append(created)
+    created_at.sort()
+
+    for start in range(0, orders, BATCH):
+        batch_created = created_at[start:start + BATCH]
+        n = len(batch_created)
+        buyers = rng.choices(user_ids, cum_weights=user_cum, k=n)
+        order_rows, item_rows, ledger_rows = [], [], []
+        for i in range(n):
+            created = batch_created[i]
+            status = _status(now - created, rng)
+            user_id = buyers[i] if rng.random() < 0.7 else None
+            name = user_names[user_id] if user_id else f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+            phone = user_phones[user_id] if user_id else _phone(rng)
+
+            order_id = next_order
+            next_order += 1
+            total = item_count = 0
+            lines = rng.choices(catalog, cum_weights=product_cum,
+                                k=rng.choices([1, 2, 3, 4, 5], [35, 30, 20, 10, 5])[0])
+            for _, product_name, price in {line[0]: line for line in lines}.values():
+                qty = rng.choices([1, 2, 3, 5], [70, 20, 7, 3])[0]
+                item_rows.append((order_id, product_name, price, qty))
+                total += price * qty
+                item_count += qty
+            updated = created + rng.randrange(600, 7200) if status != "pending" else None
+            order_rows.append((order_id, name, phone, user_id, status, total, item_count, created, updated))
+
+            if user_id and status == "completed" and total // 10:
+                ledger_rows.append((user_id, "earn", total // 10, f"order:{order_id}",
+                                    f"order:{order_id}:earn", updated))
+                earned[user_id] = earned.get(user_id, 0) + total // 10
+
+        # order_items ก่อน orders: ยังไม่มีแถว orders ให้ trigger บวกยอดซ้ำ (ยอดรวมคำนวณมาแล้วด้านบน)
+        conn.executemany(
+            "INSERT INTO order_items (order_id, product_name, price, quantity) VALUES (?, ?, ?, ?)", item_rows
+        )
+        conn.executemany(
+            "INSERT INTO orders (id, customer_name, phone, user_id, status, total, item_count, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", order_rows
+        )
+        conn.executemany(
+            "INSERT INTO points_ledger (user_id, kind, delta, ref, idempotency_key, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)", ledger_rows
+        )
+        conn.commit()
+        counts["orders"] += len(order_rows)
+        counts["order_items"] += len(item_rows)
+        counts["points_ledger"] += len(ledger_rows)
+
+    # ─── การแลกรางวัล: ราว 1 ใน 3 ของสมาชิกที่มีแต้มพอใช้ไปบางส่วน ──────────
+    redeemed, ledger_rows = [], []
+    for user_id, points in earned.items():
+        if rng.random() > 0.35:
+            continue
+        for reward_id, reward_name, cost in rewards:
+            while points >= cost and rng.random() < 0.5:
+                points -= cost
+                at = now - rng.randrange(days * 86400 // 2)
+                redeemed.append((user_id, reward_name, cost, at))
+                ledger_rows.append((user_id, "redeem", -cost, f"reward:{reward_id}",
+                                    f"seed:redeem:{seed_value}:{len(redeemed)}", at))
+    conn.executemany(
+        "INSERT INTO redeemed_rewards (user_id, reward_name, points_used, redeemed_at) VALUES (?, ?, ?, ?)", redeemed
+    )
+    conn.executemany(
+        "INSERT INTO points_ledger (user_id, kind, delta, ref, idempotency_key, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+        ledger_rows
+    )
+    counts["redeemed_rewards"] = len(redeemed)
+    counts["points_ledger"] += len(ledger_rows)
+
+    # ตารางสรุปคำนวณจากข้อมูลดิบด้วยฟังก์ชันเดียวกับ flask repair-points / backfill-daily-sales
+    c = conn.cursor()
+    rebuild_user_points(c)
+    rebuild_user_daily_sales(c)
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA synchronous = NORMAL")
+
+    counts.update(users=users, products=products)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", required=True, help="ไฟล์ฐานข้อมูล (สร้างใหม่ถ้ายังไม่มี)")
+    size = parser.add_mutually_exclusive_group()
+    size.add_argument("--scale", choices=sorted(SCALES, key=SCALES.get), default="1k")
+    size.add_argument("--orders", type=int, help="จำนวนออเดอร์ (แทน --scale)")
+    parser.add_argument("--users", type=int, default=None, help="ค่าเริ่มต้น: orders / 25")
+    parser.add_argument("--products", type=int, default=120)
+    parser.add_argument("--days", type=int, default=365, help="ช่วงวันที่ย้อนหลังของออเดอร์")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--force", action="store_true", help="ลบไฟล์เดิมก่อน")
+    args = parser.parse_args()
+
+    if args.force:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+
+    orders = args.orders if args.orders is not None else SCALES[args.scale]
+    conn = ConnectionPool(args.db).connect()
+    run_migrations(conn)
+    started = time.perf_counter()
+    counts = seed(conn, orders, users=args.users, products=args.products, days=args.days, seed_value=args.seed)
+    conn.close()
+
+    print(json.dumps({"seed": args.seed, "db": args.db, "rows": counts,
+                      "elapsed_s": round(time.perf_counter() - started, 1)}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
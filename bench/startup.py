@@ -0,0 +1,86 @@
+"""เวลาเริ่ม worker ใหม่จนตอบ request แรกเสร็จ: ไม่มี bytecode cache / cache ว่าง / cache อุ่นแล้ว
+
+แต่ละแบบรันใน process ใหม่ (เหมือน gunicorn เพิ่ม worker) แล้วขอหน้า /admin /my-orders /
+รายงานเวลาของแต่ละช่วงจาก startup report ของแอป (imports, app_setup, init_db, templates)
+
+    python -m bench.startup [--runs 5]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from bench._common import ROOT, temp_db_path, percentile
+
+CHILD = r"""
+import json, time
+import app as m
+m.init_db()
+m.app.config.update(TESTING=True)
+client = m.app.test_client()
+with client.session_transaction() as sess:
+    sess["is_admin"] = True
+    sess["user_id"] = 1
+started = time.perf_counter()
+for path in ("/admin", "/my-orders", "/"):
+    assert client.get(path).status_code == 200, path
+first = (time.perf_counter() - started) * 1000
+report = m.startup_report.snapshot()
+print(json.dumps({"phases_ms": report["phases_ms"], "first_requests_ms": round(first, 2),
+                  "total_ms": round((time.perf_counter() - m._import_started) * 1000, 2)}))
+"""
+
+MODES = (
+    # (ชื่อ, ใช้ bytecode cache, ล้าง cache ก่อนรัน, precompile ตอน import)
+    ("no_cache", False, False, False),
+    ("cold_cache", True, True, False),
+    ("warm_cache", True, False, False),
+    ("warm_cache_precompile", True, False, True),
+)
+
+
+def run_child(env):
+    out = subprocess.run([sys.executable, "-c", CHILD], cwd=ROOT, env=env, check=True,
+                         capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    db_path = temp_db_path()
+    cache_dir = tempfile.mkdtemp(prefix="jinja-cache-")
+    base_env = dict(os.environ, DATABASE_PATH=db_path, JOB_WORKERS="0")
+    run_child(dict(base_env, JINJA_BYTECODE_CACHE="0"))  # สร้างฐานข้อมูลและ .pyc ก่อน
+
+    results = {}
+    for label, use_cache, clear, precompile in MODES:
+        env = dict(base_env, JINJA_BYTECODE_CACHE=cache_dir if use_cache else "0",
+                   TEMPLATE_PRECOMPILE="1" if precompile else "0")
+        runs = []
+        for _ in range(args.runs):
+            if clear:
+                shutil.rmtree(cache_dir, ignore_errors=True)
+            runs.append(run_child(env))
+        phases = {}
+        for run in runs:
+            for name, ms in run["phases_ms"].items():
+                phases.setdefault(name, []).append(ms)
+        results[label] = {
+            "phases_p50_ms": {name: round(percentile(v, 50), 2) for name, v in phases.items()},
+            "first_requests_p50_ms": round(percentile([r["first_requests_ms"] for r in runs], 50), 2),
+            "total_p50_ms": round(percentile([r["total_ms"] for r in runs], 50), 2),
+        }
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+    print(json.dumps({"benchmark": "startup", "runs": args.runs, "results": results},
+                     ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""วัด requests/sec ของหน้าแรก (/) เมื่อเปิดและปิดแคชตารางสินค้า
+
+    python -m bench.storefront [--requests 2000] [--products 200]
+"""
+import argparse
+import json
+import time
+
+from bench._common import load_app
+
+
+def measure(client, n):
+    for _ in range(min(n, 50)):  # warm-up
+        client.get("/")
+    started = time.perf_counter()
+    for _ in range(n):
+        response = client.get("/")
+        assert response.status_code == 200
+    return round(n / (time.perf_counter() - started), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--products", type=int, default=200, help="จำนวนสินค้าที่เพิ่มเข้า catalog")
+    args = parser.parse_args()
+
+    app_module = load_app()
+    with app_module.app.app_context():
+        conn = app_module.get_db()
+        conn.executemany(
+            "INSERT INTO products (name, price, category) VALUES (?, ?, ?)",
+            [(f"สินค้าทดสอบ {i}", 20 + i, ["พวงมาลัย", "ของไหว้", "น้ำ", "อื่นๆ"][i % 4])
+             for i in range(args.products)]
+        )
+        conn.commit()
+
+    client = app_module.app.test_client()
+    cache = app_module.fragment_cache
+    results = {}
+    for label, enabled in (("cache_off", False), ("cache_on", True)):
+        cache.enabled = enabled
+        cache.clear()
+        results[f"{label}_rps"] = measure(client, args.requests)
+    results["speedup"] = round(results["cache_on_rps"] / results["cache_off_rps"], 2)
+    results["cache"] = cache.snapshot()
+
+    print(json.dumps({"benchmark": "storefront", "requests": args.requests,
+                      "products": args.products, **results}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
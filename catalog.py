@@ -0,0 +1,55 @@
+import threading
+from collections import namedtuple
+
+Product = namedtuple("Product", "id name price category")
+
+CatalogSnapshot = namedtuple("CatalogSnapshot", "version products by_category prices")
+
+
+class ProductCatalog:
+    """แคชรายการสินค้าใน memory ของ worker พร้อมจัดกลุ่มตามหมวดไว้แล้ว
+
+    ความสดของข้อมูลตรวจจาก change_versions('products') ใน SQLite ซึ่ง trigger ของตาราง
+    products เพิ่มให้ทุกครั้งที่มีการเขียน ทุก worker จึงเห็นการแก้ไขของกันและกันได้ด้วย
+    query ตาม primary key แค่ครั้งเดียวต่อ request
+    """
+
+    def __init__(self):
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "reloads": 0}
+
+    @staticmethod
+    def read_version(conn):
+        row = conn.execute("SELECT version FROM change_versions WHERE name = 'products'").fetchone()
+        return row[0] if row else 0
+
+    def get(self, conn):
+        version = self.read_version(conn)
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            self.stats["hits"] += 1
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.version != version:
+                snapshot = self._snapshot = self._load(conn, version)
+                self.stats["reloads"] += 1
+        return snapshot
+
+    def invalidate(self):
+        # ใช้หลังแอดมินแก้สินค้าใน worker นี้ (worker อื่นจะเห็นจาก version ใน SQLite เอง)
+        self._snapshot = None
+
+    @staticmethod
+    def _load(conn, version):
+        products = [
+            Product(*r) for r in
+            conn.execute("SELECT id, name, price, category FROM products ORDER BY category, name")
+        ]
+        by_category = {}
+        for p in products:
+            by_category.setdefault(p.category, []).append(p)
+        prices = {p.id: (p.name, p.price) for p in products}
+        return CatalogSnapshot(version, products, by_category, prices)
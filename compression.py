@@ -0,0 +1,140 @@
+import threading
+import zlib
+
+from flask import request
+
+try:  # brotli เป็น optional: ถ้าไม่มีจะตอบเป็น gzip อย่างเดียว
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    "text/html", "text/plain", "text/css", "text/javascript", "text/xml",
+    "application/javascript", "application/json", "application/xml", "image/svg+xml",
+}
+
+
+class _Gzip:
+    def __init__(self, level):
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        return self._z.compress(data)
+
+    def flush(self):
+        return self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._z.flush()
+
+
+class _Brotli:
+    def __init__(self, quality):
+        self._c = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._c.process(data)
+
+    def flush(self):
+        return self._c.flush()
+
+    def finish(self):
+        return self._c.finish()
+
+
+class Compressor:
+    """บีบอัด response (gzip / brotli ตาม Accept-Encoding) ใน after_request
+
+    response ปกติถูกบีบทั้งก้อนเมื่อใหญ่กว่า min_size ส่วน response แบบ stream ถูกบีบทีละชิ้น
+    (flush ทุกชิ้น browser จึงได้ byte แรกก่อน render เสร็จ) ไม่ยุ่งกับไฟล์ (send_file),
+    SSE, response ที่มี Content-Encoding แล้ว และ Cache-Control: no-transform
+    ETag ของ response ที่บีบถูกทำเป็น weak (เนื้อหาเท่าเดิมแต่ byte ไม่เหมือนต้นฉบับ)
+    """
+
+    def __init__(self, min_size=1024, level=6, brotli_quality=4):
+        self.min_size = min_size
+        self.level = level
+        self.brotli_quality = brotli_quality
+        self.enabled = True
+        self._lock = threading.Lock()
+        self.stats = {"compressed": 0, "streamed": 0, "skipped_small": 0, "bytes_in": 0, "bytes_out": 0}
+
+    def init_app(self, app):
+        app.after_request(self.after_request)
+
+    def _encoding(self):
+        accepted = request.accept_encodings
+        if brotli is not None and accepted["br"]:
+            return "br"
+        if accepted["gzip"]:
+            return "gzip"
+        return None
+
+    def _compressor(self, encoding):
+        return _Brotli(self.brotli_quality) if encoding == "br" else _Gzip(self.level)
+
+    def _count(self, **deltas):
+        with self._lock:
+            for key, value in deltas.items():
+                self.stats[key] += value
+
+    def after_request(self, response):
+        if not self.enabled or request.method == "HEAD":
+            return response
+        if response.status_code < 200 or response.status_code in (204, 304):
+            return response
+        if response.direct_passthrough or "Content-Encoding" in response.headers:
+            return response
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+            return response
+        if "no-transform" in response.headers.get("Cache-Control", ""):
+            return response
+
+        response.vary.add("Accept-Encoding")
+        encoding = self._encoding()
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = self._stream(response.iter_encoded(), encoding)
+            response.headers.pop("Content-Length", None)
+            self._count(streamed=1)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                self._count(skipped_small=1)
+                return response
+            comp = self._compressor(encoding)
+            packed = comp.compress(data) + comp.finish()
+            response.set_data(packed)
+            self._count(compressed=1, bytes_in=len(data), bytes_out=len(packed))
+
+        response.headers["Content-Encoding"] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+    def _stream(self, chunks, encoding):
+        comp = self._compressor(encoding)
+        size_in = size_out = 0
+        try:
+            for chunk in chunks:
+                size_in += len(chunk)
+                data = comp.compress(chunk) + comp.flush()
+                if data:
+                    size_out += len(data)
+                    yield data
+            tail = comp.finish()
+            size_out += len(tail)
+            yield tail
+        finally:
+            self._count(bytes_in=size_in, bytes_out=size_out)
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats["ratio"] = round(stats["bytes_out"] / stats["bytes_in"], 4) if stats["bytes_in"] else 0.0
+        stats.update(enabled=self.enabled, min_size=self.min_size, level=self.level,
+                     brotli=brotli is not None)
+        return stats
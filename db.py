@@ -0,0 +1,253 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from flask import g
+
+# ─── ค่า PRAGMA ที่ใช้กับทุก connection ─────────────────────────────
+# WAL: ผู้อ่านไม่บล็อกผู้เขียน (และผู้เขียนไม่บล็อกผู้อ่าน)
+# synchronous=NORMAL: ใน WAL ปลอดภัยต่อไฟดับระดับ transaction และ fsync น้อยลงมาก
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,          # มิลลิวินาที รอ lock แทนที่จะโยน "database is locked" ทันที
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -32000,          # ค่าติดลบ = KiB (ประมาณ 32 MB ต่อ connection)
+    "temp_store": "MEMORY",
+}
+
+
+# ─── connection ที่จับเวลาทุก statement (ใช้เมื่อมี query hook) ──────────
+# hook ถูกเรียกด้วย (conn, sql, params, seconds, rows) เมื่อ statement จบ: อ่านผลหมด, cursor ถูกใช้ซ้ำ/ปิด
+# หรือถูกเก็บกวาด เวลารวมทั้งตอน execute และตอน fetch
+class InstrumentedCursor(sqlite3.Cursor):
+    _stmt = None
+
+    def _finish(self):
+        stmt, self._stmt = self._stmt, None
+        if stmt is not None:
+            sql, params, seconds, rows = stmt
+            if not rows and self.rowcount > 0:
+                rows = self.rowcount  # INSERT/UPDATE/DELETE: จำนวนแถวที่เปลี่ยน
+            for hook in self.connection.query_hooks:
+                hook(self.connection, sql, params, seconds, rows)
+
+    def _timed(self, fn, *args):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            if self._stmt is not None:
+                self._stmt[2] += time.perf_counter() - started
+
+    def execute(self, sql, params=()):
+        self._finish()
+        self._stmt = [sql, params, 0.0, 0]
+        try:
+            return self._timed(super().execute, sql, params)
+        except sqlite3.Error:
+            self._finish()
+            raise
+
+    def executemany(self, sql, seq_of_params):
+        self._finish()
+        self._stmt = [sql, None, 0.0, 0]
+        try:
+            return self._timed(super().executemany, sql, seq_of_params)
+        finally:
+            self._finish()
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is None:
+            self._finish()
+        elif self._stmt is not None:
+            self._stmt[3] += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(super().fetchmany, self.arraysize if size is None else size)
+        if self._stmt is not None:
+            self._stmt[3] += len(rows)
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        if self._stmt is not None:
+            self._stmt[3] += len(rows)
+        self._finish()
+        return rows
+
+    def __next__(self):
+        try:
+            row = self._timed(super().__next__)
+        except StopIteration:
+            self._finish()
+            raise
+        if self._stmt is not None:
+            self._stmt[3] += 1
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        self._finish()
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    query_hooks = ()
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+
+class ConnectionPool:
+    """Pool ของ sqlite3 connection แบบจำกัดจำนวน ใช้ร่วมกันภายใน worker เดียว
+
+    หนึ่ง request ได้หนึ่ง connection (ผูกกับ flask.g) และคืนเข้า pool ตอน teardown
+    """
+
+    def __init__(self, path, size=8, timeout=10.0, pragmas=None):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self.pragmas = dict(DEFAULT_PRAGMAS if pragmas is None else pragmas)
+        self.query_hooks = []
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue(maxsize=self.size)
+        self._lock = threading.Lock()
+        self._created = 0
+        self._stats = {
+            "acquired": 0,
+            "hits": 0,
+            "created": 0,
+            "waits": 0,
+            "wait_time_ms": 0.0,
+            "max_wait_ms": 0.0,
+            "timeouts": 0,
+            "discarded": 0,
+        }
+
+    # ─── สร้าง connection ────────────────────────────────────────────
+    def add_query_hook(self, hook):
+        """ให้ connection ที่สร้างหลังจากนี้เรียก hook(conn, sql, params, seconds, rows) ทุก statement"""
+        self.query_hooks.append(hook)
+
+    def connect(self):
+        # ไม่มี hook ใช้ connection ปกติของ sqlite3 (ไม่มี overhead ของการจับเวลา)
+        factory = InstrumentedConnection if self.query_hooks else sqlite3.Connection
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False, factory=factory)
+        if self.query_hooks:
+            conn.query_hooks = self.query_hooks
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    # ─── ยืม / คืน ───────────────────────────────────────────────────
+    def acquire(self):
+        # หลัง fork (gunicorn --preload) ห้ามใช้ connection ของ process แม่
+        if self._pid != os.getpid():
+            self._reset()
+
+        try:
+            conn = self._idle.get_nowait()
+            with self._lock:
+                self._stats["acquired"] += 1
+                self._stats["hits"] += 1
+            return conn
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+        if can_create:
+            try:
+                conn = self.connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+            with self._lock:
+                self._stats["acquired"] += 1
+                self._stats["created"] += 1
+            return conn
+
+        # pool เต็ม ต้องรอให้ request อื่นคืน connection
+        started = time.perf_counter()
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise sqlite3.OperationalError("connection pool exhausted")
+        waited = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._stats["acquired"] += 1
+            self._stats["waits"] += 1
+            self._stats["wait_time_ms"] += waited
+            self._stats["max_wait_ms"] = max(self._stats["max_wait_ms"], waited)
+        return conn
+
+    def release(self, conn):
+        if self._pid != os.getpid():
+            return
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put_nowait(conn)
+        except (sqlite3.Error, queue.Full):
+            self._discard(conn)
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._created -= 1
+            self._stats["discarded"] += 1
+
+    # ─── ผูกกับ Flask request ───────────────────────────────────────
+    def request_connection(self):
+        conn = g.get("_db_conn")
+        if conn is None:
+            conn = g._db_conn = self.acquire()
+        return conn
+
+    def teardown(self, exc=None):
+        conn = g.pop("_db_conn", None)
+        if conn is not None:
+            self.release(conn)
+
+    def init_app(self, app):
+        app.teardown_appcontext(self.teardown)
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+            data["size"] = self.size
+            data["open"] = self._created
+        data["idle"] = self._idle.qsize()
+        data["in_use"] = data["open"] - data["idle"]
+        data["hit_rate"] = round(data["hits"] / data["acquired"], 4) if data["acquired"] else 0.0
+        data["wait_time_ms"] = round(data["wait_time_ms"], 3)
+        data["max_wait_ms"] = round(data["max_wait_ms"], 3)
+        return data
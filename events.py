@@ -0,0 +1,70 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+
+class EventBus:
+    """Event bus ภายใน process สำหรับส่งการเปลี่ยนแปลงออเดอร์ไปยังหน้าแอดมิน (SSE)
+
+    เก็บ event ล่าสุดไว้ในบัฟเฟอร์วงกลม เพื่อให้ client ที่หลุดแล้วต่อใหม่
+    ส่ง Last-Event-ID มาแล้วได้ event ที่พลาดไปครบ
+
+    หมายเหตุ: event อยู่ใน memory ของ worker เดียว ถ้ารันหลาย worker
+    แอดมินจะได้ event ทีละใบเฉพาะของ worker ที่ตัวเองต่ออยู่ ส่วนของ worker อื่น
+    /admin/orders/stream ตรวจจาก change version ทุก heartbeat แล้วส่ง refresh แทน
+    """
+
+    def __init__(self, history=500):
+        # epoch เปลี่ยนทุกครั้งที่ process เริ่มใหม่ id เก่าจึงใช้ resume ไม่ได้
+        self.epoch = f"{os.getpid():x}{int(time.time()):x}"
+        self._events = deque(maxlen=history)
+        self._seq = 0
+        self._cond = threading.Condition()
+
+    def publish(self, event, data):
+        with self._cond:
+            self._seq += 1
+            self._events.append((self._seq, event, data))
+            self._cond.notify_all()
+            return self._seq
+
+    @property
+    def last_seq(self):
+        with self._cond:
+            return self._seq
+
+    def parse_id(self, last_event_id):
+        """แปลง Last-Event-ID เป็นเลขลำดับ คืน None ถ้า resume ต่อไม่ได้"""
+        if not last_event_id:
+            return self._seq
+        epoch, _, seq = last_event_id.partition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        seq = int(seq)
+        with self._cond:
+            oldest = self._events[0][0] if self._events else self._seq + 1
+            if seq > self._seq or seq < oldest - 1:
+                return None
+        return seq
+
+    def wait(self, after, timeout):
+        """รอจนมี event ที่ใหม่กว่า after หรือจนหมดเวลา คืน list ของ (seq, event, data)"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > after, timeout=timeout)
+            return [e for e in self._events if e[0] > after]
+
+    def event_id(self, seq):
+        return f"{self.epoch}-{seq}"
+
+
+def sse_message(event, data, event_id=None):
+    lines = []
+    if event_id:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    payload = data if isinstance(data, str) else json.dumps(data, ensure_ascii=False)
+    for line in payload.splitlines() or [""]:
+        lines.append(f"data: {line}")
+    return "\n".join(lines) + "\n\n"
@@ -0,0 +1,65 @@
+import threading
+from collections import OrderedDict
+
+from markupsafe import Markup
+
+
+class FragmentCache:
+    """แคช HTML ที่ render แล้ว (LRU) จำกัดทั้งจำนวนรายการและขนาดรวมเป็นไบต์
+
+    key ต้องมีทุกอย่างที่ทำให้ HTML ต่างกัน (เช่น catalog version) และ fragment
+    ต้องไม่มีข้อมูลเฉพาะผู้ใช้อย่าง CSRF token หรือ session
+    """
+
+    def __init__(self, max_entries=64, max_bytes=2 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.enabled = True
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get_or_render(self, key, render):
+        if not self.enabled:
+            return Markup(render())
+
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return html
+            self.stats["misses"] += 1
+
+        # render นอก lock; ถ้าสอง request render พร้อมกันก็แค่ได้ผลเดียวกันสองครั้ง
+        html = Markup(render())
+        size = len(html.encode("utf-8"))
+        if size > self.max_bytes:
+            return html
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old.encode("utf-8"))
+            self._entries[key] = html
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.encode("utf-8"))
+                self.stats["evictions"] += 1
+        return html
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def snapshot(self):
+        with self._lock:
+            data = dict(self.stats, entries=len(self._entries), bytes=self._bytes,
+                        max_entries=self.max_entries, max_bytes=self.max_bytes,
+                        enabled=self.enabled)
+        lookups = data["hits"] + data["misses"]
+        data["hit_rate"] = round(data["hits"] / lookups, 4) if lookups else 0.0
+        return data
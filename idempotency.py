@@ -0,0 +1,82 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Entry:
+    __slots__ = ("expires", "done", "result")
+
+    def __init__(self, expires):
+        self.expires = expires
+        self.done = threading.Event()
+        self.result = None
+
+
+class IdempotencyStore:
+    """จำผลของคำขอที่มี idempotency token ไว้ชั่วคราว (TTL) จำกัดจำนวน key แบบ LRU
+
+    คำขอแรกของ token เป็นคนทำงานจริง คำขอซ้ำที่มาระหว่างนั้นจะรอผลของคำขอแรก
+    คำขอซ้ำที่มาทีหลังได้ผลเดิมทันที ผลที่เป็น None (เช่นตะกร้าไม่ถูกต้อง) และ exception ไม่ถูกจำ
+
+    เก็บใน memory ของ worker เดียว จึงเป็นแค่ทางลัด ผู้เรียกต้องมีตัวกันที่ทุก worker เห็นด้วย
+    (ออเดอร์ใช้ตาราง order_tokens ดู orders_write.insert_order)
+    """
+
+    def __init__(self, ttl=600, max_entries=10000, wait_timeout=10.0):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.wait_timeout = wait_timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"first": 0, "replayed": 0, "evictions": 0}
+
+    def _claim(self, key, now):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires > now:
+                return entry, False
+            entry = self._entries[key] = _Entry(now + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+            return entry, True
+
+    def _forget(self, key, entry):
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+
+    def run(self, key, fn):
+        """คืน (ผลลัพธ์, replayed) — replayed=True ถ้าได้ผลเดิมของคำขอก่อนหน้าโดยไม่เรียก fn"""
+        while True:
+            entry, first = self._claim(key, time.monotonic())
+            if first:
+                break
+            # คำขอแรกยังทำอยู่ (กดซ้ำติดกัน) รอผลของมันแทนการเขียนซ้ำ
+            if entry.done.wait(self.wait_timeout) and entry.result is not None:
+                with self._lock:
+                    self.stats["replayed"] += 1
+                return entry.result, True
+            if not entry.done.is_set():
+                raise TimeoutError("idempotent request is still in progress")
+            # คำขอแรกไม่สำเร็จ (ถูกลืมไปแล้ว) ลองใหม่ในฐานะคำขอแรก
+
+        try:
+            result = fn()
+        except BaseException:
+            self._forget(key, entry)
+            entry.done.set()
+            raise
+        if result is None:
+            self._forget(key, entry)
+        entry.result = result
+        entry.done.set()
+        with self._lock:
+            self.stats["first"] += 1
+        return result, False
+
+    def snapshot(self):
+        with self._lock:
+            return {**self.stats, "entries": len(self._entries), "ttl": self.ttl,
+                    "max_entries": self.max_entries}
@@ -0,0 +1,213 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import traceback
+
+log = logging.getLogger(__name__)
+
+
+class JobQueue:
+    """งานเบื้องหลังแบบ durable: แถวในตาราง jobs + thread pool ภายใน worker
+
+    enqueue() เขียนงานลง connection ของผู้เรียก จึง commit พร้อมข้อมูลหลัก (งานไม่หายถ้า
+    transaction สำเร็จ และไม่เกิดถ้า rollback) แล้วผู้เรียกปลุก worker ด้วย notify() หลัง commit
+    worker thread หยิบงานที่ถึงเวลาด้วย UPDATE แบบมีเงื่อนไข (หลาย process แย่งกันได้อย่างปลอดภัย)
+    งานที่ล้มเหลวถูกลองใหม่แบบ backoff จนครบ max_attempts งานที่ค้างสถานะ running
+    เกิน lease_seconds (process ตาย) ถูกหยิบใหม่
+
+    handler รับ (conn, payload) และต้องทำงานซ้ำได้อย่างปลอดภัย (อาจถูกรันมากกว่าหนึ่งครั้ง)
+    เวลาทั้งหมดเป็น epoch วินาทีแบบทศนิยม เพื่อวัด latency ระดับมิลลิวินาที
+    """
+
+    def __init__(self, pool, workers=2, poll_interval=0.5, lease_seconds=300, backoff=2.0,
+                 keep_seconds=7 * 86400):
+        self.pool = pool
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.backoff = backoff
+        self.keep_seconds = keep_seconds
+        self.handlers = {}
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+
+    def handler(self, kind):
+        def decorator(fn):
+            self.handlers[kind] = fn
+            return fn
+        return decorator
+
+    # ─── ฝั่ง request ────────────────────────────────────────────────
+    def enqueue(self, conn, kind, payload=None, max_attempts=5, delay=0.0):
+        """เพิ่มงานใน transaction ของ conn คืน job id
+
+        ผู้เรียก commit เองแล้วค่อยเรียก notify() ถ้าปลุกก่อน commit worker จะรอ write lock
+        ของ transaction นี้ หรือหาแถวที่ยังไม่ commit ไม่เจอแล้วหลับไปอีก poll_interval
+        """
+        if kind not in self.handlers:
+            raise KeyError(f"no handler for job kind {kind!r}")
+        now = time.time()
+        cur = conn.execute(
+            "INSERT INTO jobs (kind, payload, max_attempts, run_after, created_at) VALUES (?, ?, ?, ?, ?)",
+            (kind, json.dumps(payload or {}, ensure_ascii=False), max_attempts, now + delay, now)
+        )
+        return cur.lastrowid
+
+    def notify(self):
+        with self._wake:
+            self._wake.notify()
+
+    # ─── ฝั่ง worker ─────────────────────────────────────────────────
+    def start(self):
+        """เริ่ม worker thread (เรียกซ้ำได้ และเริ่มใหม่หลัง fork)"""
+        if self._pid != os.getpid():
+            self._reset()
+        if self._threads or self.workers <= 0:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for n in range(self.workers):
+                t = threading.Thread(target=self._run, name=f"job-worker-{n}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def _claim(self, conn):
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("""
+                SELECT id, kind, payload, attempts, max_attempts, created_at FROM jobs
+                WHERE (status = 'queued' AND run_after <= ?)
+                   OR (status = 'running' AND started_at < ?)
+                ORDER BY run_after, id
+                LIMIT 1
+            """, (now, now - self.lease_seconds)).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', started_at = ?, attempts = attempts + 1 WHERE id = ?",
+                    (now, row[0])
+                )
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        return row
+
+    def run_one(self, conn):
+        """หยิบและรันงานที่ถึงเวลาหนึ่งงาน คืน False ถ้าไม่มีงาน"""
+        job = self._claim(conn)
+        if job is None:
+            return False
+
+        job_id, kind, payload, attempts, max_attempts, _ = job
+        attempts += 1
+        started = time.time()
+        try:
+            self.handlers[kind](conn, json.loads(payload))
+            if conn.in_transaction:
+                conn.commit()
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            finished = time.time()
+            error = "".join(traceback.format_exception_only(type(e), e)).strip()
+            if attempts < max_attempts:
+                log.warning("job %s (%s) failed, attempt %s/%s: %s", job_id, kind, attempts, max_attempts, error)
+                status, run_after = "queued", finished + self.backoff ** attempts
+            else:
+                log.error("job %s (%s) gave up after %s attempts: %s", job_id, kind, attempts, error)
+                status, run_after = "failed", started
+            conn.execute(
+                "UPDATE jobs SET status = ?, run_after = ?, finished_at = ?, duration_ms = ?, last_error = ? "
+                "WHERE id = ?",
+                (status, run_after, finished, (finished - started) * 1000, error, job_id)
+            )
+            conn.commit()
+            return True
+
+        finished = time.time()
+        conn.execute(
+            "UPDATE jobs SET status = 'done', finished_at = ?, duration_ms = ?, last_error = NULL WHERE id = ?",
+            (finished, (finished - started) * 1000, job_id)
+        )
+        conn.commit()
+        return True
+
+    def run_pending(self, conn, limit=None):
+        """รันงานที่ถึงเวลาจนหมด (ใช้กับ CLI / ตอนไม่มี worker thread) คืนจำนวนงานที่รัน"""
+        done = 0
+        while (limit is None or done < limit) and self.run_one(conn):
+            done += 1
+        return done
+
+    def prune(self, conn):
+        """ลบงานที่เสร็จแล้วเก่ากว่า keep_seconds (งาน failed เก็บไว้ให้ตรวจ)"""
+        with conn:
+            return conn.execute(
+                "DELETE FROM jobs WHERE status = 'done' AND finished_at < ?", (time.time() - self.keep_seconds,)
+            ).rowcount
+
+    def _run(self):
+        conn = self.pool.connect()
+        next_prune = 0.0
+        while True:
+            try:
+                if time.time() >= next_prune:
+                    self.prune(conn)
+                    next_prune = time.time() + 3600
+                if self.run_one(conn):
+                    continue
+            except Exception:
+                log.exception("job worker error")
+                if conn.in_transaction:
+                    conn.rollback()
+            with self._wake:
+                self._wake.wait(self.poll_interval)
+
+    # ─── สถิติสำหรับ /admin/jobs ─────────────────────────────────────
+    def stats(self, conn, recent=200):
+        now = time.time()
+        by_status = {status: n for status, n in conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")}
+        oldest = conn.execute(
+            "SELECT MIN(run_after) FROM jobs WHERE status = 'queued' AND run_after <= ?", (now,)
+        ).fetchone()[0]
+
+        kinds = {}
+        for kind, wait_ms, duration_ms in conn.execute("""
+            SELECT kind, (started_at - created_at) * 1000, duration_ms FROM jobs
+            WHERE status = 'done' ORDER BY id DESC LIMIT ?
+        """, (recent,)):
+            k = kinds.setdefault(kind, {"count": 0, "wait_ms": [], "duration_ms": []})
+            k["count"] += 1
+            k["wait_ms"].append(wait_ms)
+            k["duration_ms"].append(duration_ms)
+        for k in kinds.values():
+            for field in ("wait_ms", "duration_ms"):
+                values = sorted(k.pop(field))
+                k[f"avg_{field}"] = round(sum(values) / len(values), 2)
+                k[f"p95_{field}"] = round(values[min(len(values) - 1, int(len(values) * 0.95))], 2)
+
+        failures = [
+            {"id": r[0], "kind": r[1], "status": r[2], "attempts": r[3], "error": r[4]}
+            for r in conn.execute("""
+                SELECT id, kind, status, attempts, last_error FROM jobs
+                WHERE last_error IS NOT NULL AND status != 'done' ORDER BY id DESC LIMIT 20
+            """)
+        ]
+        return {
+            "workers": len(self._threads) if self._pid == os.getpid() else 0,
+            "counts": by_status,
+            "queue_depth": by_status.get("queued", 0),
+            "oldest_due_age_ms": round((now - oldest) * 1000, 1) if oldest else 0.0,
+            "recent": kinds,
+            "failures": failures,
+        }
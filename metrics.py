@@ -0,0 +1,176 @@
+import threading
+import time
+from collections import deque
+
+from flask import g, has_request_context, request
+
+# ขอบบนของ bucket (วินาที) แบบเดียวกับค่า default ของ Prometheus client
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class _EndpointStats:
+    __slots__ = ("buckets", "count", "sum", "recent", "statuses", "in_flight",
+                 "sql_queries", "sql_rows", "sql_seconds")
+
+    def __init__(self, recent):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=recent)
+        self.statuses = {}
+        self.in_flight = 0
+        self.sql_queries = 0
+        self.sql_rows = 0
+        self.sql_seconds = 0.0
+
+
+def _quantile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+class RequestMetrics:
+    """latency ต่อ endpoint (histogram + p50/p95/p99 จาก request ล่าสุด), status code, in-flight
+    และจำนวน query / แถว / เวลา SQL ต่อ request (จาก query hook ของ ConnectionPool)
+
+    ค่าเก็บใน memory ของ worker เดียว (เหมือน etag_stats) ให้ scraper ดึงจากทุก worker
+    """
+
+    def __init__(self, recent=1024, server_timing=False):
+        self.recent = recent
+        self.server_timing = server_timing
+        self.enabled = True
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app, pool):
+        pool.add_query_hook(self._on_query)
+        app.before_request(self._before)
+        app.after_request(self._after)
+        app.teardown_request(self._teardown)
+
+    def _stats(self, endpoint):
+        stats = self._endpoints.get(endpoint)
+        if stats is None:
+            stats = self._endpoints[endpoint] = _EndpointStats(self.recent)
+        return stats
+
+    # ─── hook ของ request / SQL ─────────────────────────────────────
+    def _on_query(self, conn, sql, params, seconds, rows):
+        if has_request_context() and "_metrics" in g:
+            m = g._metrics
+            m[1] += 1
+            m[2] += rows
+            m[3] += seconds
+
+    def _before(self):
+        if not self.enabled:
+            return
+        endpoint = request.endpoint or "<unmatched>"
+        # [เวลาเริ่ม, query, แถว, เวลา SQL, status]
+        g._metrics = [time.perf_counter(), 0, 0, 0.0, None]
+        with self._lock:
+            self._stats(endpoint).in_flight += 1
+
+    def _after(self, response):
+        m = g.get("_metrics")
+        if m is None:
+            return response
+        m[4] = response.status_code
+        if self.server_timing:
+            app_ms = (time.perf_counter() - m[0]) * 1000
+            response.headers.add(
+                "Server-Timing",
+                f'app;dur={app_ms:.1f}, db;dur={m[3] * 1000:.1f};desc="{m[1]} queries, {m[2]} rows"'
+            )
+        return response
+
+    def _teardown(self, exc=None):
+        m = g.pop("_metrics", None)
+        if m is None:
+            return
+        elapsed = time.perf_counter() - m[0]
+        status = str(m[4] if m[4] is not None else 500)
+        endpoint = request.endpoint or "<unmatched>"
+        with self._lock:
+            stats = self._stats(endpoint)
+            stats.in_flight -= 1
+            stats.count += 1
+            stats.sum += elapsed
+            stats.recent.append(elapsed)
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if elapsed <= bound:
+                    stats.buckets[i] += 1
+                    break
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            stats.sql_queries += m[1]
+            stats.sql_rows += m[2]
+            stats.sql_seconds += m[3]
+
+    # ─── รายงาน ──────────────────────────────────────────────────────
+    def snapshot(self):
+        with self._lock:
+            data = {}
+            for endpoint, s in self._endpoints.items():
+                ordered = sorted(s.recent)
+                data[endpoint] = {
+                    "count": s.count,
+                    "in_flight": s.in_flight,
+                    "statuses": dict(s.statuses),
+                    "avg_ms": round(s.sum / s.count * 1000, 2) if s.count else 0.0,
+                    **{f"p{int(q * 100)}_ms": round(_quantile(ordered, q) * 1000, 2) if ordered else 0.0
+                       for q in QUANTILES},
+                    "sql_queries": s.sql_queries,
+                    "sql_queries_per_request": round(s.sql_queries / s.count, 2) if s.count else 0.0,
+                    "sql_rows": s.sql_rows,
+                    "sql_ms": round(s.sql_seconds * 1000, 2),
+                    "buckets": list(s.buckets),
+                }
+            return data
+
+    def render_prometheus(self):
+        """ข้อความตาม Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        with self._lock:
+            sums = {e: s.sum for e, s in self._endpoints.items()}
+        lines = [
+            "# HELP http_request_duration_seconds Request latency by endpoint.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for endpoint, s in snapshot.items():
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS, s["buckets"]):
+                cumulative += n
+                lines.append(f'http_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}')
+            lines.append(f'http_request_duration_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}} {s["count"]}')
+            lines.append(f'http_request_duration_seconds_sum{{endpoint="{endpoint}"}} {sums[endpoint]:.6f}')
+            lines.append(f'http_request_duration_seconds_count{{endpoint="{endpoint}"}} {s["count"]}')
+
+        lines += [
+            f"# HELP http_request_latency_seconds Latency quantiles over the last {self.recent} requests.",
+            "# TYPE http_request_latency_seconds summary",
+        ]
+        for endpoint, s in snapshot.items():
+            for q in QUANTILES:
+                value = s[f"p{int(q * 100)}_ms"] / 1000
+                lines.append(f'http_request_latency_seconds{{endpoint="{endpoint}",quantile="{q}"}} {value:.6f}')
+
+        lines += ["# HELP http_requests_total Responses by endpoint and status code.",
+                  "# TYPE http_requests_total counter"]
+        for endpoint, s in snapshot.items():
+            for status, n in sorted(s["statuses"].items()):
+                lines.append(f'http_requests_total{{endpoint="{endpoint}",status="{status}"}} {n}')
+
+        lines += ["# HELP http_requests_in_flight Requests currently being served.",
+                  "# TYPE http_requests_in_flight gauge"]
+        lines += [f'http_requests_in_flight{{endpoint="{e}"}} {s["in_flight"]}' for e, s in snapshot.items()]
+
+        for name, key, help_text, scale in (
+            ("sql_queries_total", "sql_queries", "SQL statements executed.", 1),
+            ("sql_rows_total", "sql_rows", "Rows returned or changed by SQL statements.", 1),
+            ("sql_duration_seconds_total", "sql_ms", "Time spent in SQL statements.", 0.001),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            for endpoint, s in snapshot.items():
+                lines.append(f'{name}{{endpoint="{endpoint}"}} {s[key] * scale:g}')
+        return "\n".join(lines) + "\n"
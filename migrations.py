@@ -0,0 +1,710 @@
+import re
+from datetime import datetime
+
+# ─── Migration แบบมีเวอร์ชัน ────────────────────────────────────────
+# แต่ละรายการคือ (version, ชื่อ, ฟังก์ชันที่รับ cursor)
+# เพิ่ม migration ใหม่ต่อท้ายเสมอ ห้ามแก้ของเดิมที่ deploy ไปแล้ว
+MIGRATIONS = []
+
+
+def migration(version, name):
+    def decorator(fn):
+        MIGRATIONS.append((version, name, fn))
+        return fn
+    return decorator
+
+
+def column_exists(c, table, column):
+    return any(row[1] == column for row in c.execute(f"PRAGMA table_info({table})"))
+
+
+def add_column(c, table, column, decl):
+    if not column_exists(c, table, column):
+        c.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+@migration(1, "baseline tables")
+def _baseline(c):
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS products (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        price INTEGER NOT NULL,
+        category TEXT DEFAULT 'อื่นๆ'
+    )
+    """)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        is_admin INTEGER DEFAULT 0,
+        phone TEXT
+    )
+    """)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS user_points (
+        user_id INTEGER PRIMARY KEY,
+        available_points INTEGER DEFAULT 0,
+        earned_points INTEGER DEFAULT 0,
+        redeemed_points INTEGER DEFAULT 0,
+        pending_points INTEGER DEFAULT 0,
+        last_updated TEXT,
+        FOREIGN KEY (user_id) REFERENCES users(id)
+    )
+    """)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS redeemed_rewards (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        reward_name TEXT,
+        points_used INTEGER,
+        redeemed_at TEXT,
+        FOREIGN KEY (user_id) REFERENCES users(id)
+    )
+    """)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS rewards (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        points_required INTEGER NOT NULL,
+        stock INTEGER DEFAULT 999,
+        description TEXT,
+        is_active INTEGER DEFAULT 1
+    )
+    """)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS orders (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        customer_name TEXT NOT NULL,
+        phone TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        user_id INTEGER,
+        status TEXT DEFAULT 'pending',
+        total INTEGER DEFAULT 0,
+        updated_at TEXT,
+        FOREIGN KEY (user_id) REFERENCES users(id)
+    )
+    """)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS order_items (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        order_id INTEGER NOT NULL,
+        product_name TEXT NOT NULL,
+        price INTEGER NOT NULL,
+        quantity INTEGER NOT NULL,
+        FOREIGN KEY (order_id) REFERENCES orders(id)
+    )
+    """)
+
+
+@migration(2, "late columns: products.category, rewards.image_url, users.profile_picture")
+def _late_columns(c):
+    # ฐานข้อมูลเก่าอาจมีคอลัมน์เหล่านี้แล้วจาก ALTER TABLE แบบ try/except เดิม
+    add_column(c, "products", "category", "TEXT DEFAULT 'อื่นๆ'")
+    add_column(c, "rewards", "image_url", "TEXT")
+    add_column(c, "users", "profile_picture", "TEXT")
+
+
+@migration(3, "indexes for order / reward hot paths")
+def _hot_path_indexes(c):
+    c.execute("CREATE INDEX IF NOT EXISTS idx_orders_status_created ON orders(status, created_at)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_orders_user_status_created ON orders(user_id, status, created_at)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_orders_created ON orders(created_at)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items(order_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_redeemed_rewards_user ON redeemed_rewards(user_id, redeemed_at)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_products_category_name ON products(category, name)")
+
+
+@migration(4, "orders change version for conditional GET")
+def _orders_change_version(c):
+    # เลขเวอร์ชันเดียว เพิ่มทุกครั้งที่ออเดอร์/รายการสินค้าเปลี่ยน (ทุก worker เห็นตรงกัน)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS change_versions (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    c.execute("INSERT OR IGNORE INTO change_versions (name, version) VALUES ('orders', 0)")
+    for table, event in [("orders", "INSERT"), ("orders", "UPDATE"), ("orders", "DELETE"),
+                         ("order_items", "INSERT"), ("order_items", "UPDATE"), ("order_items", "DELETE")]:
+        c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_version
+        AFTER {event} ON {table}
+        BEGIN
+            UPDATE change_versions SET version = version + 1 WHERE name = 'orders';
+        END
+        """)
+
+
+@migration(5, "denormalized orders.total / item_count and order_status_counts")
+def _order_aggregates(c):
+    add_column(c, "orders", "item_count", "INTEGER DEFAULT 0")
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS order_status_counts (
+        status TEXT PRIMARY KEY,
+        order_count INTEGER NOT NULL DEFAULT 0,
+        revenue INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+
+    # order_items -> orders.total / item_count
+    c.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_order_items_insert_total
+    AFTER INSERT ON order_items
+    BEGIN
+        UPDATE orders
+        SET total = COALESCE(total, 0) + NEW.price * NEW.quantity,
+            item_count = COALESCE(item_count, 0) + NEW.quantity
+        WHERE id = NEW.order_id;
+    END
+    """)
+    c.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_order_items_delete_total
+    AFTER DELETE ON order_items
+    BEGIN
+        UPDATE orders
+        SET total = COALESCE(total, 0) - OLD.price * OLD.quantity,
+            item_count = COALESCE(item_count, 0) - OLD.quantity
+        WHERE id = OLD.order_id;
+    END
+    """)
+    c.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_order_items_update_total
+    AFTER UPDATE OF order_id, price, quantity ON order_items
+    BEGIN
+        UPDATE orders
+        SET total = COALESCE(total, 0) - OLD.price * OLD.quantity,
+            item_count = COALESCE(item_count, 0) - OLD.quantity
+        WHERE id = OLD.order_id;
+        UPDATE orders
+        SET total = COALESCE(total, 0) + NEW.price * NEW.quantity,
+            item_count = COALESCE(item_count, 0) + NEW.quantity
+        WHERE id = NEW.order_id;
+    END
+    """)
+
+    # orders -> order_status_counts (จำนวนและยอดขายต่อสถานะ)
+    c.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_orders_insert_counts
+    AFTER INSERT ON orders
+    BEGIN
+        INSERT INTO order_status_counts (status, order_count, revenue)
+        VALUES (COALESCE(NEW.status, 'pending'), 1, COALESCE(NEW.total, 0))
+        ON CONFLICT(status) DO UPDATE SET
+            order_count = order_count + 1,
+            revenue = revenue + excluded.revenue;
+    END
+    """)
+    c.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_orders_update_counts
+    AFTER UPDATE OF status, total ON orders
+    WHEN COALESCE(OLD.status, 'pending') IS NOT COALESCE(NEW.status, 'pending')
+      OR COALESCE(OLD.total, 0) IS NOT COALESCE(NEW.total, 0)
+    BEGIN
+        UPDATE order_status_counts
+        SET order_count = order_count - 1,
+            revenue = revenue - COALESCE(OLD.total, 0)
+        WHERE status = COALESCE(OLD.status, 'pending');
+        INSERT INTO order_status_counts (status, order_count, revenue)
+        VALUES (COALESCE(NEW.status, 'pending'), 1, COALESCE(NEW.total, 0))
+        ON CONFLICT(status) DO UPDATE SET
+            order_count = order_count + 1,
+            revenue = revenue + excluded.revenue;
+    END
+    """)
+    c.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_orders_delete_counts
+    AFTER DELETE ON orders
+    BEGIN
+        UPDATE order_status_counts
+        SET order_count = order_count - 1,
+            revenue = revenue - COALESCE(OLD.total, 0)
+        WHERE status = COALESCE(OLD.status, 'pending');
+    END
+    """)
+
+    # ฐานข้อมูลเดิม orders.total เป็น 0 ทั้งหมด คำนวณใหม่จาก order_items
+    repair_order_aggregates(c)
+
+
+@migration(6, "order placement writes total itself; drop per-line insert triggers")
+def _drop_item_insert_triggers(c):
+    # place_order() ใส่ total / item_count มากับ INSERT ของ orders เลย และ INSERT นั้น
+    # เพิ่ม change version ให้แล้ว trigger ต่อบรรทัดจึงเป็นงานซ้ำ (ตะกร้า 50 รายการ = UPDATE orders 50 ครั้ง)
+    # การลบ/แก้ order_items ยังมี trigger ดูแลอยู่ ส่วนที่ INSERT ตรง ๆ ให้รัน repair-order-totals
+    c.execute("DROP TRIGGER IF EXISTS trg_order_items_insert_total")
+    c.execute("DROP TRIGGER IF EXISTS trg_order_items_insert_version")
+
+
+@migration(7, "products change version for the in-process catalog")
+def _products_change_version(c):
+    c.execute("INSERT OR IGNORE INTO change_versions (name, version) VALUES ('products', 0)")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_products_{event.lower()}_version
+        AFTER {event} ON products
+        BEGIN
+            UPDATE change_versions SET version = version + 1 WHERE name = 'products';
+        END
+        """)
+
+
+@migration(8, "user_daily_sales rollup for the customer dashboard")
+def _user_daily_sales(c):
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS user_daily_sales (
+        user_id INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        total INTEGER NOT NULL DEFAULT 0,
+        order_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, day)
+    ) WITHOUT ROWID
+    """)
+    rebuild_user_daily_sales(c)
+
+
+# ─── เวลาเก็บเป็น epoch วินาที (INTEGER) ทุกตาราง ─────────────────────
+# (table, column, NOT NULL?, ค่าเดิมเป็น UTC?) — redeem() เดิมเขียน datetime('now') ซึ่งเป็น UTC
+# ที่เหลือเขียน datetime.now() เป็นเวลาท้องถิ่นของเครื่อง
+# (user_points.last_updated ถูกเขียนทั้งสองแบบ ถือเป็นเวลาท้องถิ่นตามที่เขียนบ่อยกว่า)
+_EPOCH_COLUMNS = [
+    ("orders", "created_at", True, False),
+    ("orders", "updated_at", False, False),
+    ("users", "created_at", True, False),
+    ("user_points", "last_updated", False, False),
+    ("redeemed_rewards", "redeemed_at", False, True),
+]
+
+
+@migration(9, "timestamps as integer epoch seconds")
+def _epoch_timestamps(c):
+    # index ที่มีคอลัมน์เวลาต้องลบก่อน DROP COLUMN แล้วสร้างใหม่บนคอลัมน์ INTEGER
+    for index in ("idx_orders_status_created", "idx_orders_user_status_created",
+                  "idx_orders_created", "idx_redeemed_rewards_user"):
+        c.execute(f"DROP INDEX IF EXISTS {index}")
+
+    for table, column, not_null, was_utc in _EPOCH_COLUMNS:
+        zone = "" if was_utc else ", 'utc'"   # 'utc' = ตีความค่าเดิมเป็นเวลาท้องถิ่นแล้วแปลงเป็น UTC
+        converted = f"CAST(strftime('%s', {column}{zone}) AS INTEGER)"
+        if not_null:
+            c.execute(f"ALTER TABLE {table} ADD COLUMN {column}_epoch INTEGER NOT NULL DEFAULT 0")
+            converted = f"COALESCE({converted}, 0)"
+        else:
+            c.execute(f"ALTER TABLE {table} ADD COLUMN {column}_epoch INTEGER")
+        c.execute(f"UPDATE {table} SET {column}_epoch = {converted}")
+        c.execute(f"ALTER TABLE {table} DROP COLUMN {column}")
+        c.execute(f"ALTER TABLE {table} RENAME COLUMN {column}_epoch TO {column}")
+
+    _hot_path_indexes(c)
+    rebuild_user_daily_sales(c)
+
+
+@migration(10, "append-only points_ledger; user_points becomes a derived balance")
+def _points_ledger(c):
+    # หนึ่งแถวต่อหนึ่งเหตุการณ์ (ได้แต้ม / แลกแต้ม / ปรับยอด) idempotency_key ซ้ำไม่ได้
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS points_ledger (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        delta INTEGER NOT NULL,
+        ref TEXT,
+        idempotency_key TEXT NOT NULL UNIQUE,
+        created_at INTEGER NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES users(id)
+    )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_points_ledger_user ON points_ledger(user_id, id)")
+
+    # ยอดเดิมยังไม่มีประวัติ ยกมาเป็นรายการเปิดบัญชีต่อผู้ใช้ (ส่วนต่างที่ไม่ลงตัวเป็น adjust)
+    now = int(datetime.now().timestamp())
+    for user_id, available, earned, redeemed in c.execute(
+        "SELECT user_id, COALESCE(available_points, 0), COALESCE(earned_points, 0), "
+        "COALESCE(redeemed_points, 0) FROM user_points"
+    ).fetchall():
+        opening = [("earn", earned), ("redeem", -redeemed), ("adjust", available - (earned - redeemed))]
+        c.executemany(
+            "INSERT OR IGNORE INTO points_ledger (user_id, kind, delta, ref, idempotency_key, created_at) "
+            "VALUES (?, ?, ?, 'opening', ?, ?)",
+            [(user_id, kind, delta, f"opening:{user_id}:{kind}", now) for kind, delta in opening if delta]
+        )
+
+
+@migration(11, "durable background jobs")
+def _jobs(c):
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        payload TEXT NOT NULL DEFAULT '{}',
+        status TEXT NOT NULL DEFAULT 'queued',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL DEFAULT 5,
+        run_after REAL NOT NULL,
+        created_at REAL NOT NULL,
+        started_at REAL,
+        finished_at REAL,
+        duration_ms REAL,
+        last_error TEXT
+    )
+    """)
+    # worker หยิบงานที่ถึงเวลาตามลำดับ และสรุปตามสถานะใน /admin/jobs
+    c.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_run_after ON jobs(status, run_after)")
+
+
+# ─── ค้นหาออเดอร์ด้วย FTS5 ──────────────────────────────────────────
+# rowid ของ orders_fts = orders.id, products = ชื่อสินค้าทุกบรรทัดของออเดอร์ต่อกัน
+# เบอร์โทรเก็บเป็นตัวเลขล้วน ตามด้วย 4 ตัวท้ายอีกคำ ("081-234-5678" -> "0812345678 5678")
+# จะค้นด้วยต้นเบอร์หรือท้ายเบอร์ก็ได้
+def _fts_phone(column):
+    digits = column
+    for ch in ("-", " ", ".", "(", ")"):
+        digits = f"replace({digits}, '{ch}', '')"
+    return f"COALESCE({digits} || ' ' || substr({digits}, -4), '')"
+
+
+def _fts_products(order_id):
+    return (f"COALESCE((SELECT group_concat(product_name, ' ') FROM order_items "
+            f"WHERE order_id = {order_id}), '')")
+
+
+@migration(12, "full-text search over orders (FTS5)")
+def _orders_fts(c):
+    # สระ/วรรณยุกต์ไทยเป็นหมวด M* ซึ่ง unicode61 ปกติถือเป็นตัวคั่นคำ จึงต้องนับเป็นส่วนของคำด้วย
+    # คำค้นแบบขึ้นต้นด้วยที่ยาวกว่า prefix index ต้องรวม doclist ของทุกคำที่ขึ้นต้นแบบนั้นก่อน
+    # (ชื่อที่มีในหลายหมื่นออเดอร์ใช้หลายสิบ ms) index 2-5 ตัวอักษรครอบคลุมที่แอดมินพิมพ์ส่วนใหญ่
+    # ("08", "สม", "0812", "ปราณ") ให้อ่านทีละแถวตามลำดับ rowid แล้วหยุดที่ LIMIT ได้
+    c.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS orders_fts USING fts5(
+        customer_name, phone, products,
+        tokenize = "unicode61 categories 'L* N* Co M*' remove_diacritics 0",
+        prefix = '2 3 4 5'
+    )
+    """)
+    c.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_orders_fts_insert AFTER INSERT ON orders
+    BEGIN
+        INSERT INTO orders_fts (rowid, customer_name, phone, products)
+        VALUES (NEW.id, COALESCE(NEW.customer_name, ''), {_fts_phone('NEW.phone')}, {_fts_products('NEW.id')});
+    END
+    """)
+    c.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_orders_fts_update AFTER UPDATE OF customer_name, phone ON orders
+    BEGIN
+        UPDATE orders_fts SET customer_name = COALESCE(NEW.customer_name, ''), phone = {_fts_phone('NEW.phone')}
+        WHERE rowid = NEW.id;
+    END
+    """)
+    c.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_orders_fts_delete AFTER DELETE ON orders
+    BEGIN
+        DELETE FROM orders_fts WHERE rowid = OLD.id;
+    END
+    """)
+    # order_items เปลี่ยนเมื่อไหร่ก็ต่อชื่อสินค้าของออเดอร์นั้นใหม่ (ออเดอร์หนึ่งมีไม่กี่บรรทัด)
+    c.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_order_items_fts_insert AFTER INSERT ON order_items
+    BEGIN
+        UPDATE orders_fts SET products = {_fts_products('NEW.order_id')} WHERE rowid = NEW.order_id;
+    END
+    """)
+    c.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_order_items_fts_update AFTER UPDATE OF order_id, product_name ON order_items
+    BEGIN
+        UPDATE orders_fts SET products = {_fts_products('OLD.order_id')} WHERE rowid = OLD.order_id;
+        UPDATE orders_fts SET products = {_fts_products('NEW.order_id')} WHERE rowid = NEW.order_id;
+    END
+    """)
+    c.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_order_items_fts_delete AFTER DELETE ON order_items
+    BEGIN
+        UPDATE orders_fts SET products = {_fts_products('OLD.order_id')} WHERE rowid = OLD.order_id;
+    END
+    """)
+    rebuild_order_search(c)
+
+
+@migration(13, "order_items insert keeps orders.total again, skipped while insert_order() fills the order")
+def _guarded_item_insert_total(c):
+    # migration 6 ลบ trigger นี้ออกเพราะ insert_order() เขียน total มากับ INSERT ของ orders แล้ว
+    # แต่ INSERT order_items ทางอื่น (สคริปต์, แอดมิน, โค้ดใหม่) จะทำให้ยอดเพี้ยนเงียบ ๆ จึงนำกลับมา
+    # insert_order() ใส่ item_count เป็น NULL ระหว่างเพิ่มบรรทัด (ยอดรวมใส่ไว้แล้ว) แล้วเขียนค่าจริงทีหลัง
+    # ครั้งเดียว trigger จึงตรวจแค่แถวเดียวของ orders ตาม primary key ก่อนข้าม
+    # UPDATE orders ที่เกิดขึ้นเพิ่ม change version ผ่าน trigger ของ orders ให้ด้วย
+    c.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_order_items_insert_total
+    AFTER INSERT ON order_items
+    WHEN (SELECT item_count FROM orders WHERE id = NEW.order_id) IS NOT NULL
+    BEGIN
+        UPDATE orders
+        SET total = COALESCE(total, 0) + NEW.price * NEW.quantity,
+            item_count = item_count + NEW.quantity
+        WHERE id = NEW.order_id;
+    END
+    """)
+
+
+@migration(14, "orders_fts products written once per order instead of once per order_items line")
+def _orders_fts_once_per_order(c):
+    # trigger ของ migration 12 ต่อชื่อสินค้าใหม่ทุกครั้งที่เพิ่มบรรทัด ตะกร้า n บรรทัดจึงเขียน FTS n ครั้ง
+    # และแต่ละครั้งอ่านทุกบรรทัดก่อนหน้า (50 บรรทัดเหลือราว 160 ออเดอร์/วินาที)
+    # ตอนนี้เขียนแถว FTS เมื่อยอดของออเดอร์เปลี่ยน: insert_order() เขียน item_count ครั้งเดียวหลังใส่ครบทุกบรรทัด
+    # ส่วน INSERT/DELETE order_items ทางอื่นผ่าน trigger ยอดรวม (migration 5, 13) ซึ่ง UPDATE orders ให้อยู่แล้ว
+    c.execute("DROP TRIGGER IF EXISTS trg_order_items_fts_insert")
+    c.execute("DROP TRIGGER IF EXISTS trg_order_items_fts_delete")
+    # ระหว่าง insert_order() ใส่บรรทัด item_count เป็น NULL ให้ trg_orders_fts_lines เขียนทีเดียวตอนท้าย
+    c.execute("DROP TRIGGER IF EXISTS trg_orders_fts_insert")
+    c.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_orders_fts_insert AFTER INSERT ON orders
+    WHEN NEW.item_count IS NOT NULL
+    BEGIN
+        INSERT INTO orders_fts (rowid, customer_name, phone, products)
+        VALUES (NEW.id, COALESCE(NEW.customer_name, ''), {_fts_phone('NEW.phone')}, {_fts_products('NEW.id')});
+    END
+    """)
+    c.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_orders_fts_lines AFTER UPDATE OF total, item_count ON orders
+    BEGIN
+        INSERT OR REPLACE INTO orders_fts (rowid, customer_name, phone, products)
+        VALUES (NEW.id, COALESCE(NEW.customer_name, ''), {_fts_phone('NEW.phone')}, {_fts_products('NEW.id')});
+    END
+    """)
+
+
+@migration(15, "order_tokens: double-submit guard shared by every worker")
+def _order_tokens(c):
+    # token จากฟอร์มหน้าแรก + เบอร์โทร -> ออเดอร์ที่สร้างไปแล้ว ตรวจและเขียนใน transaction เดียวกับออเดอร์
+    # (ดู orders_write.insert_order) แถวที่เก่ากว่า TTL ถูกลบระหว่างสั่งออเดอร์ถัดไป
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS order_tokens (
+        token TEXT NOT NULL,
+        phone TEXT NOT NULL,
+        order_id INTEGER NOT NULL,
+        created_at INTEGER NOT NULL,
+        PRIMARY KEY (token, phone)
+    )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_order_tokens_created ON order_tokens(created_at)")
+
+
+@migration(16, "profile picture changes bump the orders change version")
+def _profile_picture_orders_version(c):
+    # การ์ดออเดอร์ในหน้าแอดมินแสดงรูปของผู้สั่ง (users.profile_picture) และรูปเดิมถูกลบหลังเปลี่ยน
+    # ถ้า ETag ของ /admin/orders/* ไม่เปลี่ยนตาม หน้าแอดมินจะได้ 304 พร้อมลิงก์รูปที่ไม่มีแล้ว
+    c.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_users_profile_picture_version
+    AFTER UPDATE OF profile_picture ON users
+    WHEN OLD.profile_picture IS NOT NEW.profile_picture
+    BEGIN
+        UPDATE change_versions SET version = version + 1 WHERE name = 'orders';
+    END
+    """)
+
+
+# ยอดแต้มที่ควรเป็นของ user_points คำนวณจาก points_ledger
+_POINTS_FROM_LEDGER = """
+    SELECT user_id,
+           SUM(delta) AS available_points,
+           SUM(CASE WHEN kind = 'earn' THEN delta ELSE 0 END) AS earned_points,
+           -SUM(CASE WHEN kind = 'redeem' THEN delta ELSE 0 END) AS redeemed_points
+    FROM points_ledger
+    GROUP BY user_id
+"""
+
+
+def rebuild_user_points(c, fix=True):
+    """เทียบ user_points กับ points_ledger คืน [(user_id, (available, earned, redeemed) เดิม, ที่ถูกต้อง)]
+    ถ้า fix=True แก้ยอดที่ไม่ตรง
+    """
+    expected = {r[0]: tuple(r[1:]) for r in c.execute(_POINTS_FROM_LEDGER)}
+    stored = {r[0]: tuple(r[1:]) for r in c.execute(
+        "SELECT user_id, COALESCE(available_points, 0), COALESCE(earned_points, 0), "
+        "COALESCE(redeemed_points, 0) FROM user_points"
+    )}
+    drift = [
+        (user_id, stored.get(user_id, (0, 0, 0)), expected.get(user_id, (0, 0, 0)))
+        for user_id in sorted(set(expected) | set(stored))
+        if stored.get(user_id, (0, 0, 0)) != expected.get(user_id, (0, 0, 0))
+    ]
+
+    if fix:
+        for user_id, _, (available, earned, redeemed) in drift:
+            c.execute("""
+                INSERT INTO user_points (user_id, available_points, earned_points, redeemed_points)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET
+                    available_points = excluded.available_points,
+                    earned_points = excluded.earned_points,
+                    redeemed_points = excluded.redeemed_points
+            """, (user_id, available, earned, redeemed))
+    return drift
+
+
+# ยอดที่ควรเป็นของ user_daily_sales คำนวณจากออเดอร์ที่ปิดจ๊อบแล้วโดยตรง
+# migration 8 เรียกตอน created_at ยังเป็นข้อความเวลาท้องถิ่น (ก่อน migration 9) จึงรับได้ทั้งสองแบบ
+_DAILY_SALES_FROM_ORDERS = """
+    SELECT user_id,
+           CASE WHEN typeof(created_at) = 'text' THEN substr(created_at, 1, 10)
+                ELSE date(created_at, 'unixepoch', 'localtime') END AS day,
+           SUM(total) AS total, COUNT(*) AS order_count
+    FROM orders
+    WHERE status = 'completed' AND user_id IS NOT NULL
+    GROUP BY user_id, day
+"""
+
+
+def rebuild_user_daily_sales(c, fix=True):
+    """เทียบ user_daily_sales กับ orders แล้วคืนรายการที่ไม่ตรง
+    [(user_id, day, total เดิม, total จริง, count เดิม, count จริง)] ถ้า fix=True สร้างตารางใหม่ทั้งหมด
+    """
+    expected = {(r[0], r[1]): (r[2], r[3]) for r in c.execute(_DAILY_SALES_FROM_ORDERS)}
+    stored = {(r[0], r[1]): (r[2], r[3]) for r in c.execute(
+        "SELECT user_id, day, total, order_count FROM user_daily_sales"
+    )}
+    drift = []
+    for key in sorted(set(expected) | set(stored)):
+        old, new = stored.get(key, (0, 0)), expected.get(key, (0, 0))
+        if old != new:
+            drift.append((key[0], key[1], old[0], new[0], old[1], new[1]))
+
+    if fix and drift:
+        c.execute("DELETE FROM user_daily_sales")
+        c.execute(f"INSERT INTO user_daily_sales (user_id, day, total, order_count) {_DAILY_SALES_FROM_ORDERS}")
+    return drift
+
+
+def rebuild_order_search(c):
+    """สร้าง orders_fts ใหม่ทั้งหมดจาก orders / order_items แล้ว optimize คืนจำนวนออเดอร์ที่ index"""
+    c.execute("DELETE FROM orders_fts")
+    c.execute(f"""
+    INSERT INTO orders_fts (rowid, customer_name, phone, products)
+    SELECT o.id, COALESCE(o.customer_name, ''), {_fts_phone('o.phone')}, COALESCE(p.products, '')
+    FROM orders o
+    LEFT JOIN (
+        SELECT order_id, group_concat(product_name, ' ') AS products FROM order_items GROUP BY order_id
+    ) p ON p.order_id = o.id
+    """)
+    indexed = c.rowcount
+    c.execute("INSERT INTO orders_fts (orders_fts) VALUES ('optimize')")
+    return indexed
+
+
+def repair_order_aggregates(c, fix=True):
+    """คำนวณ orders.total / item_count / order_status_counts ใหม่จาก order_items
+
+    คืนรายงานส่วนต่าง {'orders': [(id, total เดิม, total จริง, item_count เดิม, item_count จริง)],
+    'status_counts': [(status, count เดิม, count จริง, revenue เดิม, revenue จริง)]}
+    fix=False ใช้ตรวจอย่างเดียว
+    """
+    item_totals = """
+        SELECT order_id, SUM(price * quantity) AS total, SUM(quantity) AS item_count
+        FROM order_items GROUP BY order_id
+    """
+    order_drift = c.execute(f"""
+        SELECT o.id, o.total, COALESCE(t.total, 0), o.item_count, COALESCE(t.item_count, 0)
+        FROM orders o
+        LEFT JOIN ({item_totals}) t ON t.order_id = o.id
+        WHERE o.total IS NOT COALESCE(t.total, 0)
+           OR o.item_count IS NOT COALESCE(t.item_count, 0)
+    """).fetchall()
+
+    expected = {r[0]: (r[1], r[2]) for r in c.execute(f"""
+        SELECT COALESCE(o.status, 'pending'), COUNT(*), COALESCE(SUM(t.total), 0)
+        FROM orders o
+        LEFT JOIN ({item_totals}) t ON t.order_id = o.id
+        GROUP BY COALESCE(o.status, 'pending')
+    """)}
+    stored = {r[0]: (r[1], r[2]) for r in c.execute(
+        "SELECT status, order_count, revenue FROM order_status_counts WHERE order_count != 0 OR revenue != 0"
+    )}
+    count_drift = []
+    for status in sorted(set(stored) | set(expected)):
+        old, new = stored.get(status, (0, 0)), expected.get(status, (0, 0))
+        if old != new:
+            count_drift.append((status, old[0], new[0], old[1], new[1]))
+
+    if fix and order_drift:
+        c.executemany(
+            "UPDATE orders SET total = ?, item_count = ? WHERE id = ?",
+            [(r[2], r[4], r[0]) for r in order_drift]
+        )
+    if fix and (order_drift or count_drift):
+        # trigger ของ orders ปรับ order_status_counts ไปแล้วระหว่างแก้ total จึงเขียนทับทั้งตาราง
+        c.execute("DELETE FROM order_status_counts")
+        c.executemany(
+            "INSERT INTO order_status_counts (status, order_count, revenue) VALUES (?, ?, ?)",
+            [(status, n, revenue) for status, (n, revenue) in expected.items()]
+        )
+
+    return {"orders": order_drift, "status_counts": count_drift}
+
+
+def current_version(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at TEXT NOT NULL
+    )
+    """)
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def run_migrations(conn):
+    """รัน migration ที่ยังไม่เคยรัน ทีละเวอร์ชัน คืนรายการเวอร์ชันที่รันไป"""
+    applied = []
+    for version, name, fn in sorted(MIGRATIONS, key=lambda m: m[0]):
+        # BEGIN IMMEDIATE กันหลาย worker รัน migration เดียวกันพร้อมกัน
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if version <= current_version(conn):
+                conn.rollback()
+                continue
+            fn(conn.cursor())
+            conn.execute(
+                "INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)",
+                (version, name, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+    return applied
+
+
+# ─── ตรวจ query plan ของ query ที่เรียกบ่อย ─────────────────────────
+# query ที่ลงทะเบียนไว้ต้องไม่ตกไป full table scan
+# allow_scan = alias ของตารางที่ยอมให้ scan ได้ (เช่นตารางเล็กอย่าง products)
+HOT_QUERIES = {}
+
+_SCAN_RE = re.compile(r"^SCAN (\w+)")
+
+
+def register_hot_query(name, sql, params=(), allow_scan=()):
+    HOT_QUERIES[name] = (sql, tuple(params), frozenset(allow_scan))
+    return sql
+
+
+def full_scans(conn, sql, params=(), allow_scan=()):
+    offending = []
+    for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params):
+        detail = row[-1]
+        # "SCAN x USING INDEX ..." ก็ยังไล่ทั้ง index อยู่ดี จึงนับเป็น full scan ด้วย
+        match = _SCAN_RE.match(detail)
+        if match and match.group(1) not in allow_scan:
+            offending.append(detail)
+    return offending
+
+
+def check_hot_queries(conn):
+    """คืน dict {ชื่อ query: [บรรทัด plan ที่เป็น full scan]} เฉพาะตัวที่ไม่ผ่าน"""
+    failures = {}
+    for name, (sql, params, allow_scan) in HOT_QUERIES.items():
+        offending = full_scans(conn, sql, params, allow_scan)
+        if offending:
+            failures[name] = offending
+    return failures
@@ -0,0 +1,149 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+from orders_write import DuplicateOrder, insert_order, order_lines
+
+
+class OrderQueueFull(Exception):
+    """คิวของ writer เต็มเกิน submit_timeout (ให้ตอบ 503 ให้ลูกค้าลองใหม่)"""
+
+
+class OrderWriter:
+    """โหมดเขียนออเดอร์ด้วยเธรดเดียว รวมหลายออเดอร์ไว้ใน transaction เดียว (group commit)
+
+    request thread ตรวจตะกร้าเสร็จแล้วส่งออเดอร์เข้าคิว ได้ Future ไว้รอ order_id
+    writer รวบออเดอร์ที่มาถึงภายใน max_wait_ms (ไม่เกิน max_batch ออเดอร์) แล้ว commit ครั้งเดียว
+    ไม่มี request ใดแย่ง write lock กันเอง และ sync ดิสก์ครั้งเดียวต่อหลายออเดอร์
+
+    คิวจำกัดขนาด (max_queue) ถ้าเต็มนานเกิน submit_timeout จะโยน OrderQueueFull แทนการรอไม่จบ
+    """
+
+    def __init__(self, pool, max_batch=32, max_wait_ms=2.0, max_queue=512,
+                 submit_timeout=1.0, result_timeout=10.0):
+        self.pool = pool
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+        self.submit_timeout = submit_timeout
+        self.result_timeout = result_timeout
+        self.enabled = False
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {
+            "submitted": 0,
+            "rejected": 0,
+            "written": 0,
+            "duplicates": 0,
+            "failed": 0,
+            "batches": 0,
+            "largest_batch": 0,
+        }
+
+    def _ensure_started(self):
+        # เธรดไม่ติดไปกับ fork (gunicorn --preload) เริ่มใหม่ใน worker ตอนใช้ครั้งแรก
+        if self._pid != os.getpid():
+            self._reset()
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="order-writer", daemon=True)
+                    self._thread.start()
+
+    # ─── ฝั่ง request ────────────────────────────────────────────────
+    def submit(self, customer_name, phone, user_id, lines, now=None, token=None, token_ttl=600):
+        """ส่งออเดอร์ที่ตรวจแล้ว (lines จาก order_lines) เข้าคิว คืน Future ของ order_id
+
+        token ที่เคยใช้แล้วทำให้ Future โยน DuplicateOrder (ดู orders_write.insert_order)
+        """
+        self._ensure_started()
+        future = Future()
+        item = (future, (customer_name, phone, user_id, lines, now or int(time.time()), token, token_ttl))
+        try:
+            self._queue.put(item, timeout=self.submit_timeout)
+        except queue.Full:
+            with self._lock:
+                self._stats["rejected"] += 1
+            raise OrderQueueFull("order queue is full")
+        with self._lock:
+            self._stats["submitted"] += 1
+        return future
+
+    def place_order(self, customer_name, phone, user_id, cart, products, token=None, token_ttl=600):
+        """เหมือน orders_write.place_order แต่เขียนผ่าน writer คืน order_id หรือ None ถ้าไม่มีรายการที่ใช้ได้"""
+        lines = order_lines(cart, products)
+        if not lines:
+            return None
+        future = self.submit(customer_name, phone, user_id, lines, token=token, token_ttl=token_ttl)
+        return future.result(timeout=self.result_timeout)
+
+    # ─── ฝั่ง writer ─────────────────────────────────────────────────
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, conn, batch):
+        written, duplicates = [], []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for future, args in batch:
+                # savepoint ต่อออเดอร์: ออเดอร์ที่พังไม่ลากทั้ง batch ไปด้วย
+                conn.execute("SAVEPOINT batch_order")
+                try:
+                    written.append((future, insert_order(conn, *args)))
+                except DuplicateOrder as e:
+                    # ออเดอร์เดิมอาจอยู่ใน batch นี้เอง แจ้งผลหลัง commit สำเร็จเท่านั้น
+                    conn.execute("ROLLBACK TO batch_order")
+                    duplicates.append((future, e))
+                except sqlite3.Error as e:
+                    conn.execute("ROLLBACK TO batch_order")
+                    future.set_exception(e)
+                conn.execute("RELEASE batch_order")
+            conn.commit()
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            for future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            written, duplicates = [], []
+
+        for future, order_id in written:
+            future.set_result(order_id)
+        for future, e in duplicates:
+            future.set_exception(e)
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["written"] += len(written)
+            self._stats["duplicates"] += len(duplicates)
+            self._stats["failed"] += len(batch) - len(written) - len(duplicates)
+            self._stats["largest_batch"] = max(self._stats["largest_batch"], len(batch))
+
+    def _run(self):
+        conn = self.pool.connect()
+        while True:
+            self._write(conn, self._collect())
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+        data["enabled"] = self.enabled
+        data["queued"] = self._queue.qsize()
+        handled = data["written"] + data["duplicates"] + data["failed"]
+        data["avg_batch"] = round(handled / data["batches"], 2) if data["batches"] else 0.0
+        return data
@@ -0,0 +1,319 @@
+import calendar
+import re
+from collections import namedtuple
+from datetime import date, timedelta
+
+from migrations import register_hot_query
+
+# ─── โครงสร้างข้อมูลออเดอร์แบบกะทัดรัด ─────────────────────────────
+# ใช้ร่วมกันทุกหน้าที่แสดงออเดอร์ (แอดมิน, ออเดอร์ของฉัน, SSE)
+# แทนการสร้าง dict ใหม่ต่อแถวแบบเดิม
+
+OrderItem = namedtuple("OrderItem", "product price qty subtotal")
+
+
+class Order:
+    __slots__ = ("id", "customer_name", "phone", "created_at", "status",
+                 "total", "item_count", "profile_picture", "items")
+
+    def __init__(self, id, customer_name, phone, created_at, status,
+                 total=0, item_count=0, profile_picture=None):
+        self.id = id
+        self.customer_name = customer_name
+        self.phone = phone
+        self.created_at = created_at
+        self.status = status or "pending"
+        # orders.total / item_count ถูกดูแลโดย trigger ตอนเขียน (ดู migrations.py) ไม่ต้องรวมเอง
+        self.total = total or 0
+        self.item_count = item_count or 0
+        self.profile_picture = profile_picture
+        self.items = []
+
+    # ให้ template เดิมที่ใช้ order['items'] ยังทำงานได้
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def add_item(self, product, price, qty, subtotal):
+        self.items.append(OrderItem(product, price, qty, subtotal))
+
+
+ORDER_STATUSES = ["pending", "confirmed", "preparing", "completed"]
+
+# คอลัมน์ที่ต้องการตามลำดับ: ออเดอร์ 8 ตัวแรก แล้วตามด้วยรายการสินค้า 4 ตัว (subtotal คิดใน SQL)
+_ORDER_COLS = ("o.id, o.customer_name, o.phone, o.created_at, o.status, "
+               "o.total, o.item_count, u.profile_picture")
+_ITEM_COLS = "oi.product_name, oi.price, oi.quantity, oi.price * oi.quantity AS subtotal"
+
+
+def group_rows(rows):
+    """รวมแถว JOIN (เรียงตามออเดอร์อยู่แล้ว) เป็น Order ทีละตัวในรอบเดียว"""
+    order = None
+    for r in rows:
+        if order is None or r[0] != order.id:
+            if order is not None:
+                yield order
+            order = Order(*r[:8])
+        if r[8] is not None:
+            order.add_item(r[8], r[9], r[10], r[11])
+    if order is not None:
+        yield order
+
+
+def _as_dict(orders):
+    return {order.id: order for order in orders}
+
+
+# ─── ออเดอร์ตามสถานะ (แท็บรอยืนยัน / polling) ───────────────────────
+ORDERS_BY_STATUS_SQL = register_hot_query("orders_by_status", f"""
+    SELECT {_ORDER_COLS}, {_ITEM_COLS}
+    FROM orders o
+    LEFT JOIN order_items oi ON o.id = oi.order_id
+    LEFT JOIN users u ON o.user_id = u.id
+    WHERE o.status = ?
+    ORDER BY o.created_at DESC, o.id DESC, oi.id
+""", ("pending",))
+
+
+def fetch_orders_by_status(conn, status):
+    return _as_dict(group_rows(conn.execute(ORDERS_BY_STATUS_SQL, (status,))))
+
+
+# ─── ออเดอร์ของผู้ใช้ ───────────────────────────────────────────────
+USER_ORDERS_SQL = register_hot_query("user_orders", f"""
+    SELECT {_ORDER_COLS}, {_ITEM_COLS}
+    FROM orders o
+    LEFT JOIN order_items oi ON o.id = oi.order_id
+    LEFT JOIN users u ON o.user_id = u.id
+    WHERE o.user_id = ?
+    ORDER BY o.created_at DESC, o.id DESC, oi.id
+""", (1,))
+
+
+def fetch_user_orders(conn, user_id):
+    return _as_dict(group_rows(conn.execute(USER_ORDERS_SQL, (user_id,))))
+
+
+# ─── ออเดอร์เดียว ─────────────────────────────────────────────────
+ORDER_SQL = f"""
+    SELECT {_ORDER_COLS}, {_ITEM_COLS}
+    FROM orders o
+    LEFT JOIN order_items oi ON o.id = oi.order_id
+    LEFT JOIN users u ON o.user_id = u.id
+    WHERE o.id = ?
+    ORDER BY oi.id
+"""
+
+
+def fetch_order(conn, order_id):
+    return next(group_rows(conn.execute(ORDER_SQL, (order_id,))), None)
+
+
+# ─── หน้าออเดอร์แบบ keyset pagination บน (created_at, id) ──────────
+ORDERS_PAGE_SQL = register_hot_query("admin_orders_page", f"""
+    SELECT {_ORDER_COLS}
+    FROM orders o
+    LEFT JOIN users u ON o.user_id = u.id
+    WHERE o.status = ? AND (o.created_at, o.id) < (?, ?)
+    ORDER BY o.created_at DESC, o.id DESC
+    LIMIT ?
+""", ("completed", 2**62, 2**62, 20))
+
+_NO_CURSOR = (2**62, 2**62)
+
+
+def encode_cursor(order):
+    return f"{order.created_at}|{order.id}"
+
+
+def decode_cursor(value):
+    # ไม่มี cursor (หรือ cursor เสีย) = เริ่มจากออเดอร์ล่าสุด
+    try:
+        created_at, oid = value.rsplit("|", 1)
+        return int(created_at), int(oid)
+    except (AttributeError, ValueError):
+        return _NO_CURSOR
+
+
+def attach_items(conn, orders):
+    """เติมรายการสินค้าให้ออเดอร์ทั้งหน้าด้วย query เดียว (orders = {id: Order})"""
+    if not orders:
+        return
+    placeholders = ",".join("?" * len(orders))
+    rows = conn.execute(
+        f"SELECT order_id, product_name, price, quantity, price * quantity "
+        f"FROM order_items WHERE order_id IN ({placeholders}) ORDER BY order_id, id",
+        list(orders)
+    )
+    for r in rows:
+        orders[r[0]].add_item(r[1], r[2], r[3], r[4])
+
+
+def fetch_orders_page(conn, status, cursor=None, limit=20):
+    """คืน (list ของ Order, cursor หน้าถัดไปหรือ None)"""
+    created_at, oid = decode_cursor(cursor)
+    # ดึงเกิน 1 แถวเพื่อรู้ว่ายังมีหน้าถัดไปไหม
+    rows = conn.execute(ORDERS_PAGE_SQL, (status, created_at, oid, limit + 1)).fetchall()
+    has_more = len(rows) > limit
+    orders = _as_dict(Order(*r) for r in rows[:limit])
+    attach_items(conn, orders)
+
+    page = list(orders.values())
+    return page, (encode_cursor(page[-1]) if has_more else None)
+
+
+# ─── ค้นหาออเดอร์ด้วย orders_fts (ดู migration 12) ──────────────────
+# เงื่อนไขที่ไม่ใช้ส่ง NULL / ขอบเขตกว้างสุดมาแทน SQL จะได้มีรูปเดียวให้ตรวจ plan ได้
+# FTS5 คืนผลเรียง rowid (= orders.id) จากมากไปน้อยได้เองและหยุดเมื่อครบ LIMIT
+# สถานะ / ช่วงวันที่กรองหลัง FTS ถ้าไม่จำกัด f.rowid คำค้นกว้าง ๆ กับช่วงวันเก่า ๆ ต้องไล่ทุกออเดอร์ที่ใหม่กว่าก่อน
+# จึงส่งช่วงเลขออเดอร์ของออเดอร์ที่ผ่านตัวกรองจริงมาด้วย (ดู search_rowid_range)
+SEARCH_ORDERS_SQL = register_hot_query("admin_order_search", f"""
+    SELECT {_ORDER_COLS}
+    FROM orders_fts f
+    JOIN orders o ON o.id = f.rowid
+    LEFT JOIN users u ON o.user_id = u.id
+    WHERE f.orders_fts MATCH ? AND f.rowid >= ? AND f.rowid < ?
+      AND (? IS NULL OR o.status = ?)
+      AND o.created_at >= ? AND o.created_at < ?
+    ORDER BY f.rowid DESC
+    LIMIT ?
+""", ('"08"*', 0, 2**62, None, None, 0, 2**62, 20), allow_scan=("f",))
+
+# ช่วงเลขออเดอร์นับจากออเดอร์ที่ผ่านตัวกรองทุกแถวใน index (ไม่เดาจากเวลา ออเดอร์ที่ลงย้อนหลังจึงไม่หลุด)
+# อ่านไม่เกิน SEARCH_BOUNDS_SCAN_LIMIT แถว ตัวกรองที่กว้างกว่านั้นค้นแบบไม่จำกัดช่วงแล้วกรองทีหลังตามเดิม
+SEARCH_BOUNDS_SCAN_LIMIT = 10000
+
+# มี / ไม่มีสถานะแยก SQL กัน (? IS NULL OR status = ? ทำให้ SQLite ไล่ทุกสถานะใน index)
+TIME_ID_RANGE_SQL = register_hot_query("order_search_time_ids", """
+    SELECT MIN(id), MAX(id), COUNT(*) FROM (
+        SELECT id FROM orders WHERE created_at >= ? AND created_at < ? LIMIT ?
+    )
+""", (0, 2**62, 1))
+
+STATUS_ID_RANGE_SQL = register_hot_query("order_search_status_ids", """
+    SELECT MIN(id), MAX(id), COUNT(*) FROM (
+        SELECT id FROM orders WHERE status = ? AND created_at >= ? AND created_at < ? LIMIT ?
+    )
+""", ("pending", 0, 2**62, 1))
+
+# เลขที่คั่นด้วยขีด/จุด/เว้นวรรคถือเป็นเบอร์โทรเดียวกัน ("081-234 5678" -> "0812345678")
+_PHONE_SEPARATORS = re.compile(r"(?<=\d)[\s\-.()]+(?=\d)")
+
+
+def search_query(text):
+    """แปลงคำค้นเป็น FTS5 MATCH: ทุกคำต้องเจอ และจับคู่แบบขึ้นต้นด้วย คืน None ถ้าไม่มีคำค้น"""
+    text = _PHONE_SEPARATORS.sub("", text or "")
+    terms = []
+    for term in text.split():
+        if term.startswith("+66") and term[3:].isdigit():
+            term = "0" + term[3:]
+        term = term.strip("()-.")
+        if term:
+            terms.append('"' + term.replace('"', '""') + '"*')
+    return " ".join(terms) or None
+
+
+def search_rowid_range(conn, status=None, since=None, until=None):
+    """ช่วง [ต่ำสุด, สูงสุด) ของเลขออเดอร์ที่ผ่านตัวกรองสถานะ / ช่วงเวลา คืน None ถ้าไม่มีออเดอร์ผ่านเลย
+
+    ไม่มีตัวกรอง หรือมีออเดอร์ผ่านเกิน SEARCH_BOUNDS_SCAN_LIMIT คืนช่วงกว้างสุด
+    """
+    if status is None and since is None and until is None:
+        return 0, 2**62
+    window = (since if since is not None else 0, until if until is not None else 2**62,
+              SEARCH_BOUNDS_SCAN_LIMIT + 1)
+    if status is None:
+        low, high, n = conn.execute(TIME_ID_RANGE_SQL, window).fetchone()
+    else:
+        low, high, n = conn.execute(STATUS_ID_RANGE_SQL, (status, *window)).fetchone()
+    if n == 0:
+        return None
+    if n > SEARCH_BOUNDS_SCAN_LIMIT:
+        return 0, 2**62
+    return low, high + 1
+
+
+def search_orders(conn, match, status=None, since=None, until=None, cursor=None, limit=20):
+    """คืน (list ของ Order ใหม่สุดก่อน, cursor หน้าถัดไปหรือ None) cursor คือเลขออเดอร์สุดท้ายของหน้าก่อน"""
+    try:
+        before = int(cursor)
+    except (TypeError, ValueError):
+        before = 2**62
+    bounds = search_rowid_range(conn, status, since, until)
+    if bounds is None:
+        return [], None
+    rows = conn.execute(SEARCH_ORDERS_SQL, (
+        match, bounds[0], min(before, bounds[1]), status, status,
+        since if since is not None else 0, until if until is not None else 2**62,
+        limit + 1,
+    )).fetchall()
+    has_more = len(rows) > limit
+    orders = _as_dict(Order(*r) for r in rows[:limit])
+    attach_items(conn, orders)
+
+    page = list(orders.values())
+    return page, (str(page[-1].id) if has_more else None)
+
+
+# ─── ตัวเลขสรุป (อ่านจาก order_status_counts ไม่กี่แถว ไม่แตะ orders เลย) ─────
+def count_orders_by_status(conn):
+    counts = {f"{status}_count": 0 for status in ORDER_STATUSES}
+    for status, n in conn.execute("SELECT status, order_count FROM order_status_counts"):
+        key = f"{status}_count"
+        if key in counts:
+            counts[key] = n
+    return counts
+
+
+def total_revenue(conn):
+    return conn.execute("SELECT COALESCE(SUM(revenue), 0) FROM order_status_counts").fetchone()[0]
+
+
+# ─── สรุปยอดของลูกค้า (แดชบอร์ด) จาก user_daily_sales ─────────────
+# ยอดทั้งหมดรวมใน SQL ส่วนรายวันอ่านเฉพาะช่วงที่ต้องใช้ (ต้นปีหรือ 6 เดือนก่อน แล้วแต่อันไหนเก่ากว่า)
+# จำนวนแถวที่ส่งกลับมาจึงไม่โตตามอายุบัญชี
+USER_SALES_TOTAL_SQL = register_hot_query("user_sales_total", """
+    SELECT COALESCE(SUM(total), 0) FROM user_daily_sales WHERE user_id = ?
+""", (1,))
+
+USER_DAILY_SALES_SQL = register_hot_query("user_daily_sales", """
+    SELECT day, total FROM user_daily_sales WHERE user_id = ? AND day >= ? ORDER BY day
+""", (1, "2000-01-01"))
+
+
+def months_ago(day, n):
+    month_index = day.year * 12 + day.month - 1 - n
+    year, month = divmod(month_index, 12)
+    month += 1
+    return date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def user_sales_summary(conn, user_id, today=None):
+    """ยอด 7 วัน / เดือนนี้ / ปีนี้ / ทั้งหมด และยอดรายเดือน 6 เดือนล่าสุด
+
+    รายวันอ่านไม่เกินราว 1 ปี (แถวละหนึ่งวันที่มีออเดอร์ปิดจ๊อบ) ยอดทั้งหมดรวมด้วย SUM แยกอีก query
+    """
+    today = today or date.today()
+    week_start = (today - timedelta(days=7)).isoformat()
+    month_prefix = today.strftime("%Y-%m")
+    year_prefix = today.strftime("%Y")
+    chart_start = months_ago(today, 6).isoformat()
+    range_start = min(chart_start, f"{year_prefix}-01-01", week_start)
+
+    summary = {"weekly_total": 0, "monthly_total": 0, "yearly_total": 0,
+               "all_time_total": conn.execute(USER_SALES_TOTAL_SQL, (user_id,)).fetchone()[0]}
+    months = {}
+    for day, total in conn.execute(USER_DAILY_SALES_SQL, (user_id, range_start)):
+        if day.startswith(year_prefix):
+            summary["yearly_total"] += total
+        if day.startswith(month_prefix):
+            summary["monthly_total"] += total
+        if day >= week_start:
+            summary["weekly_total"] += total
+        if day >= chart_start:
+            months[day[:7]] = months.get(day[:7], 0) + total
+
+    summary["monthly_chart"] = sorted(months.items())
+    return summary
@@ -0,0 +1,126 @@
+import time
+
+
+class DuplicateOrder(Exception):
+    """token นี้สร้างออเดอร์ไปแล้ว (กดสั่งซ้ำ / ส่งฟอร์มซ้ำ) order_id คือออเดอร์เดิม"""
+
+    def __init__(self, order_id):
+        super().__init__(f"order token already used by order {order_id}")
+        self.order_id = order_id
+
+
+def parse_cart(form):
+    """อ่าน product_id + qty_<id> จากฟอร์ม คืน {product_id: qty} เฉพาะรายการที่จำนวน > 0
+
+    สินค้าเดียวกันอาจถูกส่งมาซ้ำ (checkbox อยู่ทั้งแท็บหมวดและแท็บ "ทั้งหมด") จึงนับครั้งเดียว
+    """
+    cart = {}
+    for pid in form.getlist("product_id"):
+        try:
+            pid_int = int(pid)
+            qty = int(form.get(f"qty_{pid}", "0"))
+        except ValueError:
+            continue
+        if qty > 0 and pid_int not in cart:
+            cart[pid_int] = qty
+    return cart
+
+
+def resolve_products(conn, product_ids):
+    """ดึงชื่อและราคาของสินค้าทั้งตะกร้าด้วย query เดียว คืน {id: (name, price)}"""
+    if not product_ids:
+        return {}
+    ids = list(product_ids)
+    placeholders = ",".join("?" * len(ids))
+    rows = conn.execute(
+        f"SELECT id, name, price FROM products WHERE id IN ({placeholders})", ids
+    )
+    return {r[0]: (r[1], r[2]) for r in rows}
+
+
+def order_lines(cart, products):
+    """[(name, price, qty)] เฉพาะสินค้าที่มีอยู่จริง (products = {product_id: (name, price)})"""
+    return [(products[pid][0], products[pid][1], qty) for pid, qty in cart.items() if pid in products]
+
+
+def claim_order_token(conn, token, phone, now, ttl):
+    """ตรวจ token + phone ใน transaction ของผู้เรียก โยน DuplicateOrder ถ้าเคยสร้างออเดอร์แล้ว
+
+    ลบ token ที่เก่ากว่า ttl วินาทีไปด้วย (index บน created_at ปกติเจอแค่ไม่กี่แถว)
+    ต้องเรียกภายใต้ BEGIN IMMEDIATE ทุก worker จึงเห็นและจอง token เดียวกันทีละคน
+    """
+    conn.execute("DELETE FROM order_tokens WHERE created_at < ?", (now - ttl,))
+    row = conn.execute(
+        "SELECT order_id FROM order_tokens WHERE token = ? AND phone = ?", (token, phone)
+    ).fetchone()
+    if row is not None:
+        raise DuplicateOrder(row[0])
+
+
+def insert_order(conn, customer_name, phone, user_id, lines, now=None, token=None, token_ttl=600):
+    """INSERT ออเดอร์ + รายการสินค้า (ผู้เรียกเป็นคนเปิด/ปิด transaction) คืน order_id
+
+    orders.total เขียนพร้อม INSERT ของ orders (trigger จะนำไปรวมใน order_status_counts)
+    ส่วน item_count เป็น NULL ระหว่างเพิ่มบรรทัด trigger ของ order_items จึงไม่บวกซ้ำทีละบรรทัด
+    (ดู migration 13) แล้วเขียนค่าจริงครั้งเดียวตอนท้าย UPDATE นั้นเขียนแถว orders_fts ให้ด้วย (migration 14)
+    ถ้ามี token จะบันทึกลง order_tokens ด้วย token เดิมภายใน token_ttl โยน DuplicateOrder แทนการเขียนซ้ำ
+    """
+    now = now or int(time.time())
+    if token:
+        claim_order_token(conn, token, phone, now, token_ttl)
+    total = sum(price * qty for _, price, qty in lines)
+    item_count = sum(qty for _, _, qty in lines)
+    cur = conn.execute(
+        "INSERT INTO orders (customer_name, phone, created_at, user_id, total, item_count) "
+        "VALUES (?, ?, ?, ?, ?, NULL)",
+        (customer_name, phone, now, user_id, total)
+    )
+    order_id = cur.lastrowid
+    conn.executemany(
+        "INSERT INTO order_items (order_id, product_name, price, quantity) VALUES (?, ?, ?, ?)",
+        [(order_id, name, price, qty) for name, price, qty in lines]
+    )
+    conn.execute("UPDATE orders SET item_count = ? WHERE id = ?", (item_count, order_id))
+    if token:
+        conn.execute(
+            "INSERT INTO order_tokens (token, phone, order_id, created_at) VALUES (?, ?, ?, ?)",
+            (token, phone, order_id, now)
+        )
+    return order_id
+
+
+def place_order(conn, customer_name, phone, user_id, cart, products=None, now=None, token=None, token_ttl=600):
+    """บันทึกออเดอร์ + รายการสินค้าทั้งหมดใน transaction เดียว (BEGIN IMMEDIATE)
+
+    cart = {product_id: qty}, products = {product_id: (name, price)} ถ้ามีอยู่แล้ว (เช่นจาก catalog)
+    คืน order_id หรือ None ถ้าไม่มีรายการที่ใช้ได้ (จะไม่สร้างออเดอร์เปล่า)
+    token ที่เคยใช้แล้วโยน DuplicateOrder (ดู insert_order)
+    """
+    if products is None:
+        products = resolve_products(conn, cart)
+    lines = order_lines(cart, products)
+    if not lines:
+        return None
+
+    # IMMEDIATE จอง write lock ตั้งแต่ต้น ไม่ต้องอัปเกรด lock กลาง transaction (ต้นเหตุ "database is locked")
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        order_id = insert_order(conn, customer_name, phone, user_id, lines, now, token, token_ttl)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return order_id
+
+
+def record_completed_sale(conn, order_id):
+    """บวกยอดออเดอร์ที่เพิ่งปิดจ๊อบเข้า user_daily_sales (เรียกใน transaction เดียวกับการเปลี่ยนสถานะ)"""
+    conn.execute("""
+        INSERT INTO user_daily_sales (user_id, day, total, order_count)
+        SELECT user_id, date(created_at, 'unixepoch', 'localtime'), COALESCE(total, 0), 1
+        FROM orders
+        WHERE id = ? AND user_id IS NOT NULL
+        ON CONFLICT(user_id, day) DO UPDATE SET
+            total = total + excluded.total,
+            order_count = order_count + 1
+    """, (order_id,))
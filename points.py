@@ -0,0 +1,89 @@
+import sqlite3
+import time
+
+# ─── แต้มสะสม: บันทึกลง points_ledger แล้วปรับ user_points ใน transaction เดียวกัน ───
+# user_points เป็นยอดคงเหลือที่คำนวณได้จาก ledger (ตรวจ/ซ่อมด้วย flask repair-points)
+# ทุกการหักแต้ม/สต็อกเป็น UPDATE แบบมีเงื่อนไข จึงไม่มีทางติดลบแม้มีคำขอพร้อมกันหลายตัว
+
+REDEEMED = "redeemed"
+REDEEM_DUPLICATE = "duplicate"
+REWARD_NOT_FOUND = "not_found"
+OUT_OF_STOCK = "out_of_stock"
+INSUFFICIENT_POINTS = "insufficient_points"
+
+
+def _append(conn, user_id, kind, delta, ref, idempotency_key, now):
+    """เพิ่มแถวใน ledger คืน False ถ้า key นี้เคยบันทึกไปแล้ว"""
+    cur = conn.execute(
+        "INSERT OR IGNORE INTO points_ledger (user_id, kind, delta, ref, idempotency_key, created_at) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (user_id, kind, delta, ref, idempotency_key, now)
+    )
+    return cur.rowcount == 1
+
+
+def award_order_points(conn, user_id, order_id, points, now=None):
+    """ให้แต้มจากออเดอร์ที่ปิดจ๊อบ (ครั้งเดียวต่อออเดอร์) ต้องเรียกภายใน transaction ของผู้เรียก
+
+    คืน True ถ้าให้แต้มจริง, False ถ้าออเดอร์นี้เคยได้แต้มไปแล้ว
+    """
+    now = now or int(time.time())
+    if not _append(conn, user_id, "earn", points, f"order:{order_id}", f"order:{order_id}:earn", now):
+        return False
+    conn.execute("""
+        INSERT INTO user_points (user_id, available_points, earned_points, redeemed_points, last_updated)
+        VALUES (?, ?, ?, 0, ?)
+        ON CONFLICT(user_id) DO UPDATE SET
+            available_points = available_points + excluded.available_points,
+            earned_points = earned_points + excluded.earned_points,
+            last_updated = excluded.last_updated
+    """, (user_id, points, points, now))
+    return True
+
+
+def redeem_reward(conn, user_id, reward_id, idempotency_key, now=None):
+    """แลกรางวัลแบบ atomic ภายใต้ BEGIN IMMEDIATE คืน (ผลลัพธ์, แถวรางวัลหรือ None)
+
+    ผลลัพธ์เป็นค่าคงที่ด้านบน ลำดับการตรวจ: รางวัล → key ซ้ำ → สต็อก → แต้ม
+    """
+    now = now or int(time.time())
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        reward = conn.execute(
+            "SELECT id, name, points_required FROM rewards WHERE id = ? AND is_active = 1",
+            (reward_id,)
+        ).fetchone()
+        if reward is None:
+            conn.rollback()
+            return REWARD_NOT_FOUND, None
+
+        points = reward[2]
+        if not _append(conn, user_id, "redeem", -points, f"reward:{reward_id}", idempotency_key, now):
+            conn.rollback()
+            return REDEEM_DUPLICATE, reward
+
+        if conn.execute(
+            "UPDATE rewards SET stock = stock - 1 WHERE id = ? AND stock > 0", (reward_id,)
+        ).rowcount == 0:
+            conn.rollback()
+            return OUT_OF_STOCK, reward
+
+        if conn.execute("""
+            UPDATE user_points
+            SET available_points = available_points - ?,
+                redeemed_points = redeemed_points + ?,
+                last_updated = ?
+            WHERE user_id = ? AND available_points >= ?
+        """, (points, points, now, user_id, points)).rowcount == 0:
+            conn.rollback()
+            return INSUFFICIENT_POINTS, reward
+
+        conn.execute(
+            "INSERT INTO redeemed_rewards (user_id, reward_name, points_used, redeemed_at) VALUES (?, ?, ?, ?)",
+            (user_id, reward[1], points, now)
+        )
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    return REDEEMED, reward
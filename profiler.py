@@ -0,0 +1,157 @@
+import cProfile
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+from flask import g, request, session
+
+MODES = ("collapsed", "pstats")
+_SAFE_NAME = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+class _StackSampler:
+    """thread ที่อ่าน stack ของ thread เป้าหมายทุก interval วินาที แล้วนับเป็น collapsed stack"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            key = ";".join(reversed(names))
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{stack} {count}\n")
+
+
+class RequestProfiler:
+    """โปรไฟล์ request ทีละตัว: แอดมินสั่งด้วย ?_profile=1 (หรือ header X-Profile) หรือสุ่มตาม sample_rate (%)
+
+    mode "collapsed": sampling ทุก interval วินาที ได้ไฟล์ collapsed stack (ใช้กับ flamegraph.pl /
+    speedscope ได้ทันที) mode "pstats": cProfile ได้ไฟล์สำหรับ pstats / snakeviz
+    ไฟล์ถูกตั้งชื่อตามเวลา endpoint และเวลาที่ใช้ พร้อม .json เก็บรายละเอียด เก็บไว้ keep ไฟล์ล่าสุด
+    ไม่เรียก init_app (ปิดอยู่) จะไม่มี hook ใดๆ ใน request เลย
+    """
+
+    def __init__(self, directory, sample_rate=0.0, mode="collapsed", interval=0.005, keep=100):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.mode = mode
+        self.interval = interval
+        self.keep = keep
+        self.enabled = False
+        self._lock = threading.Lock()
+
+    def init_app(self, app, skip_endpoints=()):
+        os.makedirs(self.directory, exist_ok=True)
+        self.skip_endpoints = set(skip_endpoints)
+        self.enabled = True
+        app.before_request(self._before)
+        app.teardown_request(self._teardown)
+
+    def _requested_mode(self):
+        flag = request.args.get("_profile") or request.headers.get("X-Profile")
+        if flag and session.get("is_admin"):
+            return flag if flag in MODES else self.mode
+        if self.sample_rate and random.random() * 100 < self.sample_rate:
+            return self.mode
+        return None
+
+    def _before(self):
+        if request.endpoint in self.skip_endpoints:
+            return
+        mode = self._requested_mode()
+        if mode is None:
+            return
+        if mode == "pstats":
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            profiler = _StackSampler(threading.get_ident(), self.interval)
+            profiler.start()
+        g._profile = (mode, profiler, time.perf_counter(), time.time())
+
+    def _teardown(self, exc=None):
+        state = g.pop("_profile", None)
+        if state is None:
+            return
+        mode, profiler, started, wall = state
+        duration_ms = (time.perf_counter() - started) * 1000
+        if mode == "pstats":
+            profiler.disable()
+        else:
+            profiler.stop()
+
+        endpoint = _SAFE_NAME.sub("_", request.endpoint or "unmatched")
+        stem = f"{int(wall * 1000)}-{endpoint}-{duration_ms:.0f}ms-{os.urandom(3).hex()}"
+        ext = "pstats" if mode == "pstats" else "collapsed"
+        if mode == "pstats":
+            profiler.dump_stats(os.path.join(self.directory, f"{stem}.{ext}"))
+        else:
+            profiler.write(os.path.join(self.directory, f"{stem}.{ext}"))
+        meta = {
+            "file": f"{stem}.{ext}",
+            "mode": mode,
+            "endpoint": request.endpoint,
+            "method": request.method,
+            "path": request.path,
+            "duration_ms": round(duration_ms, 2),
+            "error": repr(exc) if exc else None,
+            "samples": getattr(profiler, "samples", None),
+            "created_at": round(wall, 3),
+        }
+        with open(os.path.join(self.directory, f"{stem}.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        self.prune()
+
+    def prune(self):
+        with self._lock:
+            metas = sorted(n for n in os.listdir(self.directory) if n.endswith(".json"))
+            for name in metas[:max(0, len(metas) - self.keep)]:
+                stem = name[:-len(".json")]
+                for ext in (".json", ".collapsed", ".pstats"):
+                    try:
+                        os.remove(os.path.join(self.directory, stem + ext))
+                    except FileNotFoundError:
+                        pass
+
+    def listing(self, limit=50):
+        """รายละเอียดโปรไฟล์ล่าสุด (ใหม่สุดก่อน)"""
+        if not os.path.isdir(self.directory):
+            return []
+        names = sorted((n for n in os.listdir(self.directory) if n.endswith(".json")), reverse=True)
+        result = []
+        for name in names[:limit]:
+            try:
+                with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                    result.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return result
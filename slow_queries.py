@@ -0,0 +1,145 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+
+from flask import has_request_context, request
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    """SQL ที่ตัดค่าคงที่ออก (ตัวเลข/ข้อความ -> ?, IN (?, ?, ...) -> IN (...)) ใช้จัดกลุ่ม statement"""
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _SPACE.sub(" ", sql).strip()
+    return _IN_LIST.sub("(...)", sql)
+
+
+def fingerprint(normalized):
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:12]
+
+
+def params_shape(params):
+    # เก็บแค่ชนิดของพารามิเตอร์ (ไม่เก็บค่า เบอร์โทร/ชื่อลูกค้าจะได้ไม่หลุดลง log)
+    if params is None:
+        return "many"
+    if isinstance(params, dict):
+        return {k: type(v).__name__ for k, v in params.items()}
+    return [type(v).__name__ for v in params]
+
+
+class SlowQueryLog:
+    """บันทึก statement ที่ใช้เวลาเกิน threshold_ms ลงไฟล์ JSONL แบบหมุนไฟล์ พร้อม EXPLAIN QUERY PLAN
+
+    ใช้เป็น query hook ของ ConnectionPool จึงเห็นทุก statement ที่ผ่าน connection ของแอป
+    (request, job worker, order writer) route คือ endpoint ของ request หรือชื่อ thread
+    """
+
+    def __init__(self, path, threshold_ms=100, max_bytes=5 * 1024 * 1024, backups=3):
+        self.path = path
+        self.threshold_ms = threshold_ms
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.logged = 0
+        self._explaining = threading.local()
+        self._logger = None
+
+    def init_pool(self, pool):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        handler = RotatingFileHandler(self.path, maxBytes=self.max_bytes, backupCount=self.backups,
+                                      encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        self._logger = logging.getLogger(f"slow_queries.{self.path}")
+        self._logger.setLevel(logging.INFO)
+        self._logger.propagate = False
+        self._logger.handlers[:] = [handler]
+        pool.add_query_hook(self._on_query)
+
+    def _route(self):
+        if has_request_context():
+            return f"{request.method} {request.endpoint or request.path}"
+        return threading.current_thread().name
+
+    def _plan(self, conn, sql, params):
+        if params is None:
+            return None
+        # EXPLAIN ผ่าน method ของ sqlite3.Connection โดยตรง ไม่ให้วนกลับเข้า hook
+        self._explaining.active = True
+        try:
+            rows = sqlite3.Connection.execute(conn, f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+            return [row[3] for row in rows]
+        except sqlite3.Error:
+            return None
+        finally:
+            self._explaining.active = False
+
+    def _on_query(self, conn, sql, params, seconds, rows):
+        duration_ms = seconds * 1000
+        if duration_ms < self.threshold_ms or getattr(self._explaining, "active", False):
+            return
+        normalized = normalize_sql(sql)
+        record = {
+            "ts": round(time.time(), 3),
+            "fingerprint": fingerprint(normalized),
+            "sql": normalized,
+            "params": params_shape(params),
+            "duration_ms": round(duration_ms, 2),
+            "rows": rows,
+            "route": self._route(),
+            "plan": self._plan(conn, sql, params),
+        }
+        self._logger.info(json.dumps(record, ensure_ascii=False))
+        self.logged += 1
+
+    # ─── อ่านกลับมาสรุปสำหรับหน้าแอดมิน ─────────────────────────────────
+    def records(self):
+        files = [f"{self.path}.{n}" for n in range(self.backups, 0, -1)] + [self.path]
+        for path in files:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            yield json.loads(line)
+                        except ValueError:
+                            continue  # บรรทัดที่เขียนไม่ครบตอนหมุนไฟล์
+            except FileNotFoundError:
+                continue
+
+    def top(self, n=20):
+        """กลุ่ม statement ตาม fingerprint เรียงตามเวลาที่ช้าที่สุด"""
+        groups = {}
+        for r in self.records():
+            grp = groups.get(r["fingerprint"])
+            if grp is None:
+                grp = groups[r["fingerprint"]] = {
+                    "fingerprint": r["fingerprint"], "sql": r["sql"], "count": 0, "total_ms": 0.0,
+                    "max_ms": 0.0, "durations": [], "rows": 0, "routes": {}, "last_seen": 0,
+                    "slowest": None,
+                }
+            grp["count"] += 1
+            grp["total_ms"] += r["duration_ms"]
+            grp["durations"].append(r["duration_ms"])
+            grp["rows"] = max(grp["rows"], r.get("rows") or 0)
+            grp["routes"][r["route"]] = grp["routes"].get(r["route"], 0) + 1
+            grp["last_seen"] = max(grp["last_seen"], r["ts"])
+            if r["duration_ms"] >= grp["max_ms"]:
+                grp["max_ms"] = r["duration_ms"]
+                grp["slowest"] = {"params": r["params"], "plan": r["plan"], "route": r["route"], "ts": r["ts"]}
+
+        result = sorted(groups.values(), key=lambda g: g["max_ms"], reverse=True)[:n]
+        for grp in result:
+            durations = sorted(grp.pop("durations"))
+            grp["avg_ms"] = round(grp["total_ms"] / grp["count"], 2)
+            grp["p95_ms"] = durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+            grp["total_ms"] = round(grp["total_ms"], 2)
+            grp["max_rows"] = grp.pop("rows")
+        return result
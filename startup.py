@@ -0,0 +1,74 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from jinja2 import FileSystemBytecodeCache
+
+
+class StartupReport:
+    """จับเวลาช่วงเริ่ม process จนถึง request แรก แยกเป็นช่วง (imports, init_db, templates, ...)
+
+    started คือ perf_counter() ตอนเริ่ม import แอป ช่วงที่เกิดซ้ำ (เช่น init_db หลายครั้ง) เวลารวมกัน
+    """
+
+    def __init__(self, started):
+        self.started = started
+        self.pid = os.getpid()
+        self.phases = {}
+        self.first_request_ms = None
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds):
+        with self._lock:
+            self.phases[name] = round(self.phases.get(name, 0.0) + seconds * 1000, 2)
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def watch_templates(self, jinja_env):
+        """นับเวลาโหลด template ที่ยังไม่อยู่ใน cache (compile หรืออ่าน bytecode) เป็นช่วง templates"""
+        loader = jinja_env.loader
+        load = loader.load
+
+        def timed_load(environment, name, globals=None):
+            with self.phase("templates"):
+                return load(environment, name, globals)
+        loader.load = timed_load
+
+    def first_request(self):
+        """เรียกตอนเริ่ม request แรก คืน True ครั้งเดียวต่อ process"""
+        if self.first_request_ms is not None:
+            return False
+        with self._lock:
+            if self.first_request_ms is not None:
+                return False
+            self.first_request_ms = round((time.perf_counter() - self.started) * 1000, 2)
+            return True
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "pid": self.pid,
+                "phases_ms": dict(self.phases),
+                "time_to_first_request_ms": self.first_request_ms,
+            }
+
+
+def bytecode_cache(directory):
+    """Jinja bytecode cache บนดิสก์ (แชร์ระหว่าง worker และอยู่รอดข้าม restart)"""
+    os.makedirs(directory, exist_ok=True)
+    return FileSystemBytecodeCache(directory, "%s.jinja-cache")
+
+
+def precompile_templates(jinja_env):
+    """โหลด (compile) ทุก template ที่ loader หาเจอเข้า cache ของ environment คืนจำนวน template"""
+    names = jinja_env.list_templates(filter_func=lambda name: name.endswith(".html"))
+    for name in names:
+        jinja_env.get_template(name)
+    return len(names)
@@ -0,0 +1,156 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+
+from flask import request, send_file, abort
+
+try:  # brotli เป็น optional: ถ้าไม่มีจะสร้างเฉพาะ .gz
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+# ─── ไฟล์ static แบบมี fingerprint ─────────────────────────────────
+# url_for('static', filename='img/02.jpg') -> /static/img/02.<hash>.jpg
+# ชื่อที่มี hash ไม่มีวันเปลี่ยนเนื้อหา จึงส่ง Cache-Control: immutable ได้ยาว 1 ปี
+# ไฟล์ที่บีบอัดได้ (css/js/svg/...) มีไฟล์ .gz / .br ทำไว้ล่วงหน้าใน build_dir
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml",
+                      "application/xml", "font/ttf", "font/otf")
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def _digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()[:12]
+
+
+def _hashed_name(filename, digest):
+    base, ext = os.path.splitext(filename)
+    return f"{base}.{digest}{ext}"
+
+
+def _compressible(filename):
+    mimetype = mimetypes.guess_type(filename)[0] or ""
+    return mimetype.startswith(COMPRESSIBLE_TYPES)
+
+
+class StaticAssets:
+    """สร้าง manifest ของไฟล์ใน static/ (ชื่อจริง -> ชื่อที่มี hash) และเสิร์ฟแบบ immutable
+
+    ไม่ยุ่งกับโฟลเดอร์ exclude (เช่น uploads/ ที่ผู้ใช้เขียนตอนรันและตั้งชื่อตาม hash อยู่แล้ว)
+    """
+
+    def __init__(self, static_folder, build_dir, exclude=("uploads",), min_size=512):
+        self.static_folder = static_folder
+        self.build_dir = build_dir
+        self.exclude = tuple(exclude)
+        self.min_size = min_size
+        self.enabled = True
+        self.manifest = {}     # "img/02.jpg" -> "img/02.<hash>.jpg"
+        self._reverse = {}     # "img/02.<hash>.jpg" -> "img/02.jpg"
+
+    def _manifest_path(self):
+        return os.path.join(self.build_dir, "manifest.json")
+
+    def _files(self):
+        for root, dirs, files in os.walk(self.static_folder):
+            rel_root = os.path.relpath(root, self.static_folder)
+            if rel_root == ".":
+                dirs[:] = [d for d in dirs if d not in self.exclude and not d.startswith(".")]
+            for name in files:
+                if name.startswith("."):
+                    continue
+                yield os.path.normpath(os.path.join(rel_root, name)).replace(os.sep, "/")
+
+    def build(self):
+        """คำนวณ hash ทุกไฟล์ และทำ .gz / .br ของไฟล์ที่บีบอัดได้ (ใช้ของเดิมถ้าไฟล์ไม่เปลี่ยน)"""
+        os.makedirs(self.build_dir, exist_ok=True)
+        try:
+            with open(self._manifest_path(), encoding="utf-8") as f:
+                previous = json.load(f)
+        except (OSError, ValueError):
+            previous = {}
+
+        entries = {}
+        for filename in self._files():
+            path = os.path.join(self.static_folder, filename)
+            st = os.stat(path)
+            old = previous.get(filename)
+            if old and old["size"] == st.st_size and old["mtime"] == st.st_mtime:
+                digest = old["digest"]
+            else:
+                digest = _digest(path)
+            hashed = _hashed_name(filename, digest)
+            entries[filename] = {"digest": digest, "size": st.st_size, "mtime": st.st_mtime,
+                                 "hashed": hashed, "encodings": []}
+            if st.st_size >= self.min_size and _compressible(filename):
+                entries[filename]["encodings"] = self._precompress(path, hashed)
+
+        with open(self._manifest_path() + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(entries, f, ensure_ascii=False, indent=1)
+        os.replace(self._manifest_path() + ".tmp", self._manifest_path())
+
+        self.manifest = {name: e["hashed"] for name, e in entries.items()}
+        self._reverse = {e["hashed"]: (name, tuple(e["encodings"])) for name, e in entries.items()}
+        return entries
+
+    def _precompress(self, path, hashed):
+        encodings = []
+        with open(path, "rb") as f:
+            data = f.read()
+        targets = [("br", brotli.compress, ".br")] if brotli is not None else []
+        targets.append(("gzip", lambda d: gzip.compress(d, 9, mtime=0), ".gz"))
+        for encoding, compress, suffix in targets:
+            out = os.path.join(self.build_dir, hashed + suffix)
+            if not os.path.exists(out):
+                packed = compress(data)
+                if len(packed) >= len(data):
+                    continue  # บีบแล้วไม่เล็กลง ไม่ต้องเก็บ
+                os.makedirs(os.path.dirname(out), exist_ok=True)
+                with open(out + ".tmp", "wb") as f:
+                    f.write(packed)
+                os.replace(out + ".tmp", out)
+            encodings.append(encoding)
+        return encodings
+
+    # ─── ผูกกับ Flask ────────────────────────────────────────────────
+    def init_app(self, app):
+        app.url_defaults(self._fingerprint)
+        app.view_functions["static"] = self.serve
+        self._app = app
+
+    def _fingerprint(self, endpoint, values):
+        if endpoint == "static" and self.enabled:
+            hashed = self.manifest.get(values.get("filename"))
+            if hashed:
+                values["filename"] = hashed
+
+    def serve(self, filename):
+        entry = self._reverse.get(filename) if self.enabled else None
+        if entry is None:
+            # ไม่มี fingerprint (uploads / ลิงก์เก่า) ใช้ static handler ปกติของ Flask
+            return self._app.send_static_file(filename)
+
+        original, encodings = entry
+        path = os.path.join(self.static_folder, original)
+        mimetype = mimetypes.guess_type(original)[0] or "application/octet-stream"
+        accepted = request.accept_encodings
+        encoding = next((e for e in encodings if accepted[e]), None)
+        if encoding:
+            suffix = ".br" if encoding == "br" else ".gz"
+            response = send_file(os.path.join(self.build_dir, filename + suffix), mimetype=mimetype,
+                                 conditional=True, etag=True)
+            response.headers["Content-Encoding"] = encoding
+        elif os.path.exists(path):
+            response = send_file(path, mimetype=mimetype, conditional=True, etag=True)
+        else:
+            abort(404)
+        if encodings:
+            response.vary.add("Accept-Encoding")
+        response.headers["Cache-Control"] = IMMUTABLE
+        return response